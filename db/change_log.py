@@ -0,0 +1,193 @@
+# change_log.py
+import json
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db.models import ChangeLog, CropData, LabelFingerprint, ShippingLabelType
+
+LABEL_TYPE = "label_type"
+CROP = "crop"
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Wie oft change_stamp() höchstens die Datenbank fragt
+STAMP_TTL_S = 2.0
+_stamp = (0.0, 0)  # (Zeitpunkt der Abfrage, Version)
+
+
+# ---------------------------------------------------------
+# Fachliche Schlüssel: IDs sind je Station verschieden, Carrier/Typ/Drucker/Papier nicht
+# ---------------------------------------------------------
+def label_key(label: ShippingLabelType) -> dict:
+    return {"carrier": label.carrier, "label_type": label.label_type}
+
+
+def label_data(label: ShippingLabelType) -> dict:
+    return {"carrier": label.carrier, "label_type": label.label_type, "keywords": label.keywords}
+
+
+def crop_key(crop: CropData, label: ShippingLabelType) -> dict:
+    return {**label_key(label), "printer_name": crop.printer_name, "paper_format_name": crop.paper_format_name}
+
+
+def crop_data(crop: CropData) -> dict:
+    return {"x0": crop.crop_x0, "y0": crop.crop_y0, "x1": crop.crop_x1, "y1": crop.crop_y1, "rotation": crop.rotation}
+
+
+# ---------------------------------------------------------
+# Protokollieren und Abfragen
+# ---------------------------------------------------------
+def record_change(session: Session, entity: str, op: str, key: dict, data: dict | None = None,
+                  created: float | None = None):
+    """
+    Hängt eine Änderung an das Protokoll an (in derselben Transaktion wie die Änderung selbst).
+    'created' ist der Zeitpunkt der ursprünglichen Änderung, auch wenn sie von einer anderen Station kommt.
+    """
+    session.add(ChangeLog(
+        entity=entity, op=op, key=json.dumps(key, sort_keys=True),
+        data=json.dumps(data, sort_keys=True) if data is not None else None,
+        created=time.time() if created is None else created
+    ))
+
+
+def current_version(session: Session) -> int:
+    return session.query(func.max(ChangeLog.version)).scalar() or 0
+
+
+def change_stamp() -> int:
+    """
+    Stand der Datenbank für prozesslokale Caches: ändert sich bei jeder Änderung an Label-Typen
+    und Crops - auch aus anderen Prozessen (GUI, Hot-Folder-Worker, Abgleich).
+    Gefragt wird höchstens alle STAMP_TTL_S Sekunden.
+    """
+    global _stamp
+    checked, version = _stamp
+    now = time.monotonic()
+    if now - checked >= STAMP_TTL_S:
+        from db.database import session_scope
+        with session_scope() as session:
+            version = current_version(session)
+        _stamp = (now, version)
+    return version
+
+
+def changes_since(session: Session, since: int, limit: int = 1000) -> tuple[list[dict], bool]:
+    """Änderungen nach Version 'since' in Reihenfolge, höchstens 'limit' Stück (+ ob noch mehr folgen)."""
+    rows = (
+        session.query(ChangeLog)
+        .filter(ChangeLog.version > since)
+        .order_by(ChangeLog.version)
+        .limit(limit + 1)
+        .all()
+    )
+    changes = [
+        {"version": r.version, "entity": r.entity, "op": r.op, "key": json.loads(r.key),
+         "data": json.loads(r.data) if r.data else None, "created": r.created}
+        for r in rows[:limit]
+    ]
+    return changes, len(rows) > limit
+
+
+def snapshot(session: Session) -> list[dict]:
+    """Aktueller Gesamtstand als Liste von Upserts (Label-Typen vor ihren Crops)."""
+    latest = _latest_change_times(session)
+
+    def upsert(entity, key, data):
+        created = latest.get((entity, json.dumps(key, sort_keys=True)), 0.0)
+        return {"entity": entity, "op": UPSERT, "key": key, "data": data, "created": created}
+
+    labels = {label.id: label for label in session.query(ShippingLabelType)}
+    changes = [upsert(LABEL_TYPE, label_key(l), label_data(l)) for l in labels.values()]
+    for crop in session.query(CropData):
+        label = labels.get(crop.supplier_label_id)
+        if label is not None:  # Crops ohne Label-Typ lassen sich auf keiner anderen Station zuordnen
+            changes.append(upsert(CROP, crop_key(crop, label), crop_data(crop)))
+    return changes
+
+
+def _latest_change_times(session: Session) -> dict:
+    """(entity, key) -> Zeitpunkt der letzten protokollierten Änderung."""
+    rows = session.query(ChangeLog.entity, ChangeLog.key, func.max(ChangeLog.created)).group_by(
+        ChangeLog.entity, ChangeLog.key)
+    return {(entity, key): created or 0.0 for entity, key, created in rows}
+
+
+# ---------------------------------------------------------
+# Änderungen einer anderen Station übernehmen
+# ---------------------------------------------------------
+def apply_changes(session: Session, changes: list[dict]) -> dict:
+    """
+    Übernimmt Änderungen in einem Rutsch (ein Lookup je Tabelle statt einer Abfrage je Eintrag).
+    Was lokal schon genauso vorliegt, wird übersprungen und nicht erneut protokolliert - so
+    schaukeln sich Stationen, die sich gegenseitig abfragen, nicht gegenseitig hoch. Wurde ein
+    Eintrag lokal später geändert, gewinnt die lokale Änderung (die Gegenstelle übernimmt sie dann).
+    Gibt die Anzahl übernommener Änderungen je Art zurück.
+    """
+    labels = {(l.carrier, l.label_type): l for l in session.query(ShippingLabelType)}
+    crops = {(c.supplier_label_id, c.printer_name, c.paper_format_name): c for c in session.query(CropData)}
+    latest = _latest_change_times(session)
+    applied = {LABEL_TYPE: 0, CROP: 0}
+
+    for change in changes:
+        entity, op, key, data = change["entity"], change["op"], change["key"], change.get("data")
+        created = change.get("created") or 0.0
+        log_key = (entity, json.dumps(key, sort_keys=True))
+        if latest.get(log_key, 0.0) > created:
+            continue
+        label = labels.get((key["carrier"], key["label_type"]))
+
+        if entity == LABEL_TYPE:
+            if op == DELETE:
+                if label is None:
+                    continue
+                # Wie ShippingLabelRepository.delete: Fingerabdrücke gehören zum Typ (SQLite vergibt IDs neu)
+                session.query(LabelFingerprint).filter_by(label_type_id=label.id).delete()
+                session.delete(label)
+                del labels[(key["carrier"], key["label_type"])]
+            else:
+                new_key = (data["carrier"], data["label_type"])
+                # Umbenennung auf einen Namen, den es hier schon gibt: diesen Eintrag aktualisieren
+                label = labels.get(new_key, label)
+                if label is None:
+                    label = ShippingLabelType(**data)
+                    session.add(label)
+                elif label_data(label) == data:
+                    continue
+                else:
+                    labels.pop((label.carrier, label.label_type), None)
+                    label.carrier, label.label_type, label.keywords = data["carrier"], data["label_type"], data["keywords"]
+                labels[new_key] = label
+
+        elif entity == CROP:
+            if label is None:
+                continue  # Label-Typ gibt es hier nicht
+            if label.id is None:
+                session.flush()  # Neu angelegter Label-Typ braucht seine ID
+            crop_lookup = (label.id, key["printer_name"], key["paper_format_name"])
+            crop = crops.get(crop_lookup)
+            if op == DELETE:
+                if crop is None:
+                    continue
+                session.delete(crop)
+                del crops[crop_lookup]
+            else:
+                if crop is None:
+                    crop = CropData(supplier_label_id=label.id, printer_name=key["printer_name"],
+                                    paper_format_name=key["paper_format_name"])
+                    session.add(crop)
+                    crops[crop_lookup] = crop
+                elif crop_data(crop) == data:
+                    continue
+                crop.crop_x0, crop.crop_y0, crop.crop_x1, crop.crop_y1 = data["x0"], data["y0"], data["x1"], data["y1"]
+                crop.rotation = data["rotation"]
+        else:
+            continue
+
+        # Weiterreichen an Stationen, die wiederum diese Station abfragen
+        record_change(session, entity, op, key, data, created)
+        latest[log_key] = created
+        applied[entity] += 1
+
+    return applied
@@ -1,93 +1,122 @@
 # repository_crop_data.py
-from sqlalchemy.orm import Session
-from db.models import CropData
+import logging
+
+from db.change_log import CROP, UPSERT, change_stamp, crop_data, crop_key, record_change
+from db.database import session_scope
+from db.models import CropData, ShippingLabelType
+from modules import instrumentation
+
+logger = logging.getLogger(__name__)
+
 
 class CropDataRepository:
-    def __init__(self, session: Session):
-        self.session = session
+    """Jede Methode ist eine eigene kurze Arbeitseinheit (siehe session_scope)."""
 
-    def get(self, supplier_label_id: int, paper_format_name: str, printer_name: str):
-        # 1. Bruteforce-Check: Was existiert ÜBERHAUPT in dieser Tabelle?
-        total_count = self.session.query(CropData).count()
-        print(f"DEBUG_DATABASE: Gesamtzahl Einträge in CropData: {total_count}")
+    def __init__(self):
+        # Read-through-Cache: (label_id, printer, paper) -> CropData (nur Treffer)
+        self._cache = {}
+        self._stamp = None  # Datenbank-Stand, zu dem der Cache passt (siehe change_stamp)
 
-        all_rows = self.session.query(CropData).all()
-        for r in all_rows:
-            print(
-                f"DEBUG_DATABASE: Vorhanden -> ID:{r.supplier_label_id} (Typ:{type(r.supplier_label_id)}) | Printer:{r.printer_name}")
+    def clear_cache(self):
+        """Nach Änderungen von außen (z.B. Abgleich mit anderen Stationen)."""
+        self._cache.clear()
 
-        # ... (restliche get-Logik)
-        # 1. Typ-Sicherheit erzwingen
+    @staticmethod
+    def _key(supplier_label_id, paper_format_name: str, printer_name: str) -> tuple:
+        # Typ-Sicherheit erzwingen (ComboBox-Daten kommen teils als String)
         try:
             s_id = int(supplier_label_id)
-        except:
+        except (TypeError, ValueError):
             s_id = supplier_label_id
+        return s_id, printer_name, paper_format_name
 
-        # 2. Alle Einträge für diese ID holen (Breitband-Suche)
-        all_potential = self.session.query(CropData).filter_by(supplier_label_id=s_id).all()
-
-        print(f"--- REPO DEBUG START ---")
-        print(f"Gesucht: ID={s_id} | Paper='{paper_format_name}' | Printer='{printer_name}'")
-        print(f"Einträge in DB für ID {s_id}: {len(all_potential)}")
+    def get(self, supplier_label_id: int, paper_format_name: str, printer_name: str):
+        key = self._key(supplier_label_id, paper_format_name, printer_name)
+        # Boxen, die ein anderer Prozess gespeichert oder geändert hat, verwerfen den Cache
+        stamp = change_stamp()
+        if stamp != self._stamp:
+            self._cache.clear()
+            self._stamp = stamp
+        if key in self._cache:
+            return self._cache[key]
 
-        for row in all_potential:
-            # Vergleich mit sichtbaren Markierungen (|), um Leerzeichen zu finden
-            p_match = (row.paper_format_name == paper_format_name)
-            pr_match = (row.printer_name == printer_name)
+        s_id, printer, paper = key
+        # Ein einziger Lookup über den Index (supplier_label_id, printer_name, paper_format_name)
+        with instrumentation.span("db_lookup", table="crop_data"), session_scope() as session:
+            row = (
+                session.query(CropData)
+                .filter_by(supplier_label_id=s_id, printer_name=printer, paper_format_name=paper)
+                .first()
+            )
 
-            print(f"Check DB-Zeile: Paper='|{row.paper_format_name}|' (Match: {p_match})")
-            print(f"Check DB-Zeile: Printer='|{row.printer_name}|' (Match: {pr_match})")
+            if logger.isEnabledFor(logging.DEBUG):
+                self._debug_dump(session, s_id, paper, printer, row)
 
-            if p_match and pr_match:
-                print(">>> MATCH GEFUNDEN!")
-                return row
+        # Fehlanzeigen nicht merken: die Box kann jederzeit in der GUI angelegt werden
+        if row is not None:
+            self._cache[key] = row
+        return row
 
-        print("--- REPO DEBUG ENDE (KEIN MATCH) ---")
-        return None
+    @staticmethod
+    def _debug_dump(session, s_id, paper_format_name: str, printer_name: str, row):
+        logger.debug("Gesucht: ID=%s | Paper='%s' | Printer='%s' -> %s",
+                     s_id, paper_format_name, printer_name, "MATCH" if row else "KEIN MATCH")
+        if row is None:
+            # Vorhandene Einträge für diese ID, mit Markierungen (|) um Leerzeichen zu finden
+            for r in session.query(CropData).filter_by(supplier_label_id=s_id):
+                logger.debug("Vorhanden: Paper='|%s|' Printer='|%s|'", r.paper_format_name, r.printer_name)
 
     def get_by_label(self, supplier_label_id: int):
-        return (
-            self.session.query(CropData)
-            .filter_by(supplier_label_id=supplier_label_id)
-            .first()
-        )
+        with session_scope() as session:
+            return (
+                session.query(CropData)
+                .filter_by(supplier_label_id=supplier_label_id)
+                .first()
+            )
 
     def get_all_by_label_id(self, label_id: int):
         """
         Gibt alle gespeicherten Boundingbox-Konfigurationen für einen Label-Typ zurück.
         """
-        from db.models import CropData # Falls nicht schon oben importiert
-        return (
-            self.session.query(CropData)
-            .filter_by(supplier_label_id=label_id)
-            .all()
-        )
+        with session_scope() as session:
+            return (
+                session.query(CropData)
+                .filter_by(supplier_label_id=label_id)
+                .all()
+            )
 
     def add_or_update(self, label_id, printer, paper, x0, y0, x1, y1, rotation):
-        # Wir suchen nach der EXAKTEN Kombination aus dem "Dreiklang"
-        existing = self.session.query(CropData).filter_by(
-            supplier_label_id=label_id,
-            printer_name=printer,
-            paper_format_name=paper
-        ).first()
-
-        if existing:
-            # Nur wenn Label + Drucker + Papier gleich sind, wird aktualisiert
-            print(f"DEBUG_REPO: Update bestehender Box (ID:{label_id}, Printer:{printer}, Paper:{paper})")
-            existing.crop_x0, existing.crop_y0 = x0, y0
-            existing.crop_x1, existing.crop_y1 = x1, y1
-            existing.rotation = rotation
-        else:
-            # Wenn eine der drei Komponenten abweicht -> Neuer Datensatz!
-            print(f"DEBUG_REPO: Erstelle NEUEN Datensatz (ID:{label_id}, Printer:{printer}, Paper:{paper})")
-            new_crop = CropData(
+        # Schreibsperre ab dem Lesen, damit keine andere Station dazwischen denselben Eintrag anlegt
+        with session_scope(write=True) as session:
+            # Wir suchen nach der EXAKTEN Kombination aus dem "Dreiklang"
+            existing = session.query(CropData).filter_by(
                 supplier_label_id=label_id,
                 printer_name=printer,
-                paper_format_name=paper,
-                crop_x0=x0, crop_y0=y0,
-                crop_x1=x1, crop_y1=y1,
-                rotation=rotation
-            )
-            self.session.add(new_crop)
+                paper_format_name=paper
+            ).first()
+
+            if existing:
+                # Nur wenn Label + Drucker + Papier gleich sind, wird aktualisiert
+                logger.debug("Update bestehender Box (ID:%s, Printer:%s, Paper:%s)", label_id, printer, paper)
+                existing.crop_x0, existing.crop_y0 = x0, y0
+                existing.crop_x1, existing.crop_y1 = x1, y1
+                existing.rotation = rotation
+            else:
+                # Wenn eine der drei Komponenten abweicht -> Neuer Datensatz!
+                logger.debug("Erstelle NEUEN Datensatz (ID:%s, Printer:%s, Paper:%s)", label_id, printer, paper)
+                new_crop = CropData(
+                    supplier_label_id=label_id,
+                    printer_name=printer,
+                    paper_format_name=paper,
+                    crop_x0=x0, crop_y0=y0,
+                    crop_x1=x1, crop_y1=y1,
+                    rotation=rotation
+                )
+                session.add(new_crop)
+                existing = new_crop
+
+            label = session.get(ShippingLabelType, label_id)
+            if label is not None:
+                record_change(session, CROP, UPSERT, crop_key(existing, label), crop_data(existing))
 
-        self.session.commit()
\ No newline at end of file
+        self._cache.pop(self._key(label_id, paper, printer), None)
@@ -1,16 +1,116 @@
 # database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from db.models import   mapper_registry
+import logging
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, Index
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from db.models import   mapper_registry, CropData
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = "labellobster.db"
 
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
-SessionLocal = sessionmaker(bind=engine)
+# Für mehrere Stationen/Threads auf derselben Datenbank-Datei (gleicher Rechner - WAL
+# funktioniert nicht über Netzlaufwerke). Wird für jede neue Verbindung gesetzt.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",          # Leser und Schreiber blockieren sich nicht gegenseitig
+    "synchronous": "NORMAL",        # Mit WAL absturzsicher, spart den fsync pro Commit
+    "cache_size": -16000,           # 16 MB Seiten-Cache je Verbindung (negativ = KiB)
+    "mmap_size": 64 * 1024 * 1024,  # Lesen über Memory-Mapping statt read()
+    "busy_timeout": 5000,           # Bis zu 5 s auf eine Sperre warten statt "database is locked"
+}
+
+# Verbindungen pro Prozess: genug für GUI, Druck- und Hintergrund-Threads
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 5
+POOL_TIMEOUT_S = 30
+
+# Engine und Schema werden erst beim ersten Zugriff angelegt (nicht schon beim Import),
+# damit das Hauptfenster ohne Datenbank-Zugriff erscheinen kann
+_engine = None
+_sessions = None
+_init_lock = threading.Lock()
+
+
+def ensure_indexes(engine):
+    """
+    create_all legt Indizes nur für neue Tabellen an. Ältere Datenbanken bekommen
+    den Lookup-Index hier nachträglich. Enthält die Tabelle bereits Duplikate,
+    wird ersatzweise ein nicht-eindeutiger Index angelegt.
+    """
+    for index in list(CropData.__table__.indexes):
+        try:
+            index.create(engine, checkfirst=True)
+        except IntegrityError:
+            logger.warning("%s konnte nicht eindeutig angelegt werden (doppelte Einträge in crop_data)", index.name)
+            fallback = Index("ix_crop_data_label_printer_paper", *index.columns)
+            fallback.create(engine, checkfirst=True)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    # Transaktionen selbst beginnen (siehe _on_begin) statt dem impliziten BEGIN von pysqlite
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _on_begin(conn):
+    # Schreibende Arbeitseinheiten holen sich die Schreibsperre gleich am Anfang (busy_timeout greift).
+    # Ein späteres Hochstufen einer Lese-Transaktion würde unter WAL sofort mit SQLITE_BUSY scheitern.
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get("sqlite_write") else "BEGIN")
+
+
+def get_engine():
+    """Öffnet die SQLite-Datenbank beim ersten Aufruf und legt fehlende Tabellen/Indizes an."""
+    global _engine, _sessions
+    with _init_lock:
+        if _engine is None:
+            engine = create_engine(
+                f"sqlite:///{DB_PATH}", echo=False,
+                # Eine Verbindung gehört immer nur dem Thread, der sie gerade aus dem Pool hat
+                connect_args={"check_same_thread": False},
+                pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT_S
+            )
+            event.listen(engine, "connect", _on_connect)
+            event.listen(engine, "begin", _on_begin)
+
+            # Tabellen erzeugen, falls DB neu ist
+            mapper_registry.metadata.create_all(engine)
+            ensure_indexes(engine)
+
+            # Eine Session pro Thread; Objekte bleiben nach dem Commit lesbar (kein erneutes Laden)
+            _sessions = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+            _engine = engine
+    return _engine
+
 
-# Tabellen erzeugen, falls DB neu ist
-mapper_registry.metadata.create_all(engine)
+def get_session() -> Session:
+    """Session des aktuellen Threads."""
+    get_engine()
+    return _sessions()
 
-def get_session():
-    return SessionLocal()
 
+@contextmanager
+def session_scope(write: bool = False):
+    """
+    Kurze Arbeitseinheit mit der Session des aktuellen Threads: Commit bei Erfolg,
+    Rollback bei Fehler. Danach wird die Session geleert und die Verbindung geht
+    zurück in den Pool - geladene Objekte bleiben (losgelöst) lesbar.
+    """
+    session = get_session()
+    if write:
+        session.connection(execution_options={"sqlite_write": True})
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
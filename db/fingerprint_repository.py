@@ -0,0 +1,44 @@
+# fingerprint_repository.py
+from db.change_log import change_stamp
+from db.database import session_scope
+from db.models import LabelFingerprint
+
+
+class LabelFingerprintRepository:
+    """Jede Methode ist eine eigene kurze Arbeitseinheit (siehe session_scope)."""
+    # Wird bei jeder Änderung hochgezählt (für den Such-Index, siehe get_fingerprint_index)
+    _version = 0
+
+    @property
+    def version(self) -> tuple:
+        # Wie ShippingLabelRepository.catalogue_version: gelöschte Typen anderer Prozesse über den Datenbank-Stand
+        return LabelFingerprintRepository._version, change_stamp()
+
+    @staticmethod
+    def invalidate():
+        LabelFingerprintRepository._version += 1
+
+    def list_all(self) -> list[LabelFingerprint]:
+        with session_scope() as session:
+            return session.query(LabelFingerprint).all()
+
+    def get_by_label(self, label_type_id: int) -> list[LabelFingerprint]:
+        with session_scope() as session:
+            return session.query(LabelFingerprint).filter_by(label_type_id=label_type_id).all()
+
+    def add(self, label_type_id: int, page_width: float, page_height: float, fingerprint: str) -> bool:
+        """Speichert einen Fingerabdruck; False, wenn genau dieser für den Typ schon bekannt ist."""
+        with session_scope(write=True) as session:
+            exists = session.query(LabelFingerprint.id).filter_by(
+                label_type_id=label_type_id, fingerprint=fingerprint).first()
+            if exists:
+                return False
+            session.add(LabelFingerprint(label_type_id=label_type_id, page_width=page_width,
+                                         page_height=page_height, fingerprint=fingerprint))
+        self.invalidate()
+        return True
+
+    def delete_by_label(self, label_type_id: int):
+        with session_scope(write=True) as session:
+            session.query(LabelFingerprint).filter_by(label_type_id=label_type_id).delete()
+        self.invalidate()
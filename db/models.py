@@ -1,6 +1,6 @@
 # models.py
 from sqlalchemy.orm import registry, relationship
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 
 mapper_registry = registry()
 
@@ -20,6 +20,11 @@ class ShippingLabelType:
 @mapper_registry.mapped
 class CropData:
     __tablename__ = "crop_data"
+    __table_args__ = (
+        # Eine Box pro "Dreiklang" aus Label, Drucker und Papier; dient zugleich als Lookup-Index
+        Index("ux_crop_data_label_printer_paper",
+              "supplier_label_id", "printer_name", "paper_format_name", unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     supplier_label_id = Column(Integer, ForeignKey("shipping_label_type.id"))
@@ -33,4 +38,39 @@ class CropData:
     crop_y1 = Column(Float)
     rotation = Column(Integer)
 
-    label = relationship("ShippingLabelType", back_populates="crops")
\ No newline at end of file
+    label = relationship("ShippingLabelType", back_populates="crops")
+
+
+@mapper_registry.mapped
+class ChangeLog:
+    """Jede Änderung an Label-Typen und Crops, fortlaufend nummeriert (Grundlage für den Abgleich zwischen Stationen)."""
+    __tablename__ = "change_log"
+
+    version = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # "label_type" oder "crop"
+    op = Column(String, nullable=False)      # "upsert" oder "delete"
+    key = Column(String, nullable=False)     # Fachlicher Schlüssel als JSON (IDs unterscheiden sich je Station)
+    data = Column(String)                    # Neue Werte als JSON (bei "delete" leer)
+    created = Column(Float)
+
+
+@mapper_registry.mapped
+class SyncState:
+    """Bis zu welcher Version die Änderungen einer Gegenstelle schon übernommen wurden."""
+    __tablename__ = "sync_state"
+
+    peer = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    etag = Column(String)
+
+
+@mapper_registry.mapped
+class LabelFingerprint:
+    """Gelernter Layout-Fingerabdruck eines Label-Typs (Erkennung ohne Textebene/Keywords)."""
+    __tablename__ = "label_fingerprint"
+
+    id = Column(Integer, primary_key=True)
+    label_type_id = Column(Integer, ForeignKey("shipping_label_type.id"), index=True)
+    page_width = Column(Float)
+    page_height = Column(Float)
+    fingerprint = Column(String)  # 192 Bit als Hex (SQLite-Integer haben nur 64 Bit mit Vorzeichen)
@@ -1,18 +1,33 @@
 # repository.py
 from typing import List
 
-from sqlalchemy.orm import Session
-from db.models import ShippingLabelType
+from db.change_log import DELETE, LABEL_TYPE, UPSERT, change_stamp, label_data, label_key, record_change
+from db.database import session_scope
+from db.fingerprint_repository import LabelFingerprintRepository
+from db.models import LabelFingerprint, ShippingLabelType
 
 class ShippingLabelRepository:
-    def __init__(self, session: Session):
-        self.session = session
+    """Jede Methode ist eine eigene kurze Arbeitseinheit (siehe session_scope)."""
+    # Wird bei jeder Katalog-Änderung hochgezählt (für abgeleitete Caches, z.B. Keyword-Automat)
+    _catalogue_version = 0
+
+    @property
+    def catalogue_version(self) -> tuple:
+        # Lokale Änderungen sofort, Änderungen anderer Prozesse über den Datenbank-Stand
+        return ShippingLabelRepository._catalogue_version, change_stamp()
+
+    @staticmethod
+    def invalidate():
+        """Katalog hat sich geändert (auch von außen, z.B. durch den Abgleich mit anderen Stationen)."""
+        ShippingLabelRepository._catalogue_version += 1
 
     def list_all(self):
-        return self.session.query(ShippingLabelType).all()
+        with session_scope() as session:
+            return session.query(ShippingLabelType).all()
 
     def get_by_id(self, id: int):
-        return self.session.query(ShippingLabelType).filter_by(id=id).first()
+        with session_scope() as session:
+            return session.query(ShippingLabelType).filter_by(id=id).first()
 
     def add(self, carrier, label_type, keywords):
         obj = ShippingLabelType(
@@ -20,22 +35,34 @@ class ShippingLabelRepository:
             label_type=label_type,
             keywords=keywords
         )
-        self.session.add(obj)
-        self.session.commit()
+        with session_scope(write=True) as session:
+            session.add(obj)
+            record_change(session, LABEL_TYPE, UPSERT, label_key(obj), label_data(obj))
+        self.invalidate()
 
     def update(self, id, carrier, label_type, keywords):
-        obj = self.get_by_id(id)
-        if obj:
+        with session_scope(write=True) as session:
+            obj = session.query(ShippingLabelType).filter_by(id=id).first()
+            if not obj:
+                return
+            # Schlüssel vor der Änderung protokollieren, damit andere Stationen Umbenennungen zuordnen können
+            old_key = label_key(obj)
             obj.carrier = carrier
             obj.label_type = label_type
             obj.keywords = keywords
-            self.session.commit()
+            record_change(session, LABEL_TYPE, UPSERT, old_key, label_data(obj))
+        self.invalidate()
 
     def delete(self, id):
-        obj = self.get_by_id(id)
-        if obj:
-            self.session.delete(obj)
-            self.session.commit()
+        with session_scope(write=True) as session:
+            obj = session.query(ShippingLabelType).filter_by(id=id).first()
+            if not obj:
+                return
+            session.delete(obj)
+            session.query(LabelFingerprint).filter_by(label_type_id=id).delete()
+            record_change(session, LABEL_TYPE, DELETE, label_key(obj))
+        self.invalidate()
+        LabelFingerprintRepository.invalidate()
 
     def get_all(self) -> list[type[ShippingLabelType]]:
         """
@@ -43,4 +70,5 @@ class ShippingLabelRepository:
         """
         # .all() gibt Instanzen zurück, keine Typen.
         # Die Typ-Warnung rührt oft daher, wie die IDE die 'mapped' Klasse interpretiert.
-        return self.session.query(ShippingLabelType).all()
\ No newline at end of file
+        with session_scope() as session:
+            return session.query(ShippingLabelType).all()
\ No newline at end of file
@@ -1,10 +1,182 @@
-import qt_themes
-from PySide6 import QtWidgets
-from windows.main_window import MainWindow
+import argparse
+import multiprocessing
+import sys
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="labellobster")
+    parser.add_argument("--log-level", default="WARNING",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Log-Level (Standard: WARNING)")
+    parser.add_argument("--log-format", default="text", choices=["text", "json"],
+                        help="Log-Format: Text oder eine JSON-Zeile je Meldung (Standard: text)")
+    parser.add_argument("--log-file", metavar="DATEI",
+                        help="Log zusätzlich in diese Datei schreiben (Profile landen im selben Ordner)")
+    parser.add_argument("--profile-seconds", type=float, metavar="N",
+                        help="Ab dem Start N Sekunden lang ein Profil aufzeichnen (.pstats und .collapsed)")
+    parser.add_argument("--profile-jobs", type=int, metavar="N",
+                        help="Profil für die nächsten N Jobs aufzeichnen (mit --profile-seconds: was zuerst eintritt)")
+    parser.add_argument("--trace", metavar="DATEI",
+                        help="Zeiten der Verarbeitungsschritte als Chrome-Trace (JSON) schreiben")
+    parser.add_argument("--metrics", metavar="DATEI",
+                        help="Prometheus-Textdatei mit Zeiten und Job-Zählern schreiben")
+    parser.add_argument("--startup-timing", action="store_true",
+                        help="Startphasen und Importzeiten je Modul ausgeben")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # labellobster batch <pdfs...>
+    batch = subparsers.add_parser("batch", help="Label-PDFs ohne Hauptfenster croppen und drucken")
+    batch.add_argument("inputs", nargs="+", help="PDF-Dateien, Glob-Muster oder Ordner")
+    batch.add_argument("--printer", help="Druckername (Standard: zuletzt in der GUI gewählt)")
+    batch.add_argument("--paper", help="Papierformat (Standard: zuletzt in der GUI gewählt)")
+    batch.add_argument("--workers", type=int, default=None, help="Anzahl Worker-Prozesse")
+    batch.add_argument("--output-dir", help="Gecroppte PDFs in diesem Ordner ablegen")
+    batch.add_argument("--dry-run", action="store_true", help="Nur erkennen und croppen, nicht drucken")
+    batch.add_argument("--multi-page", action="store_true",
+                       help="Jede Seite einzeln erkennen; alle Labels einer PDF als ein Druckauftrag")
+    batch.add_argument("--output-format", default="pdf", choices=["pdf", "g4-pdf", "g4-tiff"],
+                       help="Format der abgelegten Crops (nur mit --output-dir): Vektor-PDF oder 1-Bit-Raster "
+                            "mit CCITT-G4 (Standard: pdf)")
+    batch.add_argument("--auto-crop", action="store_true",
+                       help="Labels ohne Typ oder ohne gespeicherte Box automatisch zuschneiden")
+
+    # labellobster watch <ordner>
+    watch = subparsers.add_parser("watch", help="Hot-Folder überwachen und neue PDFs automatisch drucken")
+    watch.add_argument("directory", help="Zu überwachender Ordner")
+    watch.add_argument("--printer", help="Druckername (Standard: zuletzt in der GUI gewählt)")
+    watch.add_argument("--paper", help="Papierformat (Standard: zuletzt in der GUI gewählt)")
+    watch.add_argument("--identify-workers", type=int, default=2, help="Parallelität der Erkennungs-Stufe")
+    watch.add_argument("--crop-workers", type=int, default=2, help="Parallelität der Crop-Stufe")
+    watch.add_argument("--print-workers", type=int, default=1, help="Parallelität der Druck-Stufe")
+    watch.add_argument("--queue-size", type=int, default=8, help="Maximale Jobs zwischen zwei Stufen")
+    watch.add_argument("--poll-interval", type=float, default=1.0, help="Polling-Intervall in Sekunden")
+    watch.add_argument("--force-polling", action="store_true", help="Polling statt inotify verwenden")
+    watch.add_argument("--dry-run", action="store_true", help="Nur erkennen und croppen, nicht drucken")
+    watch.add_argument("--auto-crop", action="store_true",
+                       help="Labels ohne Typ oder ohne gespeicherte Box automatisch zuschneiden")
+
+    # labellobster learn-layout <label-typ-id> <pdfs...>
+    learn = subparsers.add_parser("learn-layout",
+                                  help="Layouts von Beispiel-PDFs für einen Label-Typ lernen (Erkennung ohne Text)")
+    learn.add_argument("label_type_id", type=int, help="ID des Label-Typs")
+    learn.add_argument("inputs", nargs="+", help="PDF-Dateien, Glob-Muster oder Ordner")
+
+    # labellobster serve / sync <url>
+    serve = subparsers.add_parser("serve", help="Label-Typen und Crops für andere Stationen bereitstellen")
+    serve.add_argument("--host", default="127.0.0.1", help="Adresse (Standard: nur localhost; 0.0.0.0 für alle)")
+    serve.add_argument("--port", type=int, default=8765, help="Port (Standard: 8765)")
+    sync = subparsers.add_parser("sync", help="Label-Typen und Crops von einer anderen Station übernehmen")
+    sync.add_argument("url", help="Adresse der Gegenstelle, z.B. http://station1:8765")
+    sync.add_argument("--interval", type=float, default=0.0,
+                      help="Fortlaufend alle N Sekunden abgleichen (Standard: einmal)")
+
+    # labellobster bench
+    bench = subparsers.add_parser("bench", help="Benchmarks mit synthetischen Carrier-PDFs ausführen")
+    bench.add_argument("--output", help="Ergebnisdatei (JSON, Standard: benchmark-<Zeitpunkt>.json)")
+    bench.add_argument("--baseline", help="Mit diesem früheren Ergebnis vergleichen (Exit-Code 1 bei Verschlechterung)")
+    bench.add_argument("--tolerance", type=float, default=0.25,
+                       help="Erlaubte Verlangsamung gegenüber der Baseline (Standard: 0.25 = 25 %%)")
+    bench.add_argument("--repeat", type=int, default=5, help="Messungen je Fall (Standard: 5)")
+    bench.add_argument("--corpus-dir", help="Ordner für die erzeugten PDFs (werden wiederverwendet)")
+    bench.add_argument("--sizes", default="A4,A6", help="Seitenformate (Standard: A4,A6)")
+    bench.add_argument("--pages", default="1,50,500", help="Seitenzahlen der Dokumente (Standard: 1,50,500)")
+    bench.add_argument("--filter", help="Nur Fälle, deren Name diesen Text enthält")
+
+    return parser
+
+
+def run_gui():
+    from modules import startup_timing
+    import qt_themes
+    from PySide6 import QtCore, QtWidgets
+    from windows.main_window import MainWindow
+    startup_timing.mark("Qt und Hauptfenster importiert")
 
-if __name__ == "__main__":
     app = QtWidgets.QApplication()
     qt_themes.set_theme('one_dark_two')
+    startup_timing.mark("QApplication und Theme bereit")
     window = MainWindow()
     window.show()
-    app.exec()
+
+    # Python-Signalhandler (Profiling per SIGUSR1) laufen nur, wenn der Interpreter zum Zug kommt -
+    # in der Qt-Ereignisschleife also erst beim nächsten Python-Aufruf. Der Timer sorgt dafür.
+    signal_timer = QtCore.QTimer()
+    signal_timer.timeout.connect(lambda: None)
+    signal_timer.start(500)
+    startup_timing.mark("Hauptfenster angezeigt")
+
+    def on_ready():
+        startup_timing.mark("PDF-, Druck- und Datenbankteil geladen")
+        startup_timing.report()
+    window.subsystems_ready.connect(on_ready)
+    return app.exec()
+
+
+def run_command(args) -> int:
+    if args.command == "batch":
+        from modules.batch import run_batch
+        return run_batch(args.inputs, args.printer, args.paper, args.workers, args.output_dir,
+                         args.dry_run, args.multi_page, args.output_format, args.auto_crop)
+
+    if args.command == "watch":
+        from modules.hot_folder import run_hot_folder
+        return run_hot_folder(args.directory, args.printer, args.paper, args.identify_workers,
+                              args.crop_workers, args.print_workers, args.queue_size,
+                              args.poll_interval, args.force_polling, args.dry_run, args.auto_crop)
+
+    if args.command == "learn-layout":
+        from modules.batch import run_learn_layout
+        return run_learn_layout(args.label_type_id, args.inputs)
+
+    if args.command == "serve":
+        from modules.sync_service import run_server
+        return run_server(args.host, args.port)
+
+    if args.command == "sync":
+        from modules.sync_service import run_sync
+        return run_sync(args.url, args.interval)
+
+    if args.command == "bench":
+        from modules.benchmark import run_benchmarks
+        return run_benchmarks(args.output, args.baseline, args.tolerance, args.repeat, args.corpus_dir,
+                              tuple(args.sizes.split(",")), tuple(int(p) for p in args.pages.split(",")),
+                              args.filter)
+
+    return run_gui()
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # Das Format betrifft nur die abgelegten Dateien - ohne Ordner würde es stillschweigend ignoriert
+    if args.command == "batch" and args.output_format != "pdf" and not args.output_dir:
+        parser.error(f"--output-format {args.output_format} braucht --output-dir")
+    from modules import instrumentation
+    instrumentation.setup_logging(args.log_level, args.log_format, args.log_file)
+    if args.trace:
+        instrumentation.enable_trace(args.trace)
+    if args.metrics:
+        instrumentation.enable_metrics(args.metrics)
+
+    # Profiling: sofort per Kommandozeile, im laufenden Betrieb per "kill -USR1 <pid>" oder Menü
+    from modules import profiling
+    profiling.install_signal_handler()
+    if args.profile_seconds or args.profile_jobs:
+        profiling.start(args.profile_seconds, args.profile_jobs)
+
+    # Schwere Module (PyMuPDF, SQLAlchemy, NumPy) werden erst bei Bedarf geladen - das hier zeigt, was es kostet
+    if args.startup_timing:
+        from modules import startup_timing
+        startup_timing.enable()
+        exit_code = run_command(args)
+        if args.command:
+            startup_timing.mark(f"Befehl '{args.command}' beendet")
+            startup_timing.report()
+        return exit_code
+
+    return run_command(args)
+
+
+if __name__ == "__main__":
+    # Nötig für Render-/Worker-Prozesse in eingefrorenen Windows-Builds
+    multiprocessing.freeze_support()
+    sys.exit(main())
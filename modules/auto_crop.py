@@ -0,0 +1,304 @@
+import fitz
+import numpy as np
+
+# Kandidaten kleiner als 5 % der Seite sind Barcodes, Logos oder Tabellenzellen - kein Label
+MIN_AREA = 0.05
+# Rahmen über (fast) die ganze Seite sind Seitenränder, kein Label-Rahmen
+MAX_AREA = 0.9
+# Zusätzlicher Rand um den Vorschlag in Punkten (Strichbreite des Rahmens kommt noch dazu)
+PADDING = 2.0
+
+# Scans: Vorschaubild mit geringer Auflösung statt Vektorstruktur
+RASTER_DPI = 40
+SCAN_COVERAGE = 0.5     # Seite ohne Text, deren Bilder mehr als die Hälfte bedecken = Scan
+EDGE_STEP = 60          # Helligkeitssprung zwischen Nachbarpixeln, der als Kante zählt
+LINE_MIN = 0.25         # Rahmenlinie: ununterbrochen über mindestens 25 % der Seitenbreite/-höhe
+BORDER_IGNORE = 0.02    # Kanten so nah am Seitenrand stammen vom Scanner (Deckel, Schatten)
+FRAME_TOLERANCE = 0.03  # Rahmenlinien enden höchstens 3 % der Seite vor bzw. hinter den Ecken
+FRAME_INK_OUTSIDE = 0.2  # Mehr dunkle Pixel außerhalb: kein Label-Rahmen (Hinweistexte auf A4: ca. 10 %)
+INK_MIN = 0.01          # Zeile/Spalte mit mindestens 1 % dunkler Pixel enthält Inhalt
+GAP_MAX = 0.04          # Leerraum bis 4 % der Seite gehört zum selben Abschnitt
+SPAN_MIN_MASS = 0.01    # Abschnitte mit weniger als 1 % der dunklen Pixel sind Störungen (lieber zu viel als abgeschnitten)
+INK_LEVEL = 200         # Höchster Grauwert, der als dunkel zählt
+
+
+class CropProposal:
+    """Vorgeschlagener Ausschnitt in PDF-Punkten (Seitenkoordinaten wie in der Anzeige)."""
+
+    __slots__ = ("rect", "rotation", "source")
+
+    def __init__(self, rect: fitz.Rect, rotation: int, source: str):
+        self.rect = rect
+        self.rotation = rotation  # 90: Box quer zum Papier (wie beim Umklappen der AspectBox)
+        self.source = source      # "drawing", "image", "content" bzw. bei Scans "frame", "projection"
+
+    def coords(self) -> dict:
+        r = self.rect
+        return {"x0": round(r.x0, 2), "y0": round(r.y0, 2), "x1": round(r.x1, 2), "y1": round(r.y1, 2),
+                "width": round(r.width, 2), "height": round(r.height, 2)}
+
+    def __repr__(self):
+        return f"CropProposal({self.source}, {self.rect}, rotation={self.rotation})"
+
+
+# ---------------------------------------------------------
+# Bausteine der Seite (ohne Rastern)
+# ---------------------------------------------------------
+def _is_visible(drawing: dict) -> bool:
+    # Weiße Flächen ohne Kontur (Hintergründe, Abdeckungen) zählen nicht als Inhalt
+    fill = drawing.get("fill")
+    return drawing.get("color") is not None or (fill is not None and tuple(fill) != (1.0, 1.0, 1.0))
+
+
+def _is_frame(drawing: dict) -> bool:
+    """Umrandetes Rechteck: ein gezeichnetes 're'/'qu' oder ein geschlossener Linienzug."""
+    if drawing.get("color") is None:
+        return False
+    kinds = [item[0] for item in drawing["items"]]
+    return kinds in (["re"], ["qu"]) or (len(kinds) >= 3 and set(kinds) == {"l"} and drawing.get("closePath", True))
+
+
+def page_elements(page: fitz.Page):
+    """
+    Textblöcke, sichtbare Zeichnungen, Bilder und die umrandeten Rechtecke einer Seite.
+    PyMuPDF liefert sie in unrotierten Koordinaten; hier umgerechnet in die der Anzeige.
+    """
+    to_page = page.rotation_matrix
+    bounds = page.rect
+
+    def visual(rect) -> fitz.Rect:
+        return (fitz.Rect(rect) * to_page) & bounds
+
+    texts = [visual(b[:4]) for b in page.get_text("blocks") if b[6] == 0 and b[4].strip()]
+    drawings = [d for d in page.get_drawings() if _is_visible(d)]
+    shapes = [visual(d["rect"]) for d in drawings]
+    frames = [(visual(d["rect"]), d.get("width") or 1.0) for d in drawings if _is_frame(d)]
+    images = [visual(info["bbox"]) for info in page.get_image_info()]
+    clusters = [visual(r) for r in page.cluster_drawings(drawings=drawings)] if drawings else []
+    return texts, shapes, frames, images, clusters
+
+
+def _inside(inner: fitz.Rect, outer: fitz.Rect, tolerance: float = 1.0) -> bool:
+    return (inner.x0 >= outer.x0 - tolerance and inner.y0 >= outer.y0 - tolerance
+            and inner.x1 <= outer.x1 + tolerance and inner.y1 <= outer.y1 + tolerance)
+
+
+# ---------------------------------------------------------
+# Vorschlag
+# ---------------------------------------------------------
+def find_label_rect(page: fitz.Page) -> tuple[fitz.Rect, str, float] | None:
+    """
+    Sucht den Bereich des Labels: einen Rahmen (oder eine Zeichnungsgruppe) bzw. ein großes
+    eingebettetes Bild, das möglichst viel vom übrigen Inhalt umschließt. Ohne solchen
+    Kandidaten: die Hülle des gesamten Inhalts. Gibt (Rechteck, Quelle, Strichbreite) zurück.
+    """
+    texts, shapes, frames, images, clusters = page_elements(page)
+    content = [r for r in texts + shapes + images if not r.is_empty]
+    if not content:
+        return None
+    # Bewertet wird nach Bausteinen: Textblöcke, Bilder und Zeichnungsgruppen (ein Barcode zählt
+    # als einer, nicht als hundert Striche)
+    units = [r for r in texts + images + clusters if not r.is_empty]
+
+    page_area = abs(page.rect)
+    candidates = [(rect, "drawing", width) for rect, width in frames]
+    candidates += [(rect, "drawing", 0.0) for rect in clusters]
+    candidates += [(rect, "image", 0.0) for rect in images]
+
+    best, best_score = None, None
+    for rect, source, width in candidates:
+        if not MIN_AREA * page_area <= abs(rect) <= MAX_AREA * page_area:
+            continue
+        contained = sum(1 for r in units if r != rect and _inside(r, rect, width + 1.0))
+        # Ein Rahmen um nichts ist Dekoration; ein großes Bild kann das Label selbst sein
+        if source == "drawing" and contained == 0:
+            continue
+        # Die meisten Bausteine gewinnen, bei Gleichstand die größere Fläche
+        score = (contained, abs(rect))
+        if best_score is None or score > best_score:
+            best, best_score = (rect, source, width), score
+    if best is not None:
+        return best
+
+    hull = fitz.Rect(content[0])
+    for r in content[1:]:
+        hull |= r
+    return hull, "content", 0.0
+
+
+# ---------------------------------------------------------
+# Scans: Projektionen und Kanten eines Vorschaubilds
+# ---------------------------------------------------------
+def is_scanned(page: fitz.Page) -> bool:
+    """Nur Bild, keine Textebene: die Vektorstruktur verrät nichts über das Label."""
+    if page.get_text("text").strip():
+        return False
+    page_area = abs(page.rect)
+    covered = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    return covered > SCAN_COVERAGE * page_area
+
+
+def render_gray(page: fitz.Page, dpi: float = RASTER_DPI) -> np.ndarray:
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def _longest_runs(mask: np.ndarray) -> np.ndarray:
+    """Längste ununterbrochene Folge von True je Zeile (vektorisiert, ohne Python-Schleife)."""
+    h, w = mask.shape
+    positions = np.broadcast_to(np.arange(1, w + 1), (h, w))
+    # Position der letzten Lücke links von jedem Pixel; Abstand dazu = laufende Länge
+    last_gap = np.maximum.accumulate(np.where(mask, 0, positions), axis=1)
+    return (positions - last_gap).max(axis=1) if w else np.zeros(h, dtype=int)
+
+
+def _line_positions(edges: np.ndarray, min_length: int, margin: int) -> np.ndarray:
+    runs = _longest_runs(edges)
+    runs[:margin] = 0
+    runs[len(runs) - margin:] = 0
+    return np.flatnonzero(runs >= min_length)
+
+
+def _line_extent(line: np.ndarray) -> tuple[int, int] | None:
+    """Anfang und Ende (exklusiv) der längsten ununterbrochenen Folge von True."""
+    steps = np.diff(np.concatenate(([0], line.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(steps == 1), np.flatnonzero(steps == -1)
+    if starts.size == 0:
+        return None
+    longest = np.argmax(ends - starts)
+    return starts[longest], ends[longest]
+
+
+def _is_label_frame(h_edges: np.ndarray, v_edges: np.ndarray, ink: np.ndarray, rect: tuple) -> bool:
+    """
+    Bilden die äußersten Linien wirklich einen Rahmen? Die Seitenlinien müssen genau von der oberen
+    bis zur unteren Linie reichen (und umgekehrt) - sonst sind es z.B. innere Trennlinien eines Labels,
+    dessen Außenkanten am Seitenrand liegen. Außerdem muss fast der ganze Inhalt innerhalb liegen.
+    """
+    x0, y0, x1, y1 = rect
+    h, w = ink.shape
+    tolerance = max(2, int(FRAME_TOLERANCE * max(h, w)))
+
+    def spans(line, start, stop) -> bool:
+        extent = _line_extent(line)
+        return extent is not None and abs(extent[0] - start) <= tolerance and abs(extent[1] - stop) <= tolerance
+
+    # Kanten-Positionen ±1 Pixel (Strichbreite, JPEG-Unschärfe)
+    for col in (x0, x1 - 2):
+        if not spans(v_edges[:, max(col - 1, 0):col + 2].any(axis=1), y0, y1):
+            return False
+    for row in (y0, y1 - 2):
+        if not spans(h_edges[max(row - 1, 0):row + 2].any(axis=0), x0, x1):
+            return False
+
+    total = np.count_nonzero(ink)
+    inside = np.count_nonzero(ink[y0:y1, x0:x1])
+    return total > 0 and inside > 0 and total - inside <= FRAME_INK_OUTSIDE * total
+
+
+def _content_span(profile: np.ndarray, min_value: float, max_gap: int) -> tuple[int, int] | None:
+    """
+    Bereich mit Inhalt im Profil. Abschnitte (getrennt durch Lücken über max_gap) mit
+    weniger als SPAN_MIN_MASS des Inhalts - Staub, Seitenzahlen, Lochungen - fallen weg.
+    """
+    filled = np.flatnonzero(profile >= min_value)
+    if filled.size == 0:
+        return None
+    splits = np.flatnonzero(np.diff(filled) > max_gap + 1) + 1
+    parts = np.split(filled, splits)
+    masses = np.array([profile[part].sum() for part in parts])
+    kept = [part for part, mass in zip(parts, masses) if mass >= SPAN_MIN_MASS * masses.sum()]
+    return kept[0][0], kept[-1][-1] + 1
+
+
+def find_label_rect_raster(page: fitz.Page, dpi: float = RASTER_DPI) -> tuple[fitz.Rect, str] | None:
+    """
+    Sucht das Label auf einem Scan: zuerst einen Rahmen aus langen waagerechten und
+    senkrechten Kanten, sonst den dichtesten Block der Zeilen-/Spalten-Projektionen
+    dunkler Pixel. Ergebnis in PDF-Punkten (gleiche Umrechnung wie get_pdf_coordinates).
+    """
+    gray = render_gray(page, dpi).astype(np.int16)
+    h, w = gray.shape
+    if h < 8 or w < 8:
+        return None
+
+    # Dunkel = deutlich dunkler als der Papierton (Median) - graues Recyclingpapier ist kein Inhalt
+    paper = int(np.median(gray))
+    ink = gray < min(paper - EDGE_STEP // 2, INK_LEVEL)
+
+    rect = None
+    # 1. Rahmen: Kanten (Helligkeitssprünge) zu langen Linien zusammenhängend
+    h_edges = np.abs(np.diff(gray, axis=0)) >= EDGE_STEP
+    v_edges = np.abs(np.diff(gray, axis=1)) >= EDGE_STEP
+    rows = _line_positions(h_edges, int(LINE_MIN * w), max(1, int(BORDER_IGNORE * h)))
+    cols = _line_positions(v_edges.T, int(LINE_MIN * h), max(1, int(BORDER_IGNORE * w)))
+    if rows.size >= 2 and cols.size >= 2:
+        y0, y1, x0, x1 = rows[0], rows[-1] + 2, cols[0], cols[-1] + 2
+        if (x1 - x0) * (y1 - y0) >= MIN_AREA * w * h and _is_label_frame(h_edges, v_edges, ink, (x0, y0, x1, y1)):
+            rect, source = (x0, y0, x1, y1), "frame"
+
+    # 2. Ohne Rahmen: Projektionsprofile (Anteil dunkler Pixel je Zeile/Spalte)
+    if rect is None:
+        gap = max(1, int(GAP_MAX * max(h, w)))
+        rows_span = _content_span(ink.mean(axis=1), INK_MIN, gap)
+        if rows_span is None:
+            return None
+        y0, y1 = rows_span
+        cols_span = _content_span(ink[y0:y1].mean(axis=0), INK_MIN, gap)
+        if cols_span is None:
+            return None
+        x0, x1 = cols_span
+        rect, source = (x0, y0, x1, y1), "projection"
+
+    # Pixel -> PDF-Punkte (Seite / Bild, wie get_pdf_coordinates)
+    scale_x, scale_y = page.rect.width / w, page.rect.height / h
+    x0, y0, x1, y1 = rect
+    return fitz.Rect(page.rect.x0 + x0 * scale_x, page.rect.y0 + y0 * scale_y,
+                     page.rect.x0 + x1 * scale_x, page.rect.y0 + y1 * scale_y), source
+
+
+def fit_to_ratio(rect: fitz.Rect, ratio: float, bounds: fitz.Rect) -> tuple[fitz.Rect, int]:
+    """
+    Erweitert 'rect' mittig auf das Seitenverhältnis (Breite/Höhe) des Papiers und hält es
+    innerhalb der Seite. Liegt das Label quer zum Papier, wird die Box gedreht (Rotation 90).
+    """
+    rotation = 0
+    if abs(ratio - 1.0) > 0.01 and (rect.width > rect.height) != (ratio > 1.0):
+        ratio, rotation = 1.0 / ratio, 90
+
+    w, h = rect.width, rect.height
+    if w <= 0 or h <= 0:
+        return fitz.Rect(rect), 0
+    if w / h < ratio:
+        w = h * ratio
+    else:
+        h = w / ratio
+    # Größer als die Seite: auf die Seite verkleinern (Verhältnis bleibt)
+    scale = min(1.0, bounds.width / w, bounds.height / h)
+    w, h = w * scale, h * scale
+
+    # Mittig um den Inhalt, dann in die Seite schieben
+    x0 = min(max(rect.x0 + (rect.width - w) / 2, bounds.x0), bounds.x1 - w)
+    y0 = min(max(rect.y0 + (rect.height - h) / 2, bounds.y0), bounds.y1 - h)
+    return fitz.Rect(x0, y0, x0 + w, y0 + h), rotation
+
+
+def propose_crop(page: fitz.Page, ratio: float | None = None) -> CropProposal | None:
+    """Schlägt einen Ausschnitt für das Label auf der Seite vor (optional passend zum Papier-Verhältnis)."""
+    if is_scanned(page):
+        found = find_label_rect_raster(page)
+        if found is None:
+            return None
+        (rect, source), stroke = found, 0.0
+    else:
+        found = find_label_rect(page)
+        if found is None:
+            return None
+        rect, source, stroke = found
+    pad = PADDING + stroke / 2
+    rect = (rect + (-pad, -pad, pad, pad)) & page.rect
+
+    rotation = 0
+    if ratio and ratio > 0:
+        rect, rotation = fit_to_ratio(rect, ratio, page.rect)
+    return CropProposal(rect, rotation, source)
@@ -0,0 +1,492 @@
+import glob
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+from PySide6.QtCore import QSettings
+
+from modules import instrumentation
+
+# Session und Repositories pro Worker-Prozess (werden im Initializer angelegt,
+# damit Keyword-Automat und Crop-Cache über alle Dateien eines Workers erhalten bleiben)
+_worker_label_repo = None
+_worker_crop_repo = None
+
+# Pool für die GUI (mehrseitige PDFs), wird beim ersten Bedarf gestartet
+_page_pool = None
+
+
+def _init_worker():
+    global _worker_label_repo, _worker_crop_repo
+    # Strg+C beendet nur den Hauptprozess, der die Worker geordnet herunterfährt
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    instrumentation.setup_worker_logging()
+    from db.crop_data_repository import CropDataRepository
+    from db.shipping_label_repository import ShippingLabelRepository
+    _worker_label_repo = ShippingLabelRepository()
+    _worker_crop_repo = CropDataRepository()
+
+
+def expand_inputs(patterns: list[str]) -> list[str]:
+    """
+    Löst Dateinamen, Glob-Muster und Ordner zu einer sortierten Liste von PDFs auf.
+    (Unter Windows expandiert die Shell keine Wildcards, deshalb machen wir das selbst.)
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(glob.glob(os.path.join(pattern, "*.pdf")))
+        elif glob.has_magic(pattern):
+            files.extend(glob.glob(pattern, recursive=True))
+        else:
+            files.append(pattern)
+
+    # Duplikate entfernen, Reihenfolge stabil halten
+    seen = set()
+    result = []
+    for f in files:
+        key = os.path.abspath(f)
+        if key not in seen:
+            seen.add(key)
+            result.append(f)
+    return result
+
+
+def identify_file(pdf_path: str) -> int | None:
+    """Erkennt den Label-Typ einer PDF (Worker-Prozess)."""
+    from modules.label_identifier import identify_label_type
+    from modules.pdf_renderer import PDFRenderer
+
+    renderer = PDFRenderer(pdf_path)
+    try:
+        return identify_label_type(renderer, _worker_label_repo)
+    finally:
+        renderer.doc.close()
+
+
+def crop_file(pdf_path: str, label_id: int | None, printer_name: str, paper_name: str,
+              want_pdf: bool = True, page_number: int = 0, auto_crop: bool = False,
+              paper_ratio: float | None = None) -> tuple[str, str, tuple | None, bytes | None]:
+    """
+    Holt die gespeicherte Box für Drucker + Papier und croppt die PDF im Speicher (Worker-Prozess).
+    Mit want_pdf=False wird nur der Ausschnitt ermittelt (Direktdruck braucht kein Crop-PDF).
+    Mit auto_crop wird für unbekannte Labels bzw. fehlende Boxen ein Ausschnitt aus der Seite
+    selbst vorgeschlagen (Rahmen/Bilder bzw. bei Scans Rasterprojektion, siehe auto_crop).
+    Gibt (Status, Meldung, Ausschnitt, PDF-Bytes) zurück, Status ist 'cropped', 'no_crop' oder 'error'.
+    """
+    from modules.pdf_cropper import crop_to_bytes, crop_coords_from_clip
+
+    row = _worker_crop_repo.get(label_id, paper_name, printer_name) if label_id is not None else None
+    message = ""
+    if row is not None:
+        clip = (row.crop_x0, row.crop_y0, row.crop_x1, row.crop_y1)
+    elif auto_crop:
+        import fitz  # PyMuPDF
+        from modules.auto_crop import propose_crop
+
+        with instrumentation.span("auto_crop", page=page_number), fitz.open(pdf_path) as doc:
+            proposal = propose_crop(doc.load_page(page_number), paper_ratio)
+        if proposal is None:
+            return "no_crop", "Kein Label auf der Seite gefunden", None, None
+        clip = tuple(proposal.rect)
+        message = f"automatisch ({proposal.source})"
+    else:
+        return "no_crop", f"Keine Box für Drucker '{printer_name}' / Papier '{paper_name}'", None, None
+
+    if not want_pdf:
+        return "cropped", message, clip, None
+
+    pdf_bytes = crop_to_bytes(pdf_path, crop_coords_from_clip(clip), page_number)
+    if pdf_bytes is None:
+        return "error", "Cropping fehlgeschlagen", clip, None
+    return "cropped", message, clip, pdf_bytes
+
+
+def paper_ratio(printer_name: str, paper_name: str) -> float | None:
+    """Seitenverhältnis (Breite/Höhe) des Papierformats laut Drucker-Cache - für automatische Crops."""
+    from PySide6.QtGui import QPageSize
+    from modules.printer_cache import get_printer_cache
+
+    for page_size in get_printer_cache().page_sizes(printer_name):
+        if page_size.name() == paper_name:
+            size = page_size.size(QPageSize.Unit.Point)
+            return size.width() / size.height() if size.height() > 0 else None
+    return None
+
+
+def new_result(pdf_path: str, page_number: int | None = None) -> dict:
+    return {
+        "job_id": instrumentation.current_job() or instrumentation.new_job_id(),  # Korrelations-ID für Logs und Spans
+        "path": pdf_path,
+        "page": page_number,
+        "status": "error",
+        "label_id": None,
+        "output": None,
+        "clip": None,
+        "pages": None,  # Zu druckende Ausschnitte: [(Seitennummer, Ausschnitt), ...]
+        "pdf": None,
+        "message": "",
+        "timings": {}
+    }
+
+
+def process_label(pdf_path: str, printer_name: str, paper_name: str, want_pdf: bool = True,
+                  auto_crop: bool = False, paper_ratio: float | None = None) -> dict:
+    """
+    Erkennen + Croppen einer einzelnen Label-PDF im Worker-Prozess.
+    Es werden keine Widgets gebaut und keine Vorschau gerendert.
+    """
+    result = new_result(pdf_path)
+    timings = result["timings"]
+
+    try:
+        # 1. Label-Typ erkennen
+        t0 = time.perf_counter()
+        label_id = identify_file(pdf_path)
+        timings["identify"] = time.perf_counter() - t0
+        result["label_id"] = label_id
+
+        if label_id is None and not auto_crop:
+            result["status"] = "unknown_label"
+            result["message"] = "Kein passender Label-Typ gefunden"
+            return result
+
+        # 2. Gespeicherte (oder vorgeschlagene) Boundingbox holen und croppen
+        t0 = time.perf_counter()
+        status, message, clip, pdf_bytes = crop_file(pdf_path, label_id, printer_name, paper_name, want_pdf,
+                                                     auto_crop=auto_crop, paper_ratio=paper_ratio)
+        timings["crop"] = time.perf_counter() - t0
+
+        result["status"] = status
+        result["message"] = message
+        result["clip"] = clip
+        result["pdf"] = pdf_bytes
+        if status == "cropped":
+            result["pages"] = [(0, clip)]
+
+    except Exception as e:
+        result["message"] = str(e)
+
+    return result
+
+
+# ---------------------------------------------------------
+# Mehrseitige PDFs: ein Label pro Seite
+# ---------------------------------------------------------
+def page_ranges(page_count: int, chunk_size: int) -> list[tuple[int, int]]:
+    return [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+
+
+def process_page_range(pdf_path: str, start: int, stop: int, printer_name: str, paper_name: str,
+                       auto_crop: bool = False, paper_ratio: float | None = None) -> list[dict]:
+    """
+    Erkennt die Seiten start..stop-1 einer PDF einzeln und holt je Seite die passende
+    Box (Worker-Prozess). Die PDF wird pro Block nur einmal geöffnet.
+    """
+    from modules.label_identifier import identify_label_type
+    from modules.pdf_renderer import PDFRenderer
+
+    renderer = PDFRenderer(pdf_path)
+    results = []
+    try:
+        for page_number in range(start, stop):
+            result = new_result(pdf_path, page_number)
+            timings = result["timings"]
+            try:
+                t0 = time.perf_counter()
+                label_id = identify_label_type(renderer, _worker_label_repo, page_number)
+                timings["identify"] = time.perf_counter() - t0
+                result["label_id"] = label_id
+
+                if label_id is None and not auto_crop:
+                    result["status"] = "unknown_label"
+                    result["message"] = "Kein passender Label-Typ gefunden"
+                else:
+                    t0 = time.perf_counter()
+                    status, message, clip, _ = crop_file(pdf_path, label_id, printer_name, paper_name, False,
+                                                         page_number, auto_crop, paper_ratio)
+                    timings["crop"] = time.perf_counter() - t0
+                    result["status"] = status
+                    result["message"] = message
+                    result["clip"] = clip
+            except Exception as e:
+                result["message"] = str(e)
+            results.append(result)
+    finally:
+        renderer.doc.close()
+    return results
+
+
+def submit_document(pool: ProcessPoolExecutor, pdf_path: str, printer_name: str, paper_name: str,
+                    workers: int | None = None, auto_crop: bool = False,
+                    paper_ratio: float | None = None) -> Future:
+    """
+    Verteilt die Seiten einer PDF blockweise auf den Prozess-Pool. Das zurückgegebene
+    Future liefert alle Seiten-Ergebnisse in Seitenreihenfolge - oder die Ausnahme,
+    wenn die PDF nicht geöffnet werden kann (fehlt, gesperrt, beschädigt).
+    """
+    import fitz  # PyMuPDF
+
+    done = Future()
+    try:
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+    except Exception as e:
+        done.set_exception(e)
+        return done
+
+    # Etwa vier Blöcke pro Worker: gleicht unterschiedlich teure Seiten aus,
+    # ohne die PDF für jede Seite neu zu öffnen
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, math.ceil(page_count / (workers * 4)))
+    # Alle Blöcke unter derselben Job-ID; ihre Spans kommen mit den Ergebnissen zurück
+    job_id = instrumentation.current_job() or instrumentation.new_job_id()
+    parts = [pool.submit(instrumentation.traced_call, job_id, process_page_range, pdf_path, start, stop,
+                         printer_name, paper_name, auto_crop, paper_ratio)
+             for start, stop in page_ranges(page_count, chunk_size)]
+
+    remaining = [len(parts)]
+    lock = threading.Lock()
+
+    def collect(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] > 0:
+                return
+        try:
+            results = []
+            for part in parts:
+                page_results, events = part.result()
+                instrumentation.ingest(events)
+                results.extend(page_results)
+            done.set_result(results)
+        except Exception as e:
+            done.set_exception(e)
+
+    if not parts:
+        done.set_result([])
+    for part in parts:
+        part.add_done_callback(collect)
+    return done
+
+
+def summarize_document(pdf_path: str, page_results: list[dict]) -> dict:
+    """Fasst die Seiten-Ergebnisse einer PDF zu einem Druckauftrag zusammen."""
+    result = new_result(pdf_path)
+    if page_results:
+        result["job_id"] = page_results[0]["job_id"]
+    result["pages"] = [(r["page"], r["clip"]) for r in page_results if r["status"] == "cropped"]
+
+    for r in page_results:
+        for step, duration in r["timings"].items():
+            result["timings"][step] = result["timings"].get(step, 0.0) + duration
+
+    failed = [r["page"] + 1 for r in page_results if r["status"] != "cropped"]
+    if not page_results:
+        result["message"] = "PDF enthält keine Seiten"
+    elif not result["pages"]:
+        result["message"] = "Auf keiner Seite ein Label mit Box gefunden"
+    else:
+        result["status"] = "partial" if failed else "cropped"
+        result["message"] = f"{len(result['pages'])}/{len(page_results)} Seiten"
+    if failed:
+        result["message"] += f", ohne Label/Box: Seite {', '.join(map(str, failed))}"
+    return result
+
+
+def get_page_pool() -> ProcessPoolExecutor:
+    global _page_pool
+    if _page_pool is None:
+        _page_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+    return _page_pool
+
+
+def format_result(result: dict) -> str:
+    total_ms = sum(result["timings"].values()) * 1000
+    steps = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in result["timings"].items())
+    line = f"{result['status']:<14}{total_ms:9.1f} ms  {result['path']}"
+    if result["page"] is not None:
+        line += f" (Seite {result['page'] + 1})"
+    if steps:
+        line += f"  [{steps}]"
+    if result["message"]:
+        line += f"  {result['message']}"
+    return line
+
+
+def run_batch(inputs: list[str], printer_name: str | None = None, paper_name: str | None = None,
+              workers: int | None = None, output_dir: str | None = None, dry_run: bool = False,
+              multi_page: bool = False, output_format: str = "pdf", auto_crop: bool = False) -> int:
+    """
+    Verarbeitet viele Label-PDFs ohne Hauptfenster: Erkennen und Croppen
+    laufen parallel in einem Prozess-Pool, gedruckt wird seriell im Hauptprozess.
+    Mit multi_page wird jede Seite einzeln erkannt (ein Label pro Seite) und alle
+    Labels einer PDF gehen als ein mehrseitiger Druckauftrag raus.
+    output_format: "pdf" (Vektor-Crop), "g4-pdf" bzw. "g4-tiff" (1-Bit-Raster, CCITT G4).
+    Mit auto_crop werden Labels ohne Typ oder ohne gespeicherte Box automatisch zugeschnitten.
+    Gibt einen Exit-Code zurück (0 = alle Dateien erfolgreich).
+    """
+    files = expand_inputs(inputs)
+    if not files:
+        print("Keine PDF-Dateien gefunden.")
+        return 2
+
+    # Ohne Angabe: die zuletzt in der GUI gewählten Einstellungen verwenden
+    user_settings = QSettings("LabelLobster", "UserSettings")
+    printer_name = printer_name or user_settings.value("ui/printer_selection", "")
+    paper_name = paper_name or user_settings.value("ui/paper_selection", "")
+
+    # Direktdruck: Worker liefern nur den Ausschnitt, gerendert wird direkt aus der Quell-PDF
+    direct_print = not dry_run and user_settings.value("print/render_mode", "clip") == "clip"
+
+    # Drucksystem vorbereiten (QPainter auf QPrinter braucht eine QGuiApplication)
+    print_system = None
+    if not dry_run:
+        from PySide6.QtGui import QGuiApplication
+        from modules.print import PrintingSystem
+
+        if QGuiApplication.instance() is None:
+            _app = QGuiApplication([])
+        print_system = PrintingSystem()
+        print_system.set_printer(printer_name)
+        if not print_system.set_paper_by_name(paper_name):
+            print(f"Papierformat '{paper_name}' wird vom Drucker '{printer_name}' nicht unterstützt.")
+            return 2
+
+    # Crops werden nur auf Wunsch abgelegt; zum Drucken wandern sie direkt im Speicher weiter
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    want_pdf = bool(output_dir) or dry_run or not direct_print
+
+    # G4-Ausgabe: Auflösung und Schwarzweiß-Verfahren wie beim ZPL/EPL-Druck
+    raster_dpi = int(user_settings.value("print/raw_dpi", 203))
+    raster_mode = user_settings.value("print/bitmap_mode", "threshold")
+    if raster_mode == "off":
+        raster_mode = "threshold"  # G4 kennt nur Schwarz und Weiß
+    raster_level = int(user_settings.value("print/bitmap_threshold", 128))
+
+    # Automatische Crops sollen zum Papier passen (wie die AspectBox in der GUI)
+    ratio = None
+    if auto_crop:
+        ratio = print_system.get_current_paper_ratio() if print_system else paper_ratio(printer_name, paper_name)
+
+    print(f"Batch: {len(files)} Datei(en) | Drucker: '{printer_name}' | Papier: '{paper_name}'"
+          f"{' | mehrseitig' if multi_page else ''}{' | automatischer Crop' if auto_crop else ''}"
+          f"{' | Trockenlauf' if dry_run else ''}")
+
+    results = []
+    start = time.perf_counter()
+
+    # 'spawn' statt 'fork': PyMuPDF und Qt vertragen geforkte Prozesse nicht zuverlässig
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        futures = {}
+        for index, path in enumerate(files):
+            if multi_page:
+                future = submit_document(pool, path, printer_name, paper_name, workers, auto_crop, ratio)
+            else:
+                future = pool.submit(instrumentation.traced_call, None, process_label, path, printer_name,
+                                     paper_name, want_pdf, auto_crop, ratio)
+            futures[future] = (index, path)
+
+        for future in as_completed(futures):
+            index, path = futures[future]
+            try:
+                result = future.result()
+                if not multi_page:
+                    result, events = result
+                    instrumentation.ingest(events)
+            except Exception as e:
+                result = new_result(path)
+                result["message"] = str(e)
+
+            if multi_page and isinstance(result, list):
+                # Seiten ohne Label/Box einzeln melden, der Rest wird ein Auftrag
+                for page_result in result:
+                    if page_result["status"] != "cropped":
+                        print(format_result(page_result))
+                result = summarize_document(path, result)
+                if want_pdf and result["pages"]:
+                    from modules.pdf_cropper import crop_coords_from_clip, crop_pages_to_bytes
+                    result["pdf"] = crop_pages_to_bytes(
+                        path, [(page, crop_coords_from_clip(clip)) for page, clip in result["pages"]]
+                    )
+
+            if output_dir and result["pdf"]:
+                stem = os.path.splitext(os.path.basename(path))[0]
+                suffix = "labels" if multi_page else "crop"
+                data = result["pdf"]
+                extension = "tif" if output_format == "g4-tiff" else "pdf"
+                if output_format != "pdf":
+                    from modules.monochrome import g4_pdf, g4_tiff, rasterize_pdf
+                    pages = rasterize_pdf(data, raster_dpi, raster_mode, raster_level)
+                    data = g4_tiff(pages, raster_dpi) if output_format == "g4-tiff" else g4_pdf(pages, raster_dpi)
+                result["output"] = os.path.join(output_dir, f"{stem}_{index:05d}_{suffix}.{extension}")
+                with open(result["output"], "wb") as f:
+                    f.write(data)
+
+            # Drucken im Hauptprozess, während die Worker weiterarbeiten
+            if print_system and result["status"] in ("cropped", "partial"):
+                t0 = time.perf_counter()
+                with instrumentation.job(result["job_id"]):
+                    if direct_print:
+                        ok = print_system.print_clips(result["path"], result["pages"])
+                    else:
+                        ok = print_system.print_pdf(result["pdf"])
+                result["timings"]["print"] = time.perf_counter() - t0
+                if not ok:
+                    result["status"] = "error"
+                    result["message"] = "Druckauftrag fehlgeschlagen"
+                elif result["status"] == "cropped":
+                    result["status"] = "printed"
+
+            result["pdf"] = None  # Speicher freigeben, die Ergebnisliste wächst mit jeder Datei
+            results.append(result)
+            instrumentation.job_finished(result["status"])
+            print(format_result(result))
+
+    # Zusammenfassung
+    elapsed = time.perf_counter() - start
+    done_status = "cropped" if dry_run else "printed"
+    ok_count = sum(1 for r in results if r["status"] == done_status)
+    print(f"Fertig: {ok_count}/{len(results)} erfolgreich in {elapsed:.2f} s "
+          f"({len(results) / elapsed if elapsed > 0 else 0:.1f} Dateien/s)")
+
+    return 0 if ok_count == len(results) else 1
+
+
+def run_learn_layout(label_type_id: int, inputs: list[str]) -> int:
+    """
+    Lernt die Layouts von Beispiel-PDFs (jede Seite) für einen Label-Typ - damit werden
+    auch Scans ohne Textebene und Labels ohne gepflegte Keywords erkannt.
+    """
+    from db.shipping_label_repository import ShippingLabelRepository
+    from modules.label_identifier import learn_layout
+    from modules.pdf_renderer import PDFRenderer
+
+    if ShippingLabelRepository().get_by_id(label_type_id) is None:
+        print(f"Label-Typ {label_type_id} nicht gefunden.")
+        return 2
+    files = expand_inputs(inputs)
+    if not files:
+        print("Keine PDF-Dateien gefunden.")
+        return 2
+
+    learned = 0
+    for pdf_path in files:
+        try:
+            renderer = PDFRenderer(pdf_path)
+        except Exception as e:
+            print(f"FEHLER  {os.path.basename(pdf_path)}: {e}")
+            continue
+        try:
+            for page_index in range(renderer.doc.page_count):
+                learned += learn_layout(renderer, label_type_id, page_index)
+        finally:
+            renderer.doc.close()
+    print(f"{learned} neue Layouts für Label-Typ {label_type_id} gelernt ({len(files)} Dateien).")
+    return 0
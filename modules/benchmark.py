@@ -0,0 +1,303 @@
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+# Ergebnisdatei: bei inkompatiblen Änderungen an Fällen oder Format hochzählen
+BENCH_VERSION = 1
+
+BENCH_PRINTER = "Benchmark"   # Druckername der Crop-Boxen in der Benchmark-Datenbank
+RENDER_DPI = 200              # Wie FULL_DPI beim Import in der GUI
+PRINT_DPI = 203               # Thermodrucker
+NOISE_FLOOR_MS = 0.05         # Unterschiede darunter gelten beim Vergleich nie als Verschlechterung
+CROP_TOLERANCE = 4.0          # Auto-Crop darf das bekannte Label um so viele Punkte anschneiden
+
+
+# ---------------------------------------------------------
+# Messen
+# ---------------------------------------------------------
+def measure(func, repeat: int = 5, number: int = 1, setup=None, warmup: int = 1) -> list[float]:
+    """
+    Führt func 'repeat'-mal aus (je 'number' Aufrufe, wie timeit) und gibt die Millisekunden je Aufruf zurück.
+    'setup' läuft vor jeder Messung außerhalb der Zeitnahme (z.B. Cache leeren).
+    """
+    samples = []
+    for i in range(warmup + repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - t0) * 1000 / number
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {"n": len(ordered), "min_ms": ordered[0], "median_ms": statistics.median(ordered),
+            "mean_ms": statistics.fmean(ordered), "p95_ms": p95}
+
+
+class BenchmarkRun:
+    """Sammelt die Ergebnisse eines Laufs; Schlüssel ist 'fall[parameter]', damit Läufe vergleichbar sind."""
+
+    def __init__(self, repeat: int = 5, name_filter: str | None = None):
+        self.repeat = repeat
+        self.name_filter = name_filter
+        self.results = {}
+        self.failures = []  # Fälle, deren Ergebnis nicht stimmt (Exit-Code 1, auch ohne Baseline)
+
+    @staticmethod
+    def _name(case: str, params: dict) -> str:
+        label = ",".join(str(v) for v in params.values())
+        return f"{case}[{label}]" if label else case
+
+    def check(self, case: str, params: dict, ok: bool, detail: str = ""):
+        """Hält fest, ob ein Fall das richtige Ergebnis geliefert hat (nicht nur wie schnell)."""
+        name = self._name(case, params)
+        if self.name_filter and self.name_filter not in name:
+            return
+        if not ok:
+            print(f"{name:<52} FALSCH: {detail}")
+            self.failures.append(name)
+        if name in self.results:
+            self.results[name]["ok"] = ok
+
+    def run(self, case: str, params: dict, func, number: int = 1, setup=None, repeat: int | None = None):
+        name = self._name(case, params)
+        if self.name_filter and self.name_filter not in name:
+            return
+        try:
+            samples = measure(func, repeat or self.repeat, number, setup)
+        except Exception as e:
+            print(f"{name:<52} FEHLER: {e}")
+            self.results[name] = {"case": case, "params": params, "error": str(e)}
+            return
+        entry = {"case": case, "params": params, **summarize(samples)}
+        self.results[name] = entry
+        print(f"{name:<52} {entry['median_ms']:10.3f} ms  (min {entry['min_ms']:.3f}, p95 {entry['p95_ms']:.3f})")
+
+    def to_dict(self) -> dict:
+        import fitz  # PyMuPDF
+        import PySide6
+        return {
+            "version": BENCH_VERSION,
+            "meta": {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "repeat": self.repeat,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "pymupdf": fitz.VersionBind,
+                "pyside6": PySide6.__version__,
+            },
+            "results": self.results,
+            "failures": self.failures,
+        }
+
+
+# ---------------------------------------------------------
+# Vorbereitung: eigene Datenbank mit Label-Typen, Crops und Layouts des Korpus
+# ---------------------------------------------------------
+def _use_database(path: str):
+    """Leitet alle Repositories auf eine eigene Datenbank um (die der Station bleibt unberührt)."""
+    from db import database
+    if database._engine is not None:
+        raise RuntimeError("Datenbank ist bereits geöffnet - Benchmark nur als eigenen Prozess starten")
+    database.DB_PATH = path
+
+
+def prepare_database(corpus: list[dict]) -> dict:
+    """Legt Label-Typen, Crop-Boxen (BENCH_PRINTER, je Papier) und Layouts an; gibt Carrier -> ID zurück."""
+    from db.crop_data_repository import CropDataRepository
+    from db.shipping_label_repository import ShippingLabelRepository
+    from modules.label_identifier import learn_layout
+    from modules.pdf_renderer import PDFRenderer
+    from modules.synthetic_corpus import CARRIERS, PAGE_SIZES, label_rect
+
+    label_repo = ShippingLabelRepository()
+    for carrier in CARRIERS:
+        label_repo.add(carrier["carrier"], carrier["label_type"], carrier["keywords"])
+    ids = {t.carrier: t.id for t in label_repo.get_all()}
+
+    crop_repo = CropDataRepository()
+    for carrier_id in ids.values():
+        for size in PAGE_SIZES:
+            r = label_rect(size)
+            crop_repo.add_or_update(carrier_id, BENCH_PRINTER, size, r.x0, r.y0, r.x1, r.y1, 0)
+
+    # Layout der ersten Seite jeder Datei lernen (Erkennung der Scans ohne Textebene)
+    for entry in corpus:
+        renderer = PDFRenderer(entry["path"])
+        try:
+            learn_layout(renderer, ids[entry["carrier"]])
+        finally:
+            renderer.doc.close()
+    return ids
+
+
+# ---------------------------------------------------------
+# Die Fälle
+# ---------------------------------------------------------
+def _file_printer(output_path: str, size: str):
+    from PySide6.QtGui import QPageSize
+    from PySide6.QtPrintSupport import QPrinter
+    from modules.print import PrintingSystem
+
+    print_system = PrintingSystem()
+    print_system.backend = "qt"  # Rasterpfad über QPainter, unabhängig von den Einstellungen der Station
+    print_system.printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+    print_system.printer.setOutputFileName(output_path)
+    print_system.printer.setResolution(PRINT_DPI)
+    print_system.printer.setPageSize(QPageSize(QPageSize.PageSizeId.A6 if size == "A6" else QPageSize.PageSizeId.A4))
+    return print_system
+
+
+def run_document_cases(bench: BenchmarkRun, entry: dict, work_dir: str):
+    from db.shipping_label_repository import ShippingLabelRepository
+    from modules.auto_crop import propose_crop
+    from modules.label_identifier import identify_label_type
+    from modules.pdf_cropper import create_cropped_pdf, crop_coords_from_clip
+    from modules.pdf_renderer import PDFRenderer
+    from modules.render_cache import RenderCache, get_text_cache
+    from modules.synthetic_corpus import label_rect
+
+    path = entry["path"]
+    params = {"size": entry["size"], "kind": "text" if entry["text"] else "scan", "pages": f"{entry['pages']}p"}
+    text_cache = get_text_cache()
+    label_repo = ShippingLabelRepository()
+
+    def open_document():
+        renderer = PDFRenderer(path)
+        renderer.doc_hash
+        renderer.doc.close()
+    bench.run("open", params, open_document)
+
+    # Render-Cache ohne Budget: jede Messung rastert wirklich
+    renderer = PDFRenderer(path, cache=RenderCache(max_bytes=0))
+    try:
+        bench.run("get_page_pixmap", params, lambda: renderer.get_page_pixmap(0, dpi=RENDER_DPI))
+        bench.run("get_page_text", params, lambda: renderer.get_page_text(0), setup=text_cache.clear)
+        bench.run("get_page_text_cached", params, lambda: renderer.get_page_text(0), number=100)
+        bench.run("identify_label_type", params, lambda: identify_label_type(renderer, label_repo),
+                  setup=text_cache.clear)
+        if entry["pages"] > 1:
+            def identify_document():
+                for page_index in range(renderer.doc.page_count):
+                    identify_label_type(renderer, label_repo, page_index)
+            bench.run("identify_document", params, identify_document, setup=text_cache.clear,
+                      repeat=min(bench.repeat, 3))
+
+        # Auto-Crop: Laufzeit und ob der Vorschlag das ganze Label enthält (auch wenn es die Seite füllt)
+        bench.run("propose_crop", params, lambda: propose_crop(renderer.doc[0]))
+        proposal = propose_crop(renderer.doc[0])
+        expected = label_rect(entry["size"])
+        t = CROP_TOLERANCE
+        bench.check("propose_crop", params,
+                    proposal is not None and (proposal.rect + (-t, -t, t, t)).contains(expected),
+                    f"{proposal} schneidet das Label {expected} ab")
+    finally:
+        renderer.doc.close()
+
+    cropped_path = os.path.join(work_dir, "cropped.pdf")
+    coords = crop_coords_from_clip(tuple(label_rect(entry["size"])))
+    bench.run("create_cropped_pdf", params, lambda: create_cropped_pdf(path, cropped_path, coords))
+
+    print_system = _file_printer(os.path.join(work_dir, "printed.pdf"), entry["size"])
+    bench.run("print_pdf", params, lambda: print_system.print_pdf(cropped_path))
+
+
+def run_repository_cases(bench: BenchmarkRun, label_ids: dict):
+    from db.crop_data_repository import CropDataRepository
+
+    label_id = next(iter(label_ids.values()))
+    warm = CropDataRepository()
+    warm.get(label_id, "A6", BENCH_PRINTER)
+    # Kalt: neues Repository je Aufruf, also eine echte Datenbankabfrage
+    bench.run("crop_repository_get", {"cache": "cold"},
+              lambda: CropDataRepository().get(label_id, "A6", BENCH_PRINTER), number=20)
+    bench.run("crop_repository_get", {"cache": "warm"},
+              lambda: warm.get(label_id, "A6", BENCH_PRINTER), number=10000)
+
+
+# ---------------------------------------------------------
+# Vergleich mit einer gespeicherten Baseline
+# ---------------------------------------------------------
+def compare(current: dict, baseline: dict, tolerance: float = 0.25) -> list[dict]:
+    """
+    Vergleicht die Mediane je Fall. Verschlechtert ist, was mehr als 'tolerance' (0.25 = 25 %)
+    und mehr als NOISE_FLOOR_MS langsamer ist. Fälle, die nur in einem Lauf vorkommen, werden übersprungen.
+    """
+    rows = []
+    for name, entry in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or "median_ms" not in entry or "median_ms" not in base:
+            continue
+        ratio = entry["median_ms"] / base["median_ms"] if base["median_ms"] > 0 else 1.0
+        regressed = ratio > 1 + tolerance and entry["median_ms"] - base["median_ms"] > NOISE_FLOOR_MS
+        rows.append({"name": name, "baseline_ms": base["median_ms"], "current_ms": entry["median_ms"],
+                     "ratio": ratio, "regressed": regressed})
+    return rows
+
+
+def print_comparison(rows: list[dict]):
+    for row in rows:
+        marker = "  LANGSAMER" if row["regressed"] else ""
+        print(f"{row['name']:<52} {row['baseline_ms']:10.3f} -> {row['current_ms']:10.3f} ms "
+              f"({row['ratio']:5.2f}x){marker}")
+
+
+# ---------------------------------------------------------
+# Kommandozeile
+# ---------------------------------------------------------
+def run_benchmarks(output: str | None = None, baseline: str | None = None, tolerance: float = 0.25,
+                   repeat: int = 5, corpus_dir: str | None = None, sizes=("A4", "A6"),
+                   page_counts=(1, 50, 500), name_filter: str | None = None) -> int:
+    """
+    Erzeugt (bzw. verwendet) den synthetischen Korpus, misst Import, Rendern, Textextraktion,
+    Erkennung, Crop-Lookup, Croppen und den Raster-Druckpfad und schreibt die Ergebnisse als JSON.
+    Mit 'baseline' wird verglichen; Exit-Code 1, wenn ein Fall deutlich langsamer geworden ist
+    oder ein falsches Ergebnis geliefert hat (z.B. einen Auto-Crop, der das Label abschneidet).
+    """
+    from PySide6.QtGui import QGuiApplication
+    from modules.synthetic_corpus import generate_corpus
+
+    corpus_dir = corpus_dir or os.path.join(tempfile.gettempdir(), "labellobster-corpus")
+    output = output or f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json"
+
+    t0 = time.perf_counter()
+    corpus = generate_corpus(corpus_dir, sizes, page_counts)
+    print(f"Korpus: {len(corpus)} Dateien in '{corpus_dir}' ({time.perf_counter() - t0:.1f} s)")
+
+    # QPixmap und QPainter auf QPrinter brauchen eine QGuiApplication
+    _app = QGuiApplication.instance() or QGuiApplication([])
+
+    bench = BenchmarkRun(repeat, name_filter)
+    with tempfile.TemporaryDirectory(prefix="labellobster-bench-") as work_dir:
+        _use_database(os.path.join(work_dir, "benchmark.db"))
+        label_ids = prepare_database(corpus)
+        for entry in corpus:
+            run_document_cases(bench, entry, work_dir)
+        run_repository_cases(bench, label_ids)
+
+    result = bench.to_dict()
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Ergebnisse: {output}")
+    if bench.failures:
+        print(f"{len(bench.failures)} Fälle mit falschem Ergebnis: {', '.join(bench.failures)}")
+
+    if not baseline:
+        return 1 if bench.failures else 0
+    with open(baseline, encoding="utf-8") as f:
+        rows = compare(result, json.load(f), tolerance)
+    print(f"\nVergleich mit {baseline} (Toleranz {tolerance:.0%}):")
+    print_comparison(rows)
+    regressed = sum(1 for row in rows if row["regressed"])
+    print(f"{regressed} von {len(rows)} Fällen langsamer.")
+    return 1 if regressed or bench.failures else 0
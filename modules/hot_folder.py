@@ -0,0 +1,386 @@
+import ctypes
+import ctypes.util
+import multiprocessing
+import os
+import queue
+import select
+import shutil
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PySide6.QtCore import QSettings
+
+from modules import instrumentation
+from modules.batch import _init_worker, crop_file, format_result, identify_file, new_result, paper_ratio
+
+# Marker zum geordneten Herunterfahren einer Stufe
+_STOP = object()
+
+
+def _is_pdf(name: str) -> bool:
+    return name.lower().endswith(".pdf")
+
+
+def _scan_directory(directory: str) -> list[str]:
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return []
+    return [os.path.join(directory, n) for n in names
+            if _is_pdf(n) and os.path.isfile(os.path.join(directory, n))]
+
+
+# ---------------------------------------------------------
+# Ordner-Überwachung
+# ---------------------------------------------------------
+class InotifyWatcher:
+    """
+    Überwacht einen Ordner per inotify (nur Linux, über ctypes - keine Zusatzpakete).
+    Gemeldet wird erst, wenn eine Datei fertig geschrieben (CLOSE_WRITE) oder
+    hineinverschoben (MOVED_TO) wurde.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    IN_CLOEXEC = 0o2000000
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, directory: str, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fehlgeschlagen")
+
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch fehlgeschlagen für {directory}")
+
+    def watch(self, stop_event: threading.Event):
+        # Dateien, die schon vor dem Start im Ordner lagen
+        yield from _scan_directory(self.directory)
+
+        try:
+            while not stop_event.is_set():
+                ready, _, _ = select.select([self.fd], [], [], self.interval)
+                if not ready:
+                    continue
+
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    _wd, mask, _cookie, length = self._EVENT_HEADER.unpack_from(data, offset)
+                    offset += self._EVENT_HEADER.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                    offset += length
+
+                    if mask & self.IN_Q_OVERFLOW:
+                        # Kernel-Queue übergelaufen -> Ordner komplett neu einlesen
+                        yield from _scan_directory(self.directory)
+                    elif name and _is_pdf(name):
+                        yield os.path.join(self.directory, name)
+        finally:
+            os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Fallback ohne inotify: scannt den Ordner zyklisch. Eine Datei gilt als fertig,
+    sobald Größe und Änderungszeit zwischen zwei Scans gleich bleiben.
+    """
+
+    def __init__(self, directory: str, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+        self._last = {}
+        self._emitted = set()
+
+    def watch(self, stop_event: threading.Event):
+        while not stop_event.is_set():
+            current = {}
+            for path in _scan_directory(self.directory):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                current[path] = (st.st_size, st.st_mtime)
+
+            for path, signature in current.items():
+                if path not in self._emitted and self._last.get(path) == signature:
+                    self._emitted.add(path)
+                    yield path
+
+            # Verschwundene Dateien vergessen (z.B. nach dem Verschieben)
+            self._emitted &= current.keys()
+            self._last = current
+            stop_event.wait(self.interval)
+
+
+def create_watcher(directory: str, interval: float = 1.0, force_polling: bool = False):
+    if sys.platform.startswith("linux") and not force_polling:
+        try:
+            return InotifyWatcher(directory, interval)
+        except (OSError, AttributeError) as e:
+            print(f"inotify nicht verfügbar ({e}), nutze Polling.")
+    return PollingWatcher(directory, interval)
+
+
+# ---------------------------------------------------------
+# Pipeline-Stufen
+# ---------------------------------------------------------
+class Stage:
+    """
+    Eine Pipeline-Stufe mit eigener Parallelität. Sie liest Jobs aus einer begrenzten
+    Queue und schreibt sie blockierend in die nächste: Ist die nächste Stufe voll,
+    wartet diese Stufe (Backpressure statt unbegrenztem Speicherwachstum).
+    """
+
+    def __init__(self, name: str, func, concurrency: int, in_queue: queue.Queue,
+                 out_queue: queue.Queue | None, finish):
+        self.name = name
+        self.func = func
+        self.concurrency = max(1, concurrency)
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.finish = finish
+        self.threads = []
+
+    def start(self):
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def stop(self):
+        # Ein Stop-Marker pro Thread; vorher eingereihte Jobs werden noch abgearbeitet
+        for _ in self.threads:
+            self.in_queue.put(_STOP)
+        for t in self.threads:
+            t.join()
+
+    def _run(self):
+        while True:
+            job = self.in_queue.get()
+            if job is _STOP:
+                return
+
+            t0 = time.perf_counter()
+            try:
+                with instrumentation.job(job["job_id"]):
+                    proceed = self.func(job)
+            except Exception as e:
+                job["status"] = "error"
+                job["message"] = str(e)
+                proceed = False
+            job["timings"][self.name] = time.perf_counter() - t0
+
+            if proceed and self.out_queue is not None:
+                self.out_queue.put(job)
+            else:
+                self.finish(job)
+
+
+class HotFolderPipeline:
+    """
+    Überwacht einen Ordner und schickt neue PDFs durch die Stufen
+    ingest -> identify -> crop -> print. Verarbeitete Dateien landen in
+    'processed/', fehlgeschlagene in 'failed/'.
+    """
+
+    def __init__(self, directory: str, printer_name: str, paper_name: str,
+                 identify_workers: int = 2, crop_workers: int = 2, print_workers: int = 1,
+                 queue_size: int = 8, poll_interval: float = 1.0, force_polling: bool = False,
+                 dry_run: bool = False, auto_crop: bool = False, paper_ratio: float | None = None):
+        self.directory = directory
+        self.printer_name = printer_name
+        self.paper_name = paper_name
+        self.identify_workers = identify_workers
+        self.crop_workers = crop_workers
+        self.print_workers = print_workers
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.dry_run = dry_run
+        # Unbekannte Labels bzw. fehlende Boxen automatisch zuschneiden (passend zum Papier-Verhältnis)
+        self.auto_crop = auto_crop
+        self.paper_ratio = paper_ratio
+        # Direktdruck aus der Quell-PDF (ohne Zwischen-PDF), wie in der GUI einstellbar
+        self.direct_print = not dry_run and QSettings("LabelLobster", "UserSettings").value(
+            "print/render_mode", "clip") == "clip"
+
+        self.processed_dir = os.path.join(directory, "processed")
+        self.failed_dir = os.path.join(directory, "failed")
+        for d in (self.processed_dir, self.failed_dir):
+            os.makedirs(d, exist_ok=True)
+
+        self.pool = None
+        self.stages = []
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- Stufen-Funktionen -------------------------------------
+    def _identify(self, job: dict) -> bool:
+        label_id, events = self.pool.submit(instrumentation.traced_call, job["job_id"], identify_file,
+                                            job["path"]).result()
+        instrumentation.ingest(events)
+        job["label_id"] = label_id
+        if label_id is None and not self.auto_crop:
+            job["status"] = "unknown_label"
+            job["message"] = "Kein passender Label-Typ gefunden"
+            return False
+        return True
+
+    def _crop(self, job: dict) -> bool:
+        # Das Crop-PDF kommt als Bytes aus dem Worker zurück, ohne Umweg über die Platte
+        (status, message, clip, pdf_bytes), events = self.pool.submit(
+            instrumentation.traced_call, job["job_id"], crop_file, job["path"], job["label_id"],
+            self.printer_name, self.paper_name, not self.direct_print, 0, self.auto_crop, self.paper_ratio
+        ).result()
+        instrumentation.ingest(events)
+        job["status"] = status
+        job["message"] = message
+        job["clip"] = clip
+        job["pdf"] = pdf_bytes
+        return status == "cropped"
+
+    def _print(self, job: dict) -> bool:
+        # Jeder Druck-Thread bekommt sein eigenes QPrinter-Objekt
+        print_system = getattr(self._local, "print_system", None)
+        if print_system is None:
+            from modules.print import PrintingSystem
+            print_system = PrintingSystem()
+            print_system.set_printer(self.printer_name)
+            if not print_system.set_paper_by_name(self.paper_name):
+                raise RuntimeError(f"Papierformat '{self.paper_name}' nicht verfügbar")
+            self._local.print_system = print_system
+
+        if self.direct_print:
+            ok = print_system.print_clip(job["path"], job["clip"])
+        else:
+            ok = print_system.print_pdf(job["pdf"])
+
+        if ok:
+            job["status"] = "printed"
+        else:
+            job["status"] = "error"
+            job["message"] = "Druckauftrag fehlgeschlagen"
+        return False
+
+    def _finish(self, job: dict):
+        done_status = "cropped" if self.dry_run else "printed"
+        target_dir = self.processed_dir if job["status"] == done_status else self.failed_dir
+
+        try:
+            target = os.path.join(target_dir, os.path.basename(job["path"]))
+            if os.path.exists(target):
+                stem, ext = os.path.splitext(target)
+                target = f"{stem}_{int(time.time() * 1000)}{ext}"
+            shutil.move(job["path"], target)
+
+            # Im Trockenlauf den Crop neben der Quelle ablegen
+            if self.dry_run and job["pdf"]:
+                job["output"] = os.path.splitext(target)[0] + "_crop.pdf"
+                with open(job["output"], "wb") as f:
+                    f.write(job["pdf"])
+        except OSError as e:
+            job["message"] = f"{job['message']} (Verschieben fehlgeschlagen: {e})".strip()
+
+        job["pdf"] = None
+        with self._lock:
+            self._in_flight.discard(os.path.abspath(job["path"]))
+        instrumentation.job_finished(job["status"])
+        print(format_result(job))
+
+    # --- Ablauf -------------------------------------------------
+    def run(self, stop_event: threading.Event):
+        ctx = multiprocessing.get_context("spawn")
+        self.pool = ProcessPoolExecutor(max_workers=self.identify_workers + self.crop_workers,
+                                        mp_context=ctx, initializer=_init_worker)
+
+        identify_queue = queue.Queue(maxsize=self.queue_size)
+        crop_queue = queue.Queue(maxsize=self.queue_size)
+        print_queue = None if self.dry_run else queue.Queue(maxsize=self.queue_size)
+
+        self.stages = [
+            Stage("identify", self._identify, self.identify_workers, identify_queue, crop_queue, self._finish),
+            Stage("crop", self._crop, self.crop_workers, crop_queue, print_queue, self._finish),
+        ]
+        if not self.dry_run:
+            self.stages.append(Stage("print", self._print, self.print_workers, print_queue, None, self._finish))
+
+        for stage in self.stages:
+            stage.start()
+
+        watcher = create_watcher(self.directory, self.poll_interval, self.force_polling)
+        print(f"Überwache '{self.directory}' ({type(watcher).__name__}) | "
+              f"Drucker: '{self.printer_name}' | Papier: '{self.paper_name}'"
+              f"{' | automatischer Crop' if self.auto_crop else ''}{' | Trockenlauf' if self.dry_run else ''}")
+
+        try:
+            for path in watcher.watch(stop_event):
+                key = os.path.abspath(path)
+                with self._lock:
+                    if key in self._in_flight or not os.path.exists(path):
+                        continue
+                    self._in_flight.add(key)
+
+                # Ingest: blockiert, solange die Identify-Stufe voll ist
+                job = new_result(path)
+                while not stop_event.is_set():
+                    try:
+                        identify_queue.put(job, timeout=self.poll_interval)
+                        break
+                    except queue.Full:
+                        continue
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        # Stufen in Reihenfolge leeren, damit kein Job verloren geht
+        for stage in self.stages:
+            stage.stop()
+        self.stages = []
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+
+
+def run_hot_folder(directory: str, printer_name: str | None = None, paper_name: str | None = None,
+                   identify_workers: int = 2, crop_workers: int = 2, print_workers: int = 1,
+                   queue_size: int = 8, poll_interval: float = 1.0, force_polling: bool = False,
+                   dry_run: bool = False, auto_crop: bool = False) -> int:
+    if not os.path.isdir(directory):
+        print(f"Ordner nicht gefunden: {directory}")
+        return 2
+
+    # Ohne Angabe: die zuletzt in der GUI gewählten Einstellungen verwenden
+    user_settings = QSettings("LabelLobster", "UserSettings")
+    printer_name = printer_name or user_settings.value("ui/printer_selection", "")
+    paper_name = paper_name or user_settings.value("ui/paper_selection", "")
+
+    # QPainter auf QPrinter braucht eine QGuiApplication (auch in Druck-Threads)
+    _app = None
+    if not dry_run:
+        from PySide6.QtGui import QGuiApplication
+        if QGuiApplication.instance() is None:
+            _app = QGuiApplication([])
+
+    ratio = paper_ratio(printer_name, paper_name) if auto_crop else None
+    pipeline = HotFolderPipeline(directory, printer_name, paper_name, identify_workers, crop_workers,
+                                 print_workers, queue_size, poll_interval, force_polling, dry_run,
+                                 auto_crop, ratio)
+    stop_event = threading.Event()
+    try:
+        pipeline.run(stop_event)
+    except KeyboardInterrupt:
+        stop_event.set()
+        print("Beende Hot-Folder ...")
+    return 0
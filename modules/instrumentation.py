@@ -0,0 +1,304 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# Zeitbasis: Wanduhr beim Import plus monotone perf_counter-Differenz - so passen die
+# Zeitstempel aus Worker-Prozessen in denselben Trace wie die des Hauptprozesses
+_WALL_NS = time.time_ns()
+_PERF_NS = time.perf_counter_ns()
+
+METRIC_PREFIX = "labellobster"
+BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_TRACE_EVENTS = 200_000   # Ältere Spans fallen bei langen Hot-Folder-Läufen aus dem Trace
+METRICS_INTERVAL_S = 15.0    # Prometheus-Textdatei höchstens so oft neu schreiben
+LOG_ENV = "LABELLOBSTER_LOG"  # Log-Einstellungen für Worker-Prozesse (spawn erbt keine Logging-Konfiguration)
+
+logger = logging.getLogger(__name__)
+
+_job_id = contextvars.ContextVar("job_id", default=None)
+_capture = contextvars.ContextVar("capture", default=None)
+
+_lock = threading.Lock()
+_trace_events = deque(maxlen=MAX_TRACE_EVENTS)
+_histograms = {}  # Span-Name -> [Anzahl je Bucket..., Anzahl gesamt, Summe in s]
+_counters = {}    # (Name, Labels) -> Wert
+
+_trace_path = None
+_metrics_path = None
+_metrics_written = 0.0
+_log_file = None
+_job_listeners = []  # Werden nach jedem fertigen Job mit dem Status aufgerufen (z.B. Profiling)
+
+
+# ---------------------------------------------------------
+# Strukturiertes Logging
+# ---------------------------------------------------------
+class _JobFilter(logging.Filter):
+    """Hängt die Job-ID des aktuellen Kontexts an jede Log-Zeile."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.job_id = _job_id.get() or "-"
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Text: "Zeit LEVEL logger [job]: Meldung key=value ..."; JSON: eine Zeile je Meldung.
+    Zusätzliche Felder über extra={"fields": {...}}.
+    """
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(job_id)s]: %(message)s")
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        if not self.json_lines:
+            line = super().format(record)
+            return f"{line} {' '.join(f'{k}={v}' for k, v in fields.items())}" if fields else line
+
+        entry = {"ts": record.created, "level": record.levelname, "logger": record.name,
+                 "job": getattr(record, "job_id", "-"), "msg": record.getMessage(), **fields}
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = "WARNING", log_format: str = "text", log_file: str | None = None):
+    """
+    Ersetzt logging.basicConfig; Worker-Prozesse übernehmen die Einstellung über LOG_ENV.
+    Mit 'log_file' zusätzlich in diese Datei (angehängt, auch von den Workern).
+    """
+    global _log_file
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    for handler in handlers:
+        handler.setFormatter(StructuredFormatter(json_lines=log_format == "json"))
+        handler.addFilter(_JobFilter())
+        root.addHandler(handler)
+    root.setLevel(level)
+    _log_file = log_file or None
+    os.environ[LOG_ENV] = f"{level},{log_format},{log_file or ''}"
+
+
+def setup_worker_logging():
+    """Im Initializer der Worker-Prozesse aufrufen."""
+    level, log_format, log_file = (os.environ.get(LOG_ENV, "WARNING,text,").split(",", 2) + ["", ""])[:3]
+    setup_logging(level, log_format or "text", log_file or None)
+
+
+def log_directory() -> str:
+    """Ordner der Log-Datei (ohne --log-file das Arbeitsverzeichnis) - dort landen auch Profile."""
+    return os.path.dirname(os.path.abspath(_log_file)) if _log_file else os.getcwd()
+
+
+# ---------------------------------------------------------
+# Jobs und Spans
+# ---------------------------------------------------------
+def new_job_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def current_job() -> str | None:
+    return _job_id.get()
+
+
+@contextmanager
+def job(job_id: str | None = None):
+    """Alle Spans und Log-Zeilen in diesem Block tragen dieselbe Job-ID (ein Label, ein Druckauftrag)."""
+    token = _job_id.set(job_id or new_job_id())
+    try:
+        yield _job_id.get()
+    finally:
+        _job_id.reset(token)
+
+
+@contextmanager
+def span(name: str, **args):
+    """
+    Misst einen Verarbeitungsschritt. Spans dürfen verschachtelt sein (im Trace sichtbar);
+    die Dauer landet immer im Histogramm, im Trace nur mit enable_trace().
+    """
+    start = time.perf_counter_ns()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        record(name, start, time.perf_counter_ns(), args)
+
+
+def record(name: str, start_ns: int, end_ns: int, args: dict | None = None):
+    thread = threading.current_thread()
+    event = {"name": name, "job": _job_id.get(), "ts": (_WALL_NS + start_ns - _PERF_NS) // 1000,
+             "dur": (end_ns - start_ns) // 1000, "pid": os.getpid(), "tid": thread.ident,
+             "thread": thread.name, "args": args or {}}
+    captured = _capture.get()
+    if captured is not None:
+        captured.append(event)  # Zählt erst, wenn der Hauptprozess es mit ingest() übernimmt
+    else:
+        _add(event)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s %.2f ms", name, event["dur"] / 1000, extra={"fields": event["args"]})
+
+
+def _add(event: dict):
+    seconds = event["dur"] / 1e6
+    with _lock:
+        histogram = _histograms.get(event["name"])
+        if histogram is None:
+            histogram = _histograms[event["name"]] = [0] * len(BUCKETS_S) + [0, 0.0]
+        for i, bound in enumerate(BUCKETS_S):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+        if _trace_path is not None:
+            _trace_events.append(event)
+
+
+def count(name: str, value: float = 1, **labels):
+    """Zähler für die Prometheus-Ausgabe, z.B. count("jobs_total", status="printed")."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# ---------------------------------------------------------
+# Worker-Prozesse: Spans einsammeln und im Hauptprozess übernehmen
+# ---------------------------------------------------------
+@contextmanager
+def capture():
+    """Sammelt alle Spans dieses Kontexts in einer Liste (Worker-Prozess -> Hauptprozess)."""
+    events = []
+    token = _capture.set(events)
+    try:
+        yield events
+    finally:
+        _capture.reset(token)
+
+
+def traced_call(job_id: str | None, func, *args, **kwargs):
+    """
+    Einstiegspunkt für pool.submit: führt func unter der Job-ID des Hauptprozesses aus und
+    gibt (Ergebnis, Spans) zurück. Im Hauptprozess die Spans mit ingest() übernehmen.
+    """
+    with job(job_id), capture() as events:
+        result = func(*args, **kwargs)
+    return result, events
+
+
+def ingest(events: list[dict]):
+    for event in events:
+        _add(event)
+
+
+# ---------------------------------------------------------
+# Export
+# ---------------------------------------------------------
+def enable_trace(path: str):
+    """Spans ab jetzt für den Chrome-Trace (chrome://tracing, Perfetto) sammeln; geschrieben beim Beenden."""
+    global _trace_path
+    _trace_path = path
+    atexit.register(write_trace, path)
+
+
+def enable_metrics(path: str):
+    """Prometheus-Textdatei (node_exporter textfile collector) regelmäßig und beim Beenden schreiben."""
+    global _metrics_path
+    _metrics_path = path
+    atexit.register(write_metrics, path)
+
+
+def on_job_finished(func):
+    """Registriert func(status), aufgerufen nach jedem fertigen Job (aus dem jeweiligen Thread)."""
+    if func not in _job_listeners:
+        _job_listeners.append(func)
+
+
+def job_finished(status: str):
+    """Nach jedem fertigen Job aufrufen: zählt den Status und schreibt ggf. die Metriken neu."""
+    global _metrics_written
+    count("jobs_total", status=status)
+    for func in list(_job_listeners):
+        func(status)
+    if _metrics_path and time.monotonic() - _metrics_written >= METRICS_INTERVAL_S:
+        _metrics_written = time.monotonic()
+        write_metrics(_metrics_path)
+
+
+def _label_text(labels) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels)
+
+
+def prometheus_text() -> str:
+    lines = []
+    with _lock:
+        histograms = {name: list(values) for name, values in _histograms.items()}
+        counters = dict(_counters)
+
+    name = f"{METRIC_PREFIX}_span_duration_seconds"
+    lines.append(f"# HELP {name} Dauer der Verarbeitungsschritte je Label")
+    lines.append(f"# TYPE {name} histogram")
+    for span_name, values in sorted(histograms.items()):
+        for bound, bucket in zip(BUCKETS_S, values):
+            lines.append(f'{name}_bucket{{span="{span_name}",le="{bound}"}} {bucket}')
+        lines.append(f'{name}_bucket{{span="{span_name}",le="+Inf"}} {values[-2]}')
+        lines.append(f'{name}_sum{{span="{span_name}"}} {values[-1]:.6f}')
+        lines.append(f'{name}_count{{span="{span_name}"}} {values[-2]}')
+
+    for counter in sorted({key[0] for key in counters}):
+        lines.append(f"# TYPE {METRIC_PREFIX}_{counter} counter")
+        for (key, labels), value in sorted(counters.items()):
+            if key == counter:
+                lines.append(f"{METRIC_PREFIX}_{counter}{{{_label_text(labels)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, data: str):
+    # Erst vollständig schreiben, dann umbenennen - der Collector liest nie eine halbe Datei
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("%s konnte nicht geschrieben werden: %s", path, e)
+
+
+def write_metrics(path: str):
+    _write_atomic(path, prometheus_text())
+
+
+def chrome_trace() -> dict:
+    """Trace-Event-Format: ein 'X'-Event je Span, dazu Namen für Prozesse und Threads."""
+    with _lock:
+        events = list(_trace_events)
+    trace = []
+    threads = {}
+    for e in events:
+        threads.setdefault((e["pid"], e["tid"]), e["thread"])
+        args = dict(e["args"])
+        if e["job"]:
+            args["job"] = e["job"]
+        trace.append({"name": e["name"], "cat": "label", "ph": "X", "ts": e["ts"], "dur": e["dur"],
+                      "pid": e["pid"], "tid": e["tid"], "args": args})
+    for (pid, tid), thread_name in threads.items():
+        trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def write_trace(path: str):
+    _write_atomic(path, json.dumps(chrome_trace(), default=str))
@@ -0,0 +1,142 @@
+from collections import deque
+
+
+class LabelMatch:
+    """Treffer eines Label-Typs inkl. aller Fundstellen im (kleingeschriebenen) Text."""
+
+    def __init__(self, label_type_id: int, carrier: str, label_type: str, order: int, total: int = 0):
+        self.label_type_id = label_type_id
+        self.carrier = carrier
+        self.label_type = label_type
+        self.order = order
+        self.total = total  # Anzahl verschiedener Keywords des Label-Typs
+        self.positions = []  # Liste von (Startindex, Keyword)
+
+    @property
+    def count(self) -> int:
+        return len(self.positions)
+
+    @property
+    def keywords(self) -> set[str]:
+        return {kw for _, kw in self.positions}
+
+    @property
+    def complete(self) -> bool:
+        """Alle Keywords des Typs wurden gefunden."""
+        return len(self.keywords) >= self.total
+
+    def __repr__(self):
+        return (f"LabelMatch(id={self.label_type_id}, {self.carrier} {self.label_type}, "
+                f"count={self.count}, keywords={sorted(self.keywords)})")
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick-Automat über alle Keywords aller Label-Typen.
+    Der Text wird in einem einzigen Durchlauf gescannt - unabhängig davon,
+    wie viele Typen und Keywords im Katalog stehen.
+    """
+
+    def __init__(self, label_types):
+        # label_types: Iterable aus (id, carrier, label_type, keywords)
+        self.types = []
+        self.totals = []  # Anzahl verschiedener Keywords je Typ
+        self.patterns = []
+        self._pattern_types = []
+
+        pattern_index = {}
+        for order, (type_id, carrier, label_type, keywords) in enumerate(label_types):
+            self.types.append((type_id, carrier, label_type))
+            unique = {k.strip().lower() for k in keywords.split(",") if k.strip()} if keywords else set()
+            self.totals.append(len(unique))
+
+            for kw in unique:
+                if kw not in pattern_index:
+                    pattern_index[kw] = len(self.patterns)
+                    self.patterns.append(kw)
+                    self._pattern_types.append([])
+                self._pattern_types[pattern_index[kw]].append(order)
+
+        self._build()
+
+    def _build(self):
+        # Zustände: Übergänge, Fehler-Links, Ausgaben (Pattern-Indizes)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        # 1. Trie aufbauen
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(index)
+
+        # 2. Fehler-Links per Breitensuche
+        todo = deque(self._goto[0].values())
+        while todo:
+            state = todo.popleft()
+            for ch, nxt in self._goto[state].items():
+                todo.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def match(self, text: str) -> list[LabelMatch]:
+        """
+        Liefert alle passenden Label-Typen, sortiert nach Anzahl verschiedener
+        Keywords, dann Anzahl Fundstellen, dann Reihenfolge im Katalog.
+        """
+        if not text or not self.patterns:
+            return []
+
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = {}
+
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            for index in out[state]:
+                pattern = self.patterns[index]
+                start = pos - len(pattern) + 1
+                for order in self._pattern_types[index]:
+                    m = matches.get(order)
+                    if m is None:
+                        type_id, carrier, label_type = self.types[order]
+                        m = matches[order] = LabelMatch(type_id, carrier, label_type, order, self.totals[order])
+                    m.positions.append((start, pattern))
+
+        return sorted(matches.values(), key=lambda m: (-len(m.keywords), -m.count, m.order))
+
+
+# Zwischenspeicher: (Katalog-Version, Automat)
+_cached_matcher = (None, None)
+
+
+def get_keyword_matcher(label_repo) -> KeywordMatcher:
+    """
+    Gibt den Automaten für den aktuellen Katalog zurück. Er wird nur neu gebaut,
+    wenn sich die Katalog-Version des Repositories geändert hat (add/update/delete).
+    """
+    global _cached_matcher
+    version = label_repo.catalogue_version
+    cached_version, matcher = _cached_matcher
+    if matcher is None or cached_version != version:
+        matcher = KeywordMatcher(
+            (t.id, t.carrier, t.label_type, t.keywords) for t in label_repo.get_all()
+        )
+        _cached_matcher = (version, matcher)
+    return matcher
@@ -0,0 +1,118 @@
+import json
+import logging
+
+from PySide6.QtCore import QSettings
+
+from db.fingerprint_repository import LabelFingerprintRepository
+from db.shipping_label_repository import ShippingLabelRepository
+from modules import instrumentation
+from modules.keyword_matcher import LabelMatch, get_keyword_matcher
+from modules.layout_fingerprint import compute_fingerprint, get_fingerprint_index
+from modules.pdf_renderer import PDFRenderer
+
+logger = logging.getLogger(__name__)
+
+# Kopfbereiche je Carrier: [(Bereich, Carrier oder None für alle), ...] - einmal je Prozess gelesen
+_text_regions = None
+
+
+def text_regions() -> list[tuple[tuple, frozenset | None]]:
+    """
+    Bereiche, in denen zuerst nach Keywords gesucht wird, aus den Benutzereinstellungen:
+    identify/text_regions als JSON, z.B. {"DHL": [[0, 0, 1, 0.3]], "*": [[0, 0, 1, 0.2]]}
+    (Anteile der Seite: x0, y0, x1, y1; "*" gilt für alle Carrier). Leer = immer ganze Seite.
+    """
+    global _text_regions
+    if _text_regions is None:
+        raw = QSettings("LabelLobster", "UserSettings").value("identify/text_regions", "") or "{}"
+        carriers_by_clip = {}
+        try:
+            for carrier, clips in json.loads(raw).items():
+                for clip in clips:
+                    carriers = carriers_by_clip.setdefault(tuple(float(v) for v in clip), set())
+                    carriers.add(None if carrier == "*" else carrier.casefold())
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning("identify/text_regions unlesbar, suche auf der ganzen Seite: %s", e)
+            carriers_by_clip = {}
+        _text_regions = [(clip, None if None in carriers else frozenset(carriers))
+                         for clip, carriers in carriers_by_clip.items()]
+    return _text_regions
+
+
+def _is_confident(matches: list[LabelMatch], carriers: frozenset | None) -> bool:
+    """
+    Ein Treffer im Kopfbereich reicht, wenn er zu einem Carrier dieses Bereichs gehört, alle seine
+    Keywords dort stehen und kein anderer Typ genauso viele hat - sonst entscheidet die ganze Seite.
+    """
+    best = matches[0]
+    if carriers is not None and (best.carrier or "").casefold() not in carriers:
+        return False
+    return best.complete and (len(matches) == 1 or len(matches[1].keywords) < len(best.keywords))
+
+
+def find_label_matches(renderer: PDFRenderer, label_repo: ShippingLabelRepository,
+                       page_index: int = 0) -> list[LabelMatch]:
+    """
+    Gibt alle Label-Typen zurück, deren Keywords im PDF-Text vorkommen
+    (inkl. Fundstellen und Anzahl), der beste Treffer zuerst.
+    Zuerst werden nur die Kopfbereiche gelesen; ist der Treffer dort eindeutig, bleibt der Rest der Seite unberührt.
+    """
+    matcher = get_keyword_matcher(label_repo)
+
+    # 1. Kopfbereiche der Carrier
+    for clip, carriers in text_regions():
+        matches = matcher.match(renderer.get_page_text(page_index, clip))
+        if matches and _is_confident(matches, carriers):
+            return matches
+
+    # 2. Ganze Seite
+    raw_text = renderer.get_page_text(page_index)
+    if not raw_text:
+        logger.debug("PDF enthält keinen extrahierbaren Text (eventuell ein Scan/Bild).")
+        return []
+
+    # 3. Alle Keywords in einem Durchlauf abgleichen
+    return matcher.match(raw_text)
+
+
+def identify_by_layout(renderer: PDFRenderer, page_index: int = 0,
+                       fingerprint_repo: LabelFingerprintRepository | None = None) -> int | None:
+    """Sucht das ähnlichste gelernte Layout (Seitengröße, Textblöcke, Bilder, Vorschaubild)."""
+    index = get_fingerprint_index(fingerprint_repo or LabelFingerprintRepository())
+    if not len(index):
+        return None
+    found = index.nearest(compute_fingerprint(renderer.doc.load_page(page_index)))
+    if found is None:
+        logger.debug("Kein gelerntes Layout ähnlich genug.")
+        return None
+    label_type_id, distance = found
+    logger.debug("Label über Layout erkannt (ID: %s, Abstand: %s)", label_type_id, distance)
+    return label_type_id
+
+
+def learn_layout(renderer: PDFRenderer, label_type_id: int, page_index: int = 0,
+                 fingerprint_repo: LabelFingerprintRepository | None = None) -> bool:
+    """Merkt sich das Layout dieser Seite für den Label-Typ (z.B. beim Speichern der Crop-Box)."""
+    fp = compute_fingerprint(renderer.doc.load_page(page_index))
+    return (fingerprint_repo or LabelFingerprintRepository()).add(label_type_id, fp.width, fp.height, fp.to_hex())
+
+
+def identify_label_type(renderer: PDFRenderer, label_repo: ShippingLabelRepository, page_index: int = 0) -> int | None:
+    """
+    Durchsucht den PDF-Text nach Keywords und gibt die ID des Labeltyps zurück.
+    Ohne Treffer (oder ohne Textebene) wird das Layout mit den gelernten Fingerabdrücken verglichen.
+    Wird von der GUI und vom Batch-Modus gleichermaßen genutzt.
+    """
+    with instrumentation.span("identify", page=page_index) as span:
+        matches = find_label_matches(renderer, label_repo, page_index)
+        if not matches:
+            logger.debug("Kein passendes Label für diesen PDF-Text in der Datenbank gefunden.")
+            span["method"] = "layout"
+            return identify_by_layout(renderer, page_index)
+
+        best = matches[0]
+        if len(matches) > 1:
+            logger.debug("Mehrere Label-Typen passen: %s", matches)
+        logger.debug("Label identifiziert als: %s %s (ID: %s)", best.carrier, best.label_type, best.label_type_id)
+        span["method"] = "keywords"
+        return best.label_type_id
@@ -0,0 +1,165 @@
+import base64
+import binascii
+import logging
+import socket
+import subprocess
+import sys
+import zlib
+
+import fitz  # PyMuPDF
+
+from modules.monochrome import gray_array, pack_bits, to_monochrome
+
+logger = logging.getLogger(__name__)
+
+# Druckersprachen, die ohne Qt-Druckertreiber direkt an den Drucker gehen
+RAW_BACKENDS = ("zpl", "epl")
+
+# Bits invertieren (EPL: 0 = schwarz)
+_INVERT = bytes(255 - i for i in range(256))
+
+
+class LabelBitmap:
+    """1-Bit-Grafik eines Labels: Zeilen auf volle Bytes aufgefüllt, MSB zuerst, 1 = schwarz."""
+
+    __slots__ = ("data", "width", "height", "bytes_per_row", "x", "y")
+
+    def __init__(self, data: bytes, width: int, height: int, bytes_per_row: int, x: int = 0, y: int = 0):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.bytes_per_row = bytes_per_row
+        self.x = x  # Position auf dem Label in Dots
+        self.y = y
+
+
+def pixmap_to_bitmap(pix: fitz.Pixmap, mode: str = "threshold", level: int = 128) -> LabelBitmap:
+    """Wandelt ein Graustufen-Pixmap (Schwellwert oder Dithering) in eine gepackte 1-Bit-Grafik."""
+    data, bytes_per_row = pack_bits(to_monochrome(gray_array(pix), mode, level))
+    return LabelBitmap(data, pix.width, pix.height, bytes_per_row)
+
+
+# ---------------------------------------------------------
+# ZPL
+# ---------------------------------------------------------
+def _zpl_z64(data: bytes) -> str:
+    # :Z64: = Base64 über zlib-komprimierte Daten, dahinter CRC-16 (CCITT) über den Base64-Text
+    encoded = base64.b64encode(zlib.compress(data, 9))
+    return f":Z64:{encoded.decode('ascii')}:{binascii.crc_hqx(encoded, 0):04X}"
+
+
+def _zpl_repeat(count: int, char: str) -> str:
+    # ZPL-Lauflängenkodierung: G..Y = 1..19, g..z = 20..400 (kombinierbar, z.B. "hK0" = 45 x '0')
+    out = []
+    while count > 0:
+        n = min(count, 419)
+        high, low = divmod(n, 20)
+        prefix = (chr(ord("f") + high) if high else "") + (chr(ord("F") + low) if low and (high or low > 1) else "")
+        out.append(prefix + char)
+        count -= n
+    return "".join(out)
+
+
+def _zpl_acs(data: bytes, bytes_per_row: int) -> str:
+    """ASCII-Hex mit ZPL-Kompression (Lauflängen, ',' = Rest der Zeile weiß, ':' = Zeile wie vorher)."""
+    lines = []
+    previous = None
+    for offset in range(0, len(data), bytes_per_row):
+        row = data[offset:offset + bytes_per_row].hex().upper()
+        if row == previous:
+            lines.append(":")
+            continue
+        previous = row
+
+        stripped = row.rstrip("0")
+        tail = "," if len(stripped) < len(row) else ""
+        if not stripped and tail:
+            lines.append(",")
+            continue
+
+        parts = []
+        i = 0
+        while i < len(stripped):
+            j = i
+            while j < len(stripped) and stripped[j] == stripped[i]:
+                j += 1
+            parts.append(_zpl_repeat(j - i, stripped[i]))
+            i = j
+        lines.append("".join(parts) + tail)
+    return "".join(lines)
+
+
+def encode_zpl(bitmaps: list[LabelBitmap], label_width: int, label_height: int, compression: str = "z64") -> bytes:
+    """Ein ZPL-Format (^XA ... ^XZ) pro Grafik, Labelgröße in Dots."""
+    formats = []
+    for bmp in bitmaps:
+        total = len(bmp.data)
+        payload = _zpl_z64(bmp.data) if compression == "z64" else _zpl_acs(bmp.data, bmp.bytes_per_row)
+        formats.append(
+            f"^XA^PW{label_width}^LL{label_height}^LH0,0"
+            f"^FO{bmp.x},{bmp.y}^GFA,{total},{total},{bmp.bytes_per_row},{payload}^FS^PQ1^XZ\n"
+        )
+    return "".join(formats).encode("ascii")
+
+
+# ---------------------------------------------------------
+# EPL
+# ---------------------------------------------------------
+def encode_epl(bitmaps: list[LabelBitmap], label_width: int, label_height: int) -> bytes:
+    """Ein EPL2-Label pro Grafik (GW = Binärgrafik ohne Kompression, 0 = schwarz)."""
+    out = bytearray()
+    for bmp in bitmaps:
+        out += f"\nN\nq{label_width}\nGW{bmp.x},{bmp.y},{bmp.bytes_per_row},{bmp.height},".encode("ascii")
+        out += bmp.data.translate(_INVERT)
+        out += b"\nP1\n"
+    return bytes(out)
+
+
+def encode_labels(language: str, bitmaps: list[LabelBitmap], label_width: int, label_height: int,
+                  compression: str = "z64") -> bytes:
+    if language == "epl":
+        return encode_epl(bitmaps, label_width, label_height)
+    return encode_zpl(bitmaps, label_width, label_height, compression)
+
+
+# ---------------------------------------------------------
+# Übertragung
+# ---------------------------------------------------------
+def send_raw(printer_name: str, data: bytes, target: str = "") -> bool:
+    """
+    Schickt fertige Druckerdaten ohne Treiber-Rendering an den Drucker.
+    'target': "host:port" für Netzwerkdrucker (Port 9100), "file:<Pfad>" zum Testen,
+    leer = Spooler des Systems im RAW-Modus (Windows: pywin32, sonst CUPS 'lp').
+    """
+    try:
+        if target.startswith("file:"):
+            with open(target[5:], "ab") as f:
+                f.write(data)
+            return True
+
+        if target:
+            host, _, port = target.rpartition(":") if ":" in target else (target, "", "9100")
+            with socket.create_connection((host, int(port)), timeout=10) as s:
+                s.sendall(data)
+            return True
+
+        if sys.platform == "win32":
+            import win32print  # pywin32, nur für den RAW-Druck unter Windows nötig
+            handle = win32print.OpenPrinter(printer_name)
+            try:
+                win32print.StartDocPrinter(handle, 1, ("LabelLobster", None, "RAW"))
+                win32print.StartPagePrinter(handle)
+                win32print.WritePrinter(handle, data)
+                win32print.EndPagePrinter(handle)
+                win32print.EndDocPrinter(handle)
+            finally:
+                win32print.ClosePrinter(handle)
+            return True
+
+        subprocess.run(["lp", "-d", printer_name, "-o", "raw"], input=data, check=True,
+                       capture_output=True, timeout=30)
+        return True
+
+    except Exception as e:
+        logger.error("RAW-Druck fehlgeschlagen (%s): %s", printer_name or target, e)
+        return False
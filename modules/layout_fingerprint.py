@@ -0,0 +1,294 @@
+import hashlib
+import heapq
+
+import fitz
+import numpy as np
+
+# Bits je Teil des Fingerabdrucks (zusammen 192 Bit, Vergleich über Hamming-Distanz)
+PART_BITS = 64
+GRID = 8                  # Raster für die Textblock-Anordnung (8 x 8 Zellen = 64 Bit)
+GRID_MIN_COVERAGE = 0.08  # Anteil einer Zelle, der von Textblöcken bedeckt sein muss
+THUMB_SIZE = 256          # Längere Seite des Vorschaubilds in Pixeln (bedruckter Teil wird auf 32 x 32 gemittelt)
+INK_LEVEL = 200           # Grauwert, ab dem ein Pixel als bedruckt gilt
+SCAN_AREA = 0.5           # Bilder, die mehr als die halbe Seite bedecken, sind Scans/Hintergründe - kein Logo
+IMAGE_DIGEST_BYTES = 65536
+
+# Größter Abstand, bei dem zwei Seiten noch als derselbe Label-Typ gelten: über alle 192 Bit
+# (beide Seiten mit Textebene) bzw. nur über den pHash (mindestens eine Seite ist ein Scan).
+# Wechselnde Barcodes/Sendungsnummern verschieben den pHash desselben Typs um bis zu ~26 Bit.
+MAX_DISTANCE = 36
+MAX_PHASH_DISTANCE = 28
+SIZE_STEP = 10.0          # Seitengrößen-Klassen in Punkten (gleiches Format mit Rundungsunterschieden)
+
+_MASK = (1 << PART_BITS) - 1
+
+
+# ---------------------------------------------------------
+# Fingerabdruck einer Seite
+# ---------------------------------------------------------
+class LayoutFingerprint:
+    """
+    Günstige Merkmale einer Label-Seite, die auch ohne Textebene (Scan) funktionieren:
+    Seitengröße, Anordnung der Textblöcke, eingebettete Bilder (Logos) und ein
+    Wahrnehmungs-Hash (pHash) eines kleinen Vorschaubilds.
+    """
+
+    __slots__ = ("width", "height", "phash", "layout", "images")
+
+    def __init__(self, width: float, height: float, phash: int, layout: int, images: int):
+        self.width = width
+        self.height = height
+        self.phash = phash
+        self.layout = layout
+        self.images = images
+
+    @property
+    def bits(self) -> int:
+        return (self.phash << (2 * PART_BITS)) | (self.layout << PART_BITS) | self.images
+
+    @property
+    def has_text_layer(self) -> bool:
+        # Scans haben weder Textblöcke noch Logos als eigene Bilder - dort zählt nur der pHash
+        return bool(self.layout or self.images)
+
+    @property
+    def size_class(self) -> tuple[int, int]:
+        return round(self.width / SIZE_STEP), round(self.height / SIZE_STEP)
+
+    def distance(self, other: "LayoutFingerprint") -> int:
+        return (self.bits ^ other.bits).bit_count()
+
+    def to_hex(self) -> str:
+        return f"{self.bits:048x}"
+
+    @classmethod
+    def from_hex(cls, width: float, height: float, value: str) -> "LayoutFingerprint":
+        bits = int(value, 16)
+        return cls(width, height, bits >> (2 * PART_BITS), (bits >> PART_BITS) & _MASK, bits & _MASK)
+
+    def __repr__(self):
+        return f"LayoutFingerprint({self.width:.0f}x{self.height:.0f}, {self.to_hex()})"
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    m = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _bin_mean(a: np.ndarray, n: int, axis: int) -> np.ndarray:
+    """Mittelt eine Achse auf n Bins (Flächenmittel, auch bei ungerader Teilung)."""
+    size = a.shape[axis]
+    starts = (np.arange(n) * size) // n
+    counts = np.diff(np.append(starts, size)).clip(min=1)
+    sums = np.add.reduceat(a, starts, axis=axis)
+    return sums / (counts[:, None] if axis == 0 else counts[None, :])
+
+
+def content_thumbnail(page: fitz.Page) -> tuple[np.ndarray, fitz.Rect]:
+    """
+    Graustufen-Vorschau des bedruckten Bereichs und dieser Bereich in PDF-Punkten.
+    Labels liegen oft klein auf einer A4-Seite - ohne Zuschnitt bestimmt die weiße
+    Fläche den Hash. Über die Pixel statt über Text/Zeichnungen ermittelt, damit Scans genauso gehen.
+    """
+    rect = page.rect
+    zoom = THUMB_SIZE / max(rect.width, rect.height)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+    ink = gray < INK_LEVEL
+    rows, cols = np.flatnonzero(ink.any(axis=1)), np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0:
+        return gray.astype(np.float32), fitz.Rect(rect)
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    box = fitz.Rect(x0 / zoom, y0 / zoom, x1 / zoom, y1 / zoom) + (rect.x0, rect.y0, rect.x0, rect.y0)
+    return gray[y0:y1, x0:x1].astype(np.float32), box
+
+
+def perceptual_hash(thumbnail: np.ndarray) -> int:
+    """pHash: niedrige Frequenzen der DCT eines 32 x 32 Graustufenbilds, Bit = über dem Median."""
+    small = _bin_mean(_bin_mean(thumbnail, 32, axis=0), 32, axis=1)
+    low = (_DCT32 @ small @ _DCT32.T)[:8, :8].ravel()
+    bits = low > np.median(low[1:])  # Gleichanteil (Helligkeit) beeinflusst den Median nicht
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def layout_bits(page: fitz.Page, box: fitz.Rect) -> int:
+    """Welche Zellen eines 8 x 8 Rasters über dem bedruckten Bereich Text enthalten (0 ohne Textebene)."""
+    coverage = np.zeros((GRID, GRID), dtype=np.float32)
+    cell_w, cell_h = max(box.width, 1.0) / GRID, max(box.height, 1.0) / GRID
+    edges_x = box.x0 + np.arange(GRID + 1) * cell_w
+    edges_y = box.y0 + np.arange(GRID + 1) * cell_h
+
+    for x0, y0, x1, y1, _text, _no, block_type in page.get_text("blocks"):
+        if block_type != 0:
+            continue
+        overlap_x = np.clip(np.minimum(edges_x[1:], x1) - np.maximum(edges_x[:-1], x0), 0, None)
+        overlap_y = np.clip(np.minimum(edges_y[1:], y1) - np.maximum(edges_y[:-1], y0), 0, None)
+        coverage += np.outer(overlap_y, overlap_x)
+
+    bits = (coverage / (cell_w * cell_h)).ravel() > GRID_MIN_COVERAGE
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def image_bits(page: fitz.Page) -> int:
+    """SimHash über Digests der eingebetteten Bilder (Logos, Barcode-Grafiken); 0 ohne Bilder."""
+    page_area = abs(page.rect)
+    digests = []
+    for info in page.get_image_info(xrefs=True):
+        if abs(fitz.Rect(info["bbox"])) > SCAN_AREA * page_area:
+            continue
+        h = hashlib.blake2b(digest_size=8)
+        h.update(f"{info['width']}x{info['height']}".encode())
+        if info.get("xref"):
+            h.update(page.parent.xref_stream_raw(info["xref"])[:IMAGE_DIGEST_BYTES])
+        digests.append(int.from_bytes(h.digest(), "big"))
+
+    if not digests:
+        return 0
+    if len(digests) == 1:
+        return digests[0]
+    counts = [0] * PART_BITS
+    for d in digests:
+        for bit in range(PART_BITS):
+            counts[bit] += 1 if (d >> bit) & 1 else -1
+    return sum(1 << bit for bit, c in enumerate(counts) if c > 0)
+
+
+def compute_fingerprint(page: fitz.Page) -> LayoutFingerprint:
+    rect = page.rect
+    thumbnail, box = content_thumbnail(page)
+    return LayoutFingerprint(rect.width, rect.height, perceptual_hash(thumbnail), layout_bits(page, box),
+                             image_bits(page))
+
+
+# ---------------------------------------------------------
+# Nächste-Nachbarn-Suche
+# ---------------------------------------------------------
+class BKTree:
+    """
+    BK-Baum über die Hamming-Distanz: Kinder hängen am Abstand zum Elternknoten, so dass
+    die Dreiecksungleichung bei der Suche ganze Teilbäume ausschließt.
+    """
+
+    __slots__ = ("_root", "size")
+
+    def __init__(self):
+        self._root = None  # Knoten: [bits, Werte, {Abstand: Kind}]
+        self.size = 0
+
+    def add(self, bits: int, value):
+        self.size += 1
+        if self._root is None:
+            self._root = [bits, [value], {}]
+            return
+        node = self._root
+        while True:
+            d = (bits ^ node[0]).bit_count()
+            if d == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [bits, [value], {}]
+                return
+            node = child
+
+    def nearest(self, bits: int, max_distance: int) -> tuple[int, list] | None:
+        """Nächster Eintrag (Abstand, Werte) innerhalb von max_distance, sonst None."""
+        if self._root is None:
+            return None
+        best_d, best_values = max_distance + 1, None
+        # Best-first nach unterer Schranke |Abstand zum Kind - Abstand zum Elternknoten|: ein naher
+        # Treffer wird früh gefunden und schließt dann fast alle übrigen Teilbäume aus
+        todo = [(0, 0, self._root)]
+        counter = 1
+        while todo:
+            bound, _, (node_bits, values, children) = heapq.heappop(todo)
+            if bound >= best_d:
+                break
+            d = (bits ^ node_bits).bit_count()
+            if d < best_d:
+                best_d, best_values = d, values
+            for cd, child in children.items():
+                child_bound = abs(cd - d)
+                if child_bound < best_d:
+                    heapq.heappush(todo, (child_bound, counter, child))
+                    counter += 1
+        return (best_d, best_values) if best_values is not None else None
+
+
+class FingerprintIndex:
+    """
+    Je Seitengrößen-Klasse drei BK-Bäume: alle 192 Bit der Vorlagen mit Textebene, der pHash
+    aller Vorlagen (für Scans) und der pHash der nur von Scans gelernten Vorlagen (für PDFs mit
+    Textebene, deren Typ bisher nur als Scan bekannt ist). Benachbarte Größenklassen werden mit durchsucht.
+    """
+    FULL, PHASH, SCANNED = range(3)
+
+    def __init__(self, entries=()):
+        # entries: Iterable aus (label_type_id, LayoutFingerprint)
+        self._trees = {}  # Größenklasse -> [BK-Baum je Art]
+        for label_type_id, fp in entries:
+            self.add(label_type_id, fp)
+
+    def add(self, label_type_id: int, fp: LayoutFingerprint):
+        trees = self._trees.setdefault(fp.size_class, [BKTree(), BKTree(), BKTree()])
+        if fp.has_text_layer:
+            trees[self.FULL].add(fp.bits, label_type_id)
+        else:
+            trees[self.SCANNED].add(fp.phash, label_type_id)
+        trees[self.PHASH].add(fp.phash, label_type_id)
+
+    def __len__(self):
+        return sum(trees[self.PHASH].size for trees in self._trees.values())
+
+    def nearest(self, fp: LayoutFingerprint) -> tuple[int, int] | None:
+        """(label_type_id, Abstand) des ähnlichsten gelernten Layouts, oder None."""
+        if not fp.has_text_layer:
+            return self._nearest(fp, self.PHASH, fp.phash, MAX_PHASH_DISTANCE)
+        found = self._nearest(fp, self.FULL, fp.bits, MAX_DISTANCE)
+        if found is None:
+            found = self._nearest(fp, self.SCANNED, fp.phash, MAX_PHASH_DISTANCE)
+        return found
+
+    def _nearest(self, fp: LayoutFingerprint, kind: int, bits: int, max_distance: int) -> tuple[int, int] | None:
+        cw, ch = fp.size_class
+        best = None
+        for dw in (0, -1, 1):
+            for dh in (0, -1, 1):
+                trees = self._trees.get((cw + dw, ch + dh))
+                if trees is None:
+                    continue
+                found = trees[kind].nearest(bits, best[0] - 1 if best else max_distance)
+                if found is not None:
+                    best = found
+        if best is None:
+            return None
+        distance, label_ids = best
+        return label_ids[0], distance
+
+
+# Zwischenspeicher: (Version, Index)
+_cached_index = (None, None)
+
+
+def get_fingerprint_index(fingerprint_repo) -> FingerprintIndex:
+    """
+    Gibt den Index für die gespeicherten Fingerabdrücke zurück. Er wird nur neu gebaut,
+    wenn sich die Version des Repositories geändert hat.
+    """
+    global _cached_index
+    version = fingerprint_repo.version
+    cached_version, index = _cached_index
+    if index is None or cached_version != version:
+        index = FingerprintIndex(
+            (row.label_type_id, LayoutFingerprint.from_hex(row.page_width, row.page_height, row.fingerprint))
+            for row in fingerprint_repo.list_all()
+        )
+        _cached_index = (version, index)
+    return index
@@ -0,0 +1,302 @@
+import struct
+
+import fitz  # PyMuPDF
+import numpy as np
+
+# Umwandlungsarten Graustufen -> Schwarzweiß ("off" = Graustufen/Farbe unverändert drucken)
+MODES = ("off", "threshold", "floyd-steinberg", "ordered")
+
+# Grauwerte außerhalb dieses Bereichs gelten als satt schwarz/weiß (Balken, Schrift) und werden
+# beim Dithern nur per Schwellwert umgesetzt - so bleiben Barcode-Kanten scharf
+CLEAN_DARK = 48
+CLEAN_LIGHT = 208
+
+
+# ---------------------------------------------------------
+# Graustufen -> 1 Bit
+# ---------------------------------------------------------
+def gray_array(pix: fitz.Pixmap) -> np.ndarray:
+    """Graustufen-Pixmap als (Höhe, Breite)-Array, ohne die Pixeldaten zu kopieren."""
+    return np.frombuffer(pix.samples_mv, np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def threshold(gray: np.ndarray, level: int = 128) -> np.ndarray:
+    """True = schwarz."""
+    return gray < level
+
+
+def _bayer(size: int) -> np.ndarray:
+    m = np.array([[0, 2], [3, 1]])
+    while m.shape[0] < size:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    return m
+
+
+def ordered_dither(gray: np.ndarray, level: int = 128, size: int = 8) -> np.ndarray:
+    """Bayer-Dithering für Graustufenflächen; satte Pixel werden normal per Schwellwert umgesetzt."""
+    h, w = gray.shape
+    matrix = (_bayer(size) + 0.5) * (256.0 / (size * size))
+    thresholds = np.tile(matrix, (h // size + 1, w // size + 1))[:h, :w]
+
+    clean = (gray <= CLEAN_DARK) | (gray >= CLEAN_LIGHT)
+    return np.where(clean, gray < level, gray < thresholds)
+
+
+def floyd_steinberg(gray: np.ndarray, level: int = 128) -> np.ndarray:
+    """
+    Floyd-Steinberg-Fehlerverteilung, vektorisiert über Diagonalen: Pixel (y, x) hängt nur
+    von Pixeln mit kleinerem x + 2y ab, alle Pixel mit gleichem x + 2y werden also in einem
+    NumPy-Schritt berechnet (Breite + 2 * Höhe Schritte statt Breite * Höhe).
+    Satte Pixel verteilen keinen Fehler und bleiben exakt schwarz/weiß.
+    """
+    h, w = gray.shape
+    # Ein Pixel Rand links/rechts und eine Zeile unten, damit die Verteilung nie aus dem Array fällt
+    buf = np.zeros((h + 1, w + 2), np.float32)
+    buf[:h, 1:w + 1] = gray
+    black = np.zeros((h, w), bool)
+
+    for t in range(w + 2 * (h - 1)):
+        ys = np.arange(max(0, (t - w + 2) // 2), min(h - 1, t // 2) + 1)
+        xs = t - 2 * ys
+        original = gray[ys, xs]
+        value = buf[ys, xs + 1]
+
+        clean = (original <= CLEAN_DARK) | (original >= CLEAN_LIGHT)
+        out = np.where(clean, original < level, value < level)
+        black[ys, xs] = out
+
+        error = np.where(clean, 0.0, value - np.where(out, 0.0, 255.0)).astype(np.float32)
+        buf[ys, xs + 2] += error * (7 / 16)
+        buf[ys + 1, xs] += error * (3 / 16)
+        buf[ys + 1, xs + 1] += error * (5 / 16)
+        buf[ys + 1, xs + 2] += error * (1 / 16)
+
+    return black
+
+
+def to_monochrome(gray: np.ndarray, mode: str = "threshold", level: int = 128) -> np.ndarray:
+    if mode == "floyd-steinberg":
+        return floyd_steinberg(gray, level)
+    if mode == "ordered":
+        return ordered_dither(gray, level)
+    return threshold(gray, level)
+
+
+def pack_bits(black: np.ndarray) -> tuple[bytes, int]:
+    """Gepackte Zeilen (MSB zuerst, 1 = schwarz, auf volle Bytes aufgefüllt) und Bytes pro Zeile."""
+    packed = np.packbits(black, axis=1)
+    return packed.tobytes(), packed.shape[1]
+
+
+# ---------------------------------------------------------
+# CCITT Gruppe 4 (ITU-T T.6)
+# ---------------------------------------------------------
+_WHITE_TERMINATING = (
+    "00110101", "000111", "0111", "1000", "1011", "1100", "1110", "1111",
+    "10011", "10100", "00111", "01000", "001000", "000011", "110100", "110101",
+    "101010", "101011", "0100111", "0001100", "0001000", "0010111", "0000011", "0000100",
+    "0101000", "0101011", "0010011", "0100100", "0011000", "00000010", "00000011", "00011010",
+    "00011011", "00010010", "00010011", "00010100", "00010101", "00010110", "00010111", "00101000",
+    "00101001", "00101010", "00101011", "00101100", "00101101", "00000100", "00000101", "00001010",
+    "00001011", "01010010", "01010011", "01010100", "01010101", "00100100", "00100101", "01011000",
+    "01011001", "01011010", "01011011", "01001010", "01001011", "00110010", "00110011", "00110100",
+)
+_BLACK_TERMINATING = (
+    "0000110111", "010", "11", "10", "011", "0011", "0010", "00011",
+    "000101", "000100", "0000100", "0000101", "0000111", "00000100", "00000111", "000011000",
+    "0000010111", "0000011000", "0000001000", "00001100111", "00001101000", "00001101100", "00000110111",
+    "00000101000", "00000010111", "00000011000", "000011001010", "000011001011", "000011001100",
+    "000011001101", "000001101000", "000001101001", "000001101010", "000001101011", "000011010010",
+    "000011010011", "000011010100", "000011010101", "000011010110", "000011010111", "000001101100",
+    "000001101101", "000011011010", "000011011011", "000001010100", "000001010101", "000001010110",
+    "000001010111", "000001100100", "000001100101", "000001010010", "000001010011", "000000100100",
+    "000000110111", "000000111000", "000000100111", "000000101000", "000001011000", "000001011001",
+    "000000101011", "000000101100", "000001011010", "000001100110", "000001100111",
+)
+# Make-up-Codes für 64, 128, ... 1728
+_WHITE_MAKEUP = (
+    "11011", "10010", "010111", "0110111", "00110110", "00110111", "01100100", "01100101",
+    "01101000", "01100111", "011001100", "011001101", "011010010", "011010011", "011010100",
+    "011010101", "011010110", "011010111", "011011000", "011011001", "011011010", "011011011",
+    "010011000", "010011001", "010011010", "011000", "010011011",
+)
+_BLACK_MAKEUP = (
+    "0000001111", "000011001000", "000011001001", "000001011011", "000000110011", "000000110100",
+    "000000110101", "0000001101100", "0000001101101", "0000001001010", "0000001001011",
+    "0000001001100", "0000001001101", "0000001110010", "0000001110011", "0000001110100",
+    "0000001110101", "0000001110110", "0000001110111", "0000001010010", "0000001010011",
+    "0000001010100", "0000001010101", "0000001011010", "0000001011011", "0000001100100",
+    "0000001100101",
+)
+# Erweiterte Make-up-Codes für 1792 ... 2560 (beide Farben)
+_EXTENDED_MAKEUP = (
+    "00000001000", "00000001100", "00000001101", "000000010010", "000000010011", "000000010100",
+    "000000010101", "000000010110", "000000010111", "000000011100", "000000011101", "000000011110",
+    "000000011111",
+)
+_PASS = "0001"
+_HORIZONTAL = "001"
+_VERTICAL = {0: "1", 1: "011", 2: "000011", 3: "0000011", -1: "010", -2: "000010", -3: "0000010"}
+_EOFB = "000000000001000000000001"
+
+
+def _run_code(run: int, color: int) -> str:
+    terminating = _BLACK_TERMINATING if color else _WHITE_TERMINATING
+    makeup = _BLACK_MAKEUP if color else _WHITE_MAKEUP
+
+    parts = []
+    while run >= 2560:
+        parts.append(_EXTENDED_MAKEUP[-1])
+        run -= 2560
+    if run >= 64:
+        length = run // 64 * 64
+        parts.append(makeup[length // 64 - 1] if length <= 1728 else _EXTENDED_MAKEUP[(length - 1792) // 64])
+        run -= length
+    parts.append(terminating[run])
+    return "".join(parts)
+
+
+def _encode_g4_row(cur: list[int], ref: list[int], width: int, out: list[str]):
+    # cur/ref: Farbwechsel-Positionen der Zeile bzw. Vorgängerzeile, jeweils mit [width] * 3 am Ende.
+    # Wechsel mit geradem Index gehen nach schwarz, mit ungeradem nach weiß.
+    a0 = -1
+    color = 0
+    i = j = 0
+    while a0 < width:
+        while cur[i] <= a0:
+            i += 1
+        a1 = cur[i]
+
+        # b1: erster Wechsel der Vorgängerzeile rechts von a0 in die Gegenfarbe von a0
+        j = max(j - 1, 0)
+        while ref[j] <= a0 or (j & 1) != color:
+            j += 1
+        b1 = ref[j]
+        b2 = ref[j + 1]
+
+        if b2 < a1:
+            out.append(_PASS)
+            a0 = b2
+        elif -3 <= a1 - b1 <= 3:
+            out.append(_VERTICAL[a1 - b1])
+            a0 = a1
+            color ^= 1
+        else:
+            a2 = cur[i + 1]
+            out.append(_HORIZONTAL)
+            out.append(_run_code(a1 - max(a0, 0), color))
+            out.append(_run_code(a2 - a1, color ^ 1))
+            a0 = a2
+
+
+def encode_g4(black: np.ndarray) -> bytes:
+    """Kodiert ein Schwarzweiß-Bild (True = schwarz) als CCITT-G4-Datenstrom (mit EOFB)."""
+    h, w = black.shape
+
+    # Farbwechsel aller Zeilen auf einmal bestimmen, die Schleife läuft nur noch über Wechsel
+    changes = np.empty((h, w), bool)
+    changes[:, 0] = black[:, 0]
+    changes[:, 1:] = black[:, 1:] != black[:, :-1]
+    rows, cols = np.nonzero(changes)
+    bounds = np.searchsorted(rows, np.arange(h + 1))
+    cols = cols.tolist()
+
+    out = []
+    ref = [w] * 3
+    for y in range(h):
+        cur = cols[bounds[y]:bounds[y + 1]] + [w] * 3
+        _encode_g4_row(cur, ref, w, out)
+        ref = cur
+    out.append(_EOFB)
+
+    bits = "".join(out)
+    bits += "0" * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, "big") if bits else b""
+
+
+# ---------------------------------------------------------
+# Container: TIFF und PDF mit G4-Bildern
+# ---------------------------------------------------------
+def g4_tiff(pages: list[np.ndarray], dpi: int) -> bytes:
+    """Mehrseitiges TIFF (Compression 4, WhiteIsZero), eine Seite pro Schwarzweiß-Bild."""
+    out = bytearray(b"II*\x00\x00\x00\x00\x00")
+    next_ifd_pointer = 4
+    for black in pages:
+        h, w = black.shape
+        data = encode_g4(black)
+
+        strip_offset = len(out)
+        out += data
+        if len(out) % 2:
+            out += b"\x00"
+        resolution_offset = len(out)
+        out += struct.pack("<IIII", dpi, 1, dpi, 1)
+
+        struct.pack_into("<I", out, next_ifd_pointer, len(out))
+        # (Tag, Typ: 3 = SHORT, 4 = LONG, 5 = RATIONAL, Wert bzw. Offset)
+        tags = [
+            (254, 4, 2), (256, 4, w), (257, 4, h), (258, 3, 1), (259, 3, 4), (262, 3, 0),
+            (273, 4, strip_offset), (277, 3, 1), (278, 4, h), (279, 4, len(data)),
+            (282, 5, resolution_offset), (283, 5, resolution_offset + 8), (296, 3, 2),
+        ]
+        out += struct.pack("<H", len(tags))
+        for tag, tag_type, value in tags:
+            out += struct.pack("<HHII", tag, tag_type, 1, value)
+        next_ifd_pointer = len(out)
+        out += b"\x00\x00\x00\x00"
+    return bytes(out)
+
+
+def g4_pdf(pages: list[np.ndarray], dpi: int) -> bytes:
+    """PDF mit einem G4-komprimierten Bild pro Seite (Seitengröße = Bildgröße bei 'dpi')."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    kids = []
+    for black in pages:
+        h, w = black.shape
+        data = encode_g4(black)
+        width_pt = w * 72 / dpi
+        height_pt = h * 72 / dpi
+
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R")
+        content = f"q {width_pt:.3f} 0 0 {height_pt:.3f} 0 0 cm /Im0 Do Q".encode("ascii")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.3f} {height_pt:.3f}] "
+            f"/Resources << /XObject << /Im0 {page_id + 2} 0 R >> >> /Contents {page_id + 1} 0 R >>".encode("ascii")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(
+            f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace /DeviceGray "
+            f"/BitsPerComponent 1 /Filter /CCITTFaxDecode "
+            f"/DecodeParms << /K -1 /Columns {w} /Rows {h} >> /Length {len(data)} >>\nstream\n".encode("ascii")
+            + data + b"\nendstream"
+        )
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def rasterize_pdf(pdf, dpi: int, mode: str = "threshold", level: int = 128) -> list[np.ndarray]:
+    """Rastert alle Seiten eines (gecroppten) PDFs in Schwarzweiß. 'pdf' ist ein Pfad, Bytes oder fitz.Document."""
+    own_doc = not isinstance(pdf, fitz.Document)
+    doc = (fitz.open(stream=pdf, filetype="pdf") if isinstance(pdf, bytes) else fitz.open(pdf)) if own_doc else pdf
+    try:
+        zoom = dpi / 72
+        pages = []
+        for page in doc:
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+            pages.append(to_monochrome(gray_array(pix), mode, level))
+        return pages
+    finally:
+        if own_doc:
+            doc.close()
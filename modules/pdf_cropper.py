@@ -0,0 +1,128 @@
+import logging
+
+import fitz  # PyMuPDF
+
+from modules import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+def crop_coords_from_clip(clip) -> dict:
+    """Wandelt einen Ausschnitt (x0, y0, x1, y1) in das Koordinaten-Dict der GUI um."""
+    x0, y0, x1, y1 = clip
+    return {
+        "x0": x0,
+        "y0": y0,
+        "x1": x1,
+        "y1": y1,
+        "width": round(x1 - x0, 2),
+        "height": round(y1 - y0, 2)
+    }
+
+
+def crop_coords_from_row(row) -> dict:
+    """Wandelt einen gespeicherten CropData-Eintrag in das Koordinaten-Dict der GUI um."""
+    return crop_coords_from_clip((row.crop_x0, row.crop_y0, row.crop_x1, row.crop_y1))
+
+
+def crop_pages_to_document(source, crops: list[tuple[int, dict]]) -> fitz.Document | None:
+    """
+    Schneidet mehrere Bereiche aus (je Eintrag: Seitennummer + Koordinaten in PDF-Punkten,
+    72 DPI) und gibt sie als neues mehrseitiges fitz.Document im Speicher zurück.
+    'source' ist ein Dateipfad oder ein bereits geöffnetes fitz.Document.
+    """
+    if not crops:
+        return None
+
+    own_doc = not isinstance(source, fitz.Document)
+    src_doc = None
+    try:
+        with instrumentation.span("crop", pages=len(crops)):
+            # 1. Quelldokument öffnen (falls nicht schon offen)
+            src_doc = fitz.open(source) if own_doc else source
+
+            # Sicherheits-Check: Hat das PDF überhaupt Seiten?
+            if src_doc.page_count == 0:
+                logger.warning("Quelldokument ist leer.")
+                return None
+
+            # 2. Ziel-Dokument erstellen
+            dest_doc = fitz.open()
+
+            for page_number, coords in crops:
+                # 3. Das Rechteck für den Ausschnitt (72 DPI)
+                # Wir nutzen fitz.Rect direkt mit den berechneten Punkten
+                crop_rect = fitz.Rect(
+                    coords["x0"], coords["y0"],
+                    coords["x1"], coords["y1"]
+                )
+
+                # 4. Neue Seite im Ziel-Dokument mit der Größe der Box anlegen
+                dest_page = dest_doc.new_page(
+                    width=coords["width"],
+                    height=coords["height"]
+                )
+
+                # 5. Inhalt der Quellseite auf die Zielseite projizieren
+                # WICHTIG: show_pdf_page braucht das Dokument-Objekt, nicht das Page-Objekt
+                dest_page.show_pdf_page(
+                    dest_page.rect,  # Ziel-Rechteck (die ganze neue Seite)
+                    src_doc,  # Quelldokument
+                    pno=page_number,  # Seitennummer (0 = erste Seite)
+                    clip=crop_rect  # Der exakte Ausschnitt
+                )
+
+            return dest_doc
+
+    except Exception as e:
+        logger.warning("Fehler beim PDF-Cropping: %s", e)
+        return None
+
+    finally:
+        if own_doc and src_doc is not None:
+            src_doc.close()
+
+
+def crop_to_document(source, coords: dict, page_number: int = 0) -> fitz.Document | None:
+    """Schneidet den Bereich 'coords' aus einer Seite aus (einseitiges fitz.Document)."""
+    return crop_pages_to_document(source, [(page_number, coords)])
+
+
+def crop_pages_to_bytes(source, crops: list[tuple[int, dict]]) -> bytes | None:
+    """Wie crop_pages_to_document, liefert aber die fertigen PDF-Bytes (z.B. für andere Prozesse)."""
+    dest_doc = crop_pages_to_document(source, crops)
+    if dest_doc is None:
+        return None
+    # Mit Kompression für den Drucker
+    with instrumentation.span("crop_write"):
+        data = dest_doc.tobytes(garbage=3, deflate=True)
+    dest_doc.close()
+    return data
+
+
+def crop_to_bytes(source, coords: dict, page_number: int = 0) -> bytes | None:
+    """Einseitige Variante von crop_pages_to_bytes."""
+    return crop_pages_to_bytes(source, [(page_number, coords)])
+
+
+def create_cropped_pdf(source_pdf_path: str, output_pdf_path: str, coords: dict, page_number: int = 0) -> bool:
+    """
+    Schneidet den Bereich 'coords' aus und speichert ihn als einseitiges PDF.
+    Benötigt keine GUI.
+    """
+    dest_doc = crop_to_document(source_pdf_path, coords, page_number)
+    if dest_doc is None:
+        return False
+
+    try:
+        # Speichern (mit Kompression für den Drucker)
+        with instrumentation.span("crop_write"):
+            dest_doc.save(output_pdf_path, garbage=3, deflate=True)
+    except Exception as e:
+        logger.warning("Fehler beim Speichern des Crops: %s", e)
+        return False
+    finally:
+        dest_doc.close()
+
+    logger.debug("Crop erfolgreich erstellt: %s", output_pdf_path)
+    return True
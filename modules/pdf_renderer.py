@@ -1,41 +1,183 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
 import fitz  # PyMuPDF
+from PySide6.QtCore import QObject, Signal
 from PySide6.QtGui import QImage, QPixmap
 
+from modules import instrumentation
+from modules.render_cache import RenderCache, RenderedPage, get_render_cache, get_text_cache
+
+logger = logging.getLogger(__name__)
+
+# Prozess-Pool für Hintergrund-Renderings. PyMuPDF gibt den GIL beim Rastern nicht frei,
+# ein Thread würde die GUI also trotzdem blockieren - deshalb eigene Prozesse.
+_render_pool = None
+
+# Im Render-Prozess offen gehaltene Dokumente (Kacheln derselben Seite kommen in schneller Folge)
+_open_docs = OrderedDict()
+MAX_OPEN_DOCS = 4
+
+
+def file_hash(filename: str) -> str:
+    """SHA-256 über den Dateiinhalt (gleiche PDF = gleicher Cache-Eintrag, egal wo sie liegt)."""
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+    return _render_pool
+
+
+def rasterize_page(doc, page_number: int, dpi: float, colorspace: str = "rgb") -> RenderedPage:
+    """Rastert eine Seite eines geöffneten fitz-Dokuments (ohne Cache, ohne Qt)."""
+    page = doc.load_page(page_number)
+
+    # Zoom berechnen (72 DPI ist Standard im PDF)
+    zoom = dpi / 72
+    matrix = fitz.Matrix(zoom, zoom)
+
+    cs = fitz.csGRAY if colorspace == "gray" else fitz.csRGB
+    with instrumentation.span("render", page=page_number, dpi=dpi):
+        pix = page.get_pixmap(matrix=matrix, colorspace=cs)
+
+    return RenderedPage(pix.width, pix.height, pix.stride, bool(pix.alpha), pix.samples, tuple(page.rect))
+
+
+def rasterize_clip(doc, page_number: int, dpi: float, clip: tuple, colorspace: str = "rgb") -> RenderedPage:
+    """Rastert nur einen Ausschnitt (x0, y0, x1, y1 in PDF-Punkten) - z.B. eine Kachel der Ansicht."""
+    page = doc.load_page(page_number)
+    zoom = dpi / 72
+    cs = fitz.csGRAY if colorspace == "gray" else fitz.csRGB
+    with instrumentation.span("render", page=page_number, dpi=dpi, tile=True):
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=fitz.Rect(clip), colorspace=cs, alpha=False)
+    return RenderedPage(pix.width, pix.height, pix.stride, bool(pix.alpha), pix.samples, tuple(clip))
+
+
+def _cached_doc(filename: str):
+    # Schlüssel mit Änderungszeit: wird die Datei ersetzt, wird sie neu geöffnet
+    key = (filename, os.path.getmtime(filename))
+    doc = _open_docs.get(key)
+    if doc is None:
+        doc = _open_docs[key] = fitz.open(filename)
+        while len(_open_docs) > MAX_OPEN_DOCS:
+            _open_docs.popitem(last=False)[1].close()
+    _open_docs.move_to_end(key)
+    return doc
+
+
+def _rasterize_file_clip(filename: str, page_number: int, dpi: float, clip: tuple, colorspace: str) -> RenderedPage:
+    """Einstiegspunkt im Render-Prozess für Kacheln (Dokument bleibt für die nächsten Kacheln offen)."""
+    return rasterize_clip(_cached_doc(filename), page_number, dpi, clip, colorspace)
+
+
+def rendered_page_to_pixmap(entry: RenderedPage, colorspace: str = "rgb") -> QPixmap:
+    # Bild-Format bestimmen
+    if colorspace == "gray":
+        fmt = QImage.Format_Grayscale8
+    else:
+        fmt = QImage.Format_RGBA8888 if entry.alpha else QImage.Format_RGB888
+
+    # QImage aus den Rohdaten des Pixmaps erstellen
+    qt_image = QImage(
+        entry.samples,
+        entry.width,
+        entry.height,
+        entry.stride,
+        fmt
+    )
+    return QPixmap.fromImage(qt_image)
+
+
+class RenderNotifier(QObject):
+    """Leitet fertige Hintergrund-Renderings per Signal in den GUI-Thread."""
+    finished = Signal(object, object)  # (Token, RenderedPage oder None)
+
+    def watch(self, future: Future, token):
+        def done(f: Future):
+            if f.cancelled():
+                self.finished.emit(token, None)
+                return
+            try:
+                result = f.result()
+            except Exception as e:
+                logger.error("Renderer-Fehler im Hintergrund: %s", e)
+                result = None
+            self.finished.emit(token, result)
+        future.add_done_callback(done)
+
 
 class PDFRenderer:
-    def __init__(self, filename):
-        self.doc = fitz.open(filename)
+    def __init__(self, filename, cache: RenderCache | None = None):
+        self.filename = filename
+        with instrumentation.span("import"):
+            self.doc = fitz.open(filename)
+        self.cache = cache
+        self._doc_hash = None
 
-    def get_page_pixmap(self, page_number=0, dpi=150):
-        """Konvertiert eine PDF-Seite in ein QPixmap."""
-        page = self.doc.load_page(page_number)
+    @property
+    def doc_hash(self) -> str:
+        if self._doc_hash is None:
+            self._doc_hash = file_hash(self.filename)
+        return self._doc_hash
+
+    def render_page(self, page_number=0, dpi=150, colorspace="rgb") -> RenderedPage:
+        """Rastert eine Seite (oder holt sie aus dem Render-Cache)."""
+        cache = self.cache or get_render_cache()
+        key = (self.doc_hash, page_number, dpi, colorspace)
 
-        # Zoom berechnen (72 DPI ist Standard im PDF)
-        zoom = dpi / 72
-        matrix = fitz.Matrix(zoom, zoom)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
 
-        pix = page.get_pixmap(matrix=matrix)
+        entry = rasterize_page(self.doc, page_number, dpi, colorspace)
+        cache.put(key, entry)
+        return entry
 
-        # Bild-Format bestimmen
-        fmt = QImage.Format_RGBA8888 if pix.alpha else QImage.Format_RGB888
+    def render_clip_async(self, page_number: int, dpi: float, clip: tuple, colorspace="rgb") -> Future:
+        """Rastert einen Ausschnitt im Render-Prozess (ohne Render-Cache - Kacheln cacht die Ansicht)."""
+        return get_render_pool().submit(_rasterize_file_clip, self.filename, page_number, dpi, tuple(clip), colorspace)
 
-        # QImage aus den Rohdaten des Pixmaps erstellen
-        qt_image = QImage(
-            pix.samples,
-            pix.width,
-            pix.height,
-            pix.stride,
-            fmt
-        )
+    def get_page_pixmap(self, page_number=0, dpi=150, colorspace="rgb"):
+        """Konvertiert eine PDF-Seite in ein QPixmap."""
+        entry = self.render_page(page_number, dpi, colorspace)
+        return rendered_page_to_pixmap(entry, colorspace), fitz.Rect(entry.rect)
 
-        return QPixmap.fromImage(qt_image), page.rect
+    def get_page_text(self, page_index: int, clip: tuple | None = None) -> str:
+        """
+        Extrahiert den Rohtext einer bestimmten Seite, mit 'clip' nur aus diesem Bereich
+        (Anteile von Breite/Höhe der Seite wie angezeigt: x0, y0, x1, y1).
+        Der Text wird je Dokument-Hash gecacht.
+        """
+        cache = get_text_cache()
+        key = (self.doc_hash, page_index, clip)
+        text = cache.get(key)
+        if text is not None:
+            return text
 
-    def get_page_text(self, page_index: int) -> str:
-        """Extrahiert den Rohtext einer bestimmten Seite."""
         try:
-            # Falls du fitz (PyMuPDF) nutzt:
-            page = self.doc.load_page(page_index)
-            return page.get_text()
+            with instrumentation.span("text_extraction", page=page_index, clip=clip is not None):
+                page = self.doc.load_page(page_index)
+                if clip is None:
+                    text = page.get_text()
+                else:
+                    # Textkoordinaten sind ungedreht, der Bereich bezieht sich auf die angezeigte Seite
+                    r = page.rect
+                    area = fitz.Rect(r.x0 + clip[0] * r.width, r.y0 + clip[1] * r.height,
+                                     r.x0 + clip[2] * r.width, r.y0 + clip[3] * r.height)
+                    text = page.get_text(clip=area * page.derotation_matrix)
         except Exception as e:
-            print(f"Renderer-Fehler bei Textextraktion: {e}")
-            return ""
\ No newline at end of file
+            logger.error("Renderer-Fehler bei Textextraktion: %s", e)
+            return ""
+        cache.put(key, text)
+        return text
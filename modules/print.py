@@ -1,62 +1,116 @@
 import os
-import time
+import threading
 
-from PySide6.QtCore import QSize, QPoint
+import fitz  # PyMuPDF
+import numpy as np
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QRect, QSettings, QSize, QPoint
 from PySide6.QtGui import QPainter, QImage, Qt, QColor, QTransform
 from PySide6.QtPdf import QPdfDocument
-from PySide6.QtPrintSupport import QPrinterInfo, QPrinter
-from sqlalchemy import String
+from PySide6.QtPrintSupport import QPrinter
 
+from modules import instrumentation
+from modules.label_language import RAW_BACKENDS, encode_labels, pixmap_to_bitmap, send_raw
+from modules.monochrome import gray_array, pack_bits, to_monochrome
+from modules.printer_cache import get_printer_cache
 
-def wait_and_delete_file(filepath, timeout=30, interval=1):
-    """
-    Wartet, bis eine Datei nicht mehr blockiert ist, und löscht sie dann.
-    """
-    start_time = time.time()
 
-    while time.time() - start_time < timeout:
-        if not os.path.exists(filepath):
-            return True  # Datei existiert bereits nicht mehr
-
-        try:
-            os.remove(filepath)
-            print(f"Datei {filepath} erfolgreich gelöscht.")
-            return True
-        except OSError:
-            # Datei ist wahrscheinlich noch in Benutzung (besonders unter Windows)
-            time.sleep(interval)
-
-    print(f"Timeout: Datei {filepath} konnte nicht gelöscht werden.")
-    return False
+# PyMuPDF ist nicht threadsicher - Druck-Threads rendern nacheinander
+_fitz_lock = threading.Lock()
 
 
 class PrintingSystem:
     def __init__(self):
         self.printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-        self.available_printers = QPrinterInfo.availablePrinters()
+        # Druckerliste und Papierformate kommen aus dem Cache (CUPS-Abfragen dauern teils Sekunden)
+        self.printer_cache = get_printer_cache()
+        self.load_backend_settings()
         return
 
+    def load_backend_settings(self):
+        """
+        Ausgabeweg aus den Benutzereinstellungen: print/backend ("qt", "zpl" oder "epl"),
+        print/raw_dpi (Auflösung des Thermodruckers), print/raw_target (leer = System-Spooler,
+        "host:port" = direkt per TCP, "file:<Pfad>" = in eine Datei),
+        print/bitmap_mode ("off", "threshold", "floyd-steinberg", "ordered") und print/bitmap_threshold
+        """
+        settings = QSettings("LabelLobster", "UserSettings")
+        self.backend = settings.value("print/backend", "qt")
+        self.raw_dpi = int(settings.value("print/raw_dpi", 203))
+        self.raw_target = settings.value("print/raw_target", "")
+        self.bitmap_mode = settings.value("print/bitmap_mode", "threshold")
+        self.bitmap_threshold = int(settings.value("print/bitmap_threshold", 128))
+
+    # ---------------------------------------------------------
+    # Schwarzweiß: Thermodrucker bekommen fertige 1-Bit-Bilder statt RGB
+    # ---------------------------------------------------------
+    def mono_qimage(self, gray) -> QImage:
+        """Graustufen-Array -> 1-Bit-QImage (1/24 des Speichers eines RGB-Bilds)."""
+        data, bytes_per_line = pack_bits(to_monochrome(gray, self.bitmap_mode, self.bitmap_threshold))
+        img = QImage(data, gray.shape[1], gray.shape[0], bytes_per_line, QImage.Format.Format_Mono)
+        img.setColorTable([0xFFFFFFFF, 0xFF000000])  # Bit 0 = weiß, Bit 1 = schwarz
+        # Kopie löst das Bild vom Python-Puffer, bleibt aber 1 Bit pro Pixel
+        return img.copy()
+
+    def pixmap_to_qimage(self, pix: fitz.Pixmap) -> QImage:
+        if pix.n == 1 and self.bitmap_mode != "off":
+            return self.mono_qimage(gray_array(pix))
+        fmt = QImage.Format.Format_Grayscale8 if pix.n == 1 else QImage.Format.Format_RGB888
+        # QImage zeigt direkt auf den Puffer des Pixmaps (keine Kopie)
+        return QImage(pix.samples_mv, pix.width, pix.height, pix.stride, fmt)
+
     def set_printer(self, printer):
-        self.printer.setPrinterName(printer)
+        # setPrinterName lädt die Treiberdaten neu - nur bei einem echten Wechsel
+        if self.printer.printerName() != printer:
+            self.printer.setPrinterName(printer)
 
-    def get_available_printers(self):
-        return self.available_printers
+    def get_available_printers(self) -> list[str]:
+        return self.printer_cache.printer_names()
 
     def load_paper_formats(self):
-        info = QPrinterInfo(self.printer)
-        paper_formats =  info.supportedPageSizes()
-        return paper_formats
+        return self.printer_cache.page_sizes(self.printer.printerName())
+
+    def set_paper_by_name(self, paper_name: str) -> bool:
+        """Setzt das Papierformat anhand des Namens (wie in der Papier-ComboBox)."""
+        for ps in self.load_paper_formats():
+            if ps.name() == paper_name:
+                self.printer.setPageSize(ps)
+                return True
+        return False
 
     def get_selected_paper_information(self):
         actual_page_size  = self.printer.pageLayout().pageSize()
         return actual_page_size
 
-    def print_pdf(self, pdf_path: str) -> bool:
-        if not os.path.exists(pdf_path): return False
-
+    @staticmethod
+    def _load_pdf(pdf) -> tuple[QPdfDocument | None, QBuffer | None]:
+        """
+        Lädt ein PDF aus Dateipfad, Bytes oder fitz.Document in ein QPdfDocument.
+        Bei Daten im Speicher wird kein Umweg über das Dateisystem genommen;
+        der zurückgegebene Puffer muss leben, solange das Dokument benutzt wird.
+        """
         doc = QPdfDocument()
-        doc.load(pdf_path)
-        if doc.status() != QPdfDocument.Status.Ready: return False
+        buffer = None
+
+        if isinstance(pdf, str):
+            if not os.path.exists(pdf): return None, None
+            doc.load(pdf)
+        else:
+            data = pdf.tobytes(garbage=3, deflate=True) if isinstance(pdf, fitz.Document) else pdf
+            buffer = QBuffer()
+            buffer.setData(QByteArray(data))
+            buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+            doc.load(buffer)
+
+        if doc.status() != QPdfDocument.Status.Ready: return None, None
+        return doc, buffer
+
+    def print_pdf(self, pdf) -> bool:
+        """Druckt ein PDF. 'pdf' ist ein Dateipfad, PDF-Bytes oder ein fitz.Document."""
+        if self.backend in RAW_BACKENDS:
+            return self.print_pdf_raw(pdf)
+
+        doc, buffer = self._load_pdf(pdf)
+        if doc is None: return False
 
         # 1. Drucker-Geometrie abfragen (203 DPI)
         dpi = self.printer.resolution()
@@ -76,7 +130,8 @@ class PrintingSystem:
             nh = int(pdf_size_pt.height() * scale)
 
             # 3. Rendern in nativer Auflösung
-            raw_img = doc.render(i, QSize(nw, nh))
+            with instrumentation.span("rasterize", page=i, dpi=dpi):
+                raw_img = doc.render(i, QSize(nw, nh))
 
             # 4. Hintergrund füllen (Verhindert Schwarz-Druck bei Transparenz)
             final_img = QImage(QSize(nw, nh), QImage.Format.Format_RGB32)
@@ -100,24 +155,226 @@ class PrintingSystem:
                     Qt.TransformationMode.SmoothTransformation
                 )
 
+            # Schwarzweiß-Umwandlung selbst erledigen statt dem Treiber zu überlassen
+            if self.bitmap_mode != "off":
+                gray_img = final_img.convertToFormat(QImage.Format.Format_Grayscale8)
+                gray = np.frombuffer(gray_img.constBits(), np.uint8).reshape(
+                    gray_img.height(), gray_img.bytesPerLine())[:, :gray_img.width()]
+                final_img = self.mono_qimage(gray)
+
             # 7. Positionierung unter Berücksichtigung der Seitenränder (Margins)
             # p_rect.left/top sind die vom Treiber gemeldeten Offsets (12px/24px)
             x_final = paint_rect.left() + (paint_rect.width() - final_img.width()) // 2
             y_final = paint_rect.top() + (paint_rect.height() - final_img.height()) // 2
 
             # 1:1 Ausgabe an der berechneten Position
-            painter.drawImage(QPoint(x_final, y_final), final_img)
+            with instrumentation.span("spool", page=i):
+                painter.drawImage(QPoint(x_final, y_final), final_img)
 
-        painter.end()
+        with instrumentation.span("spool", pages=doc.pageCount()):
+            painter.end()
         doc.close()
 
         del painter
         del doc
+        del buffer
+
+        return True
+
+    # ---------------------------------------------------------
+    # Direktdruck: Ausschnitt in einem Schritt in den Druckpuffer rendern
+    # ---------------------------------------------------------
+    @staticmethod
+    def compute_clip_matrix(clip_rect, dpi: int, paint_rect) -> fitz.Matrix:
+        """
+        Eine einzige Matrix für Skalierung auf Drucker-DPI, 90°-Rotation (falls der
+        Ausschnitt quer zum Papier liegt) und Einpassen in den Druckbereich.
+        Entspricht den Schritten 2, 5 und 6 aus print_pdf.
+        """
+        scale = dpi / 72.0
+        w = clip_rect.width * scale
+        h = clip_rect.height * scale
+
+        # Rotation (Falls der Ausschnitt quer zum Papier liegt)
+        rotate = (w > h) != (paint_rect.width() > paint_rect.height())
+        if rotate:
+            w, h = h, w
+
+        # Nur verkleinern, wenn das Bild über den Paint-Bereich hinausragt
+        if w > paint_rect.width() or h > paint_rect.height():
+            scale *= min(paint_rect.width() / w, paint_rect.height() / h)
 
+        matrix = fitz.Matrix(scale, scale)
+        if rotate:
+            matrix.prerotate(90)
+        return matrix
+
+    def render_clip(self, src_doc, clip_rect, page_number: int = 0, dpi: int | None = None,
+                    paint_rect=None, colorspace=None) -> fitz.Pixmap:
+        """
+        Rendert nur den Ausschnitt, direkt in Drucker-Auflösung und -Ausrichtung.
+        Bei aktiver Schwarzweiß-Umwandlung in Graustufen (1/3 der Daten von RGB).
+        """
+        if colorspace is None:
+            colorspace = fitz.csGRAY if self.bitmap_mode != "off" else fitz.csRGB
+        if dpi is None:
+            dpi = self.printer.resolution()
+            paint_rect = self.printer.pageLayout().paintRectPixels(dpi)
+        matrix = self.compute_clip_matrix(clip_rect, dpi, paint_rect)
+
+        page = src_doc.load_page(page_number)
+        # alpha=False -> weißer Hintergrund, kein zusätzliches Compositing nötig
+        with instrumentation.span("rasterize", page=page_number, dpi=dpi):
+            return page.get_pixmap(matrix=matrix, clip=clip_rect, alpha=False, colorspace=colorspace)
+
+    def render_clip_file(self, source_pdf_path: str, clip_rect, page_number: int = 0) -> fitz.Pixmap | None:
+        """Öffnet die Quell-PDF und rendert den Ausschnitt (threadsicher über _fitz_lock)."""
+        if not os.path.exists(source_pdf_path): return None
+
+        with _fitz_lock:
+            src_doc = fitz.open(source_pdf_path)
+            try:
+                if page_number >= src_doc.page_count: return None
+                return self.render_clip(src_doc, fitz.Rect(clip_rect), page_number)
+            finally:
+                src_doc.close()
+
+    def spool_pixmaps(self, pixmaps) -> bool:
+        """
+        Gibt fertig gerenderte Pixmaps zentriert im Druckbereich an den Drucker,
+        eine Seite pro Pixmap, alles in einem Druckauftrag. 'pixmaps' darf ein
+        Generator sein - dann liegt immer nur eine Seite im Speicher.
+        """
+        dpi = self.printer.resolution()
+        paint_rect = self.printer.pageLayout().paintRectPixels(dpi)
 
-        wait_and_delete_file(pdf_path)
+        painter = QPainter()
+        try:
+            for pix in pixmaps:
+                if painter.isActive():
+                    self.printer.newPage()
+                elif not painter.begin(self.printer):
+                    return False
+
+                img = self.pixmap_to_qimage(pix)
+
+                # Positionierung unter Berücksichtigung der Seitenränder (Margins)
+                x_final = paint_rect.left() + (paint_rect.width() - pix.width) // 2
+                y_final = paint_rect.top() + (paint_rect.height() - pix.height) // 2
+                with instrumentation.span("spool"):
+                    painter.drawImage(QPoint(x_final, y_final), img)
+        except Exception:
+            # Halb gespoolten Auftrag verwerfen statt unvollständig zu drucken
+            if painter.isActive():
+                self.printer.abort()
+                painter.end()
+            raise
+
+        if not painter.isActive(): return False
+        with instrumentation.span("spool"):
+            painter.end()
+        del painter
         return True
 
+    def spool_pixmap(self, pix: fitz.Pixmap) -> bool:
+        return self.spool_pixmaps([pix])
+
+    def print_clips(self, source_pdf_path: str, crops: list[tuple[int, tuple]]) -> bool:
+        """
+        Druckt mehrere Ausschnitte (Seitennummer, Rechteck) einer Quell-PDF als einen
+        mehrseitigen Druckauftrag. Die Seiten werden erst beim Spoolen einzeln gerendert.
+        """
+        if not os.path.exists(source_pdf_path): return False
+        if self.backend in RAW_BACKENDS:
+            return self.print_clips_raw(source_pdf_path, crops)
+
+        with _fitz_lock:
+            src_doc = fitz.open(source_pdf_path)
+
+        def pixmaps():
+            for page_number, clip_rect in crops:
+                with _fitz_lock:
+                    pix = self.render_clip(src_doc, fitz.Rect(clip_rect), page_number)
+                yield pix
+
+        try:
+            return self.spool_pixmaps(pixmaps())
+        finally:
+            with _fitz_lock:
+                src_doc.close()
+
+    def print_clip(self, source_pdf_path: str, clip_rect, page_number: int = 0) -> bool:
+        """
+        Druckt einen Ausschnitt direkt aus der Quell-PDF: kein Zwischen-PDF, kein
+        zweites QImage, keine QTransform-Rotation und keine Nachskalierung.
+        """
+        if self.backend in RAW_BACKENDS:
+            return self.print_clips(source_pdf_path, [(page_number, clip_rect)])
+
+        pix = self.render_clip_file(source_pdf_path, clip_rect, page_number)
+        if pix is None: return False
+        return self.spool_pixmap(pix)
+
+    # ---------------------------------------------------------
+    # Thermodrucker: ZPL/EPL direkt an den Drucker (ohne Qt-Druckertreiber)
+    # ---------------------------------------------------------
+    def label_size_dots(self) -> tuple[int, int]:
+        """Größe des eingestellten Papierformats (inkl. Ausrichtung) in Drucker-Dots."""
+        size_pt = self.printer.pageLayout().fullRectPoints()
+        return round(size_pt.width() * self.raw_dpi / 72), round(size_pt.height() * self.raw_dpi / 72)
+
+    def build_raw_job(self, src_doc, crops: list[tuple[int, tuple]]) -> bytes:
+        """Rendert alle Ausschnitte in Graustufen und kodiert sie als ZPL bzw. EPL."""
+        label_w, label_h = self.label_size_dots()
+        label_rect = QRect(0, 0, label_w, label_h)
+
+        bitmaps = []
+        for page_number, clip_rect in crops:
+            with _fitz_lock:
+                pix = self.render_clip(src_doc, fitz.Rect(clip_rect), page_number,
+                                       self.raw_dpi, label_rect, fitz.csGRAY)
+            bmp = pixmap_to_bitmap(pix, self.bitmap_mode, self.bitmap_threshold)
+            # Auf dem Label zentrieren
+            bmp.x = max(0, (label_w - bmp.width) // 2)
+            bmp.y = max(0, (label_h - bmp.height) // 2)
+            bitmaps.append(bmp)
+
+        return encode_labels(self.backend, bitmaps, label_w, label_h)
+
+    def print_clips_raw(self, source, crops: list[tuple[int, tuple]]) -> bool:
+        """'source' ist ein Dateipfad oder ein bereits geöffnetes fitz.Document."""
+        own_doc = not isinstance(source, fitz.Document)
+        with _fitz_lock:
+            src_doc = fitz.open(source) if own_doc else source
+        try:
+            data = self.build_raw_job(src_doc, crops)
+        finally:
+            if own_doc:
+                with _fitz_lock:
+                    src_doc.close()
+        with instrumentation.span("spool", bytes=len(data)):
+            return send_raw(self.printer.printerName(), data, self.raw_target)
+
+    def print_pdf_raw(self, pdf) -> bool:
+        """Druckt alle Seiten eines (bereits gecroppten) PDFs als ZPL/EPL."""
+        own_doc = not isinstance(pdf, fitz.Document)
+        if isinstance(pdf, str) and not os.path.exists(pdf): return False
+
+        with _fitz_lock:
+            if not own_doc:
+                doc = pdf
+            elif isinstance(pdf, str):
+                doc = fitz.open(pdf)
+            else:
+                doc = fitz.open(stream=pdf, filetype="pdf")
+            crops = [(i, tuple(page.rect)) for i, page in enumerate(doc)]
+        try:
+            return self.print_clips_raw(doc, crops)
+        finally:
+            if own_doc:
+                with _fitz_lock:
+                    doc.close()
+
     def get_current_paper_ratio(self) -> float:
         layout = self.printer.pageLayout()
         # paintRectPixels berücksichtigt die aktuelle Orientierung des Druckers!
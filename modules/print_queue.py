@@ -0,0 +1,292 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from PySide6.QtCore import QObject, QSettings, Signal
+
+from modules import instrumentation
+from modules.pdf_cropper import crop_coords_from_clip, crop_pages_to_bytes
+from modules.label_language import RAW_BACKENDS
+from modules.print import PrintingSystem, _fitz_lock
+
+# Zustände eines Druckauftrags
+QUEUED = "queued"
+RENDERING = "rendering"
+SPOOLING = "spooling"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# Marker zum Beenden eines Worker-Threads
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class PrintJob:
+    """Ein Druckauftrag: alles, was zum Drucken nötig ist, wird beim Einreihen festgehalten."""
+
+    def __init__(self, job_id: int, source_path: str, crops: list[tuple[int, tuple]], printer_name: str,
+                 paper_name: str, mode: str = "clip"):
+        self.id = job_id
+        self.source_path = source_path
+        self.crops = crops  # Je gedruckter Seite: (Seitennummer, Ausschnitt in PDF-Punkten x0, y0, x1, y1)
+        self.printer_name = printer_name
+        self.paper_name = paper_name
+        self.mode = mode  # "clip" = Direktdruck, "pdf" = über ein Crop-PDF im Speicher
+        # Korrelations-ID für Logs und Trace (vom Import übernommen, falls vorhanden)
+        self.trace_id = instrumentation.current_job() or instrumentation.new_job_id()
+
+        self.state = QUEUED
+        self.attempts = 0
+        self.message = ""
+        self.created = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def is_final(self) -> bool:
+        return self.state in FINAL_STATES
+
+
+class PrintQueue(QObject):
+    """
+    Druckwarteschlange mit Hintergrund-Threads. Die GUI reiht Aufträge nur ein und
+    bekommt jede Zustandsänderung über 'job_changed' (im GUI-Thread) mitgeteilt.
+    Fehlgeschlagene Aufträge werden bis zu 'max_retries' Mal erneut versucht.
+    """
+    job_changed = Signal(object)  # PrintJob
+
+    def __init__(self, workers: int = 1, max_retries: int = 2, retry_delay: float = 2.0, parent=None):
+        super().__init__(parent)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._retry_timers = {}  # Auftrags-ID -> Timer, der den Auftrag nach retry_delay wieder einreiht
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._run, name=f"print-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    @classmethod
+    def from_settings(cls, parent=None) -> "PrintQueue":
+        """Parameter aus den Benutzereinstellungen: print/queue_workers, print/max_retries, print/retry_delay_s"""
+        settings = QSettings("LabelLobster", "UserSettings")
+        return cls(
+            workers=int(settings.value("print/queue_workers", 1)),
+            max_retries=int(settings.value("print/max_retries", 2)),
+            retry_delay=float(settings.value("print/retry_delay_s", 2.0)),
+            parent=parent
+        )
+
+    # --- Öffentliche Schnittstelle -----------------------------
+    def submit(self, source_path: str, clip: tuple, printer_name: str, paper_name: str,
+               mode: str = "clip", page_number: int = 0) -> PrintJob:
+        return self.submit_pages(source_path, [(page_number, clip)], printer_name, paper_name, mode)
+
+    def submit_pages(self, source_path: str, crops: list[tuple[int, tuple]], printer_name: str,
+                     paper_name: str, mode: str = "clip") -> PrintJob:
+        """Reiht mehrere Ausschnitte (Seitennummer, Rechteck) als einen mehrseitigen Auftrag ein."""
+        crops = [(page_number, tuple(clip)) for page_number, clip in crops]
+        job = PrintJob(next(self._ids), source_path, crops, printer_name, paper_name, mode)
+        with self._lock:
+            self._jobs[job.id] = job
+        self.job_changed.emit(job)
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Bricht einen Auftrag ab. Wartende Aufträge werden sofort verworfen, laufende
+        vor dem Spoolen bzw. vor dem nächsten Versuch. Was schon beim Treiber liegt,
+        kann nicht mehr zurückgeholt werden.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_final or job.state == SPOOLING:
+                return False
+            job._cancel.set()
+            waiting = job.state == QUEUED
+            timer = self._retry_timers.pop(job_id, None)
+        if timer is not None:
+            timer.cancel()
+        if waiting:
+            self._set_state(job, CANCELLED, "Abgebrochen")
+        return True
+
+    def jobs(self) -> list[PrintJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.is_final)
+
+    def clear_finished(self) -> list[int]:
+        """Entfernt abgeschlossene Aufträge aus der Liste und gibt deren IDs zurück."""
+        with self._lock:
+            removed = [job_id for job_id, job in self._jobs.items() if job.is_final]
+            for job_id in removed:
+                del self._jobs[job_id]
+        return removed
+
+    def shutdown(self, cancel_pending: bool = True):
+        """Beendet die Worker. Laufende Aufträge werden noch fertig gedruckt."""
+        if cancel_pending:
+            for job in self.jobs():
+                if job.state == QUEUED:
+                    self.cancel(job.id)
+        # Auf einen neuen Versuch wartende Aufträge: sofort einreihen (bzw. abgebrochen verwerfen)
+        with self._lock:
+            timers, self._retry_timers = self._retry_timers, {}
+        for timer in timers.values():
+            timer.cancel()
+            self._queue.put(timer.args[0])
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    # --- Worker -------------------------------------------------
+    def _set_state(self, job: PrintJob, state: str, message: str | None = None) -> bool:
+        # Abgeschlossene Aufträge ändern sich nicht mehr (z.B. Abbruch während der Wartezeit)
+        with self._lock:
+            if job.is_final:
+                return False
+            job.state = state
+            if message is not None:
+                job.message = message
+            if state in FINAL_STATES:
+                job.finished = time.time()
+        if state in FINAL_STATES:
+            instrumentation.job_finished(state)
+        self.job_changed.emit(job)
+        return True
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            # Schon in der Warteschlange abgebrochen
+            if job.is_final:
+                continue
+            with instrumentation.job(job.trace_id):
+                self._process(job)
+
+    def _process(self, job: PrintJob):
+        """Ein Versuch. Schlägt er fehl, wird der Auftrag zeitversetzt wieder eingereiht."""
+        if job.cancel_requested:
+            self._set_state(job, CANCELLED, "Abgebrochen")
+            return
+
+        job.attempts += 1
+        if not self._set_state(job, RENDERING):
+            return
+        try:
+            ok, message = self._print_once(job)
+        except Exception as e:
+            ok, message = False, str(e)
+
+        if ok:
+            self._set_state(job, DONE, "")
+            return
+        if job.cancel_requested:
+            self._set_state(job, CANCELLED, "Abgebrochen")
+            return
+
+        logger.warning("Druckauftrag %s: Versuch %d fehlgeschlagen: %s", job.id, job.attempts, message)
+        if job.attempts > self.max_retries:
+            self._set_state(job, FAILED, message)
+            return
+
+        # Der Worker wartet nicht selbst, sondern druckt in der Zwischenzeit andere Aufträge.
+        # Ein Abbruch in der Wartezeit verwirft den Auftrag sofort (Zustand QUEUED, siehe cancel)
+        if self._set_state(job, QUEUED, f"{message} - neuer Versuch in {self.retry_delay:.0f} s"):
+            self._schedule_retry(job)
+
+    def _schedule_retry(self, job: PrintJob):
+        timer = threading.Timer(self.retry_delay, self._retry_due, (job,))
+        timer.daemon = True
+        with self._lock:
+            self._retry_timers[job.id] = timer
+        timer.start()
+
+    def _retry_due(self, job: PrintJob):
+        with self._lock:
+            if self._retry_timers.pop(job.id, None) is None:
+                return  # Schon von shutdown eingereiht
+        self._queue.put(job)
+
+    def _printing_system(self, printer_name: str, paper_name: str) -> PrintingSystem:
+        # Jeder Worker-Thread hat sein eigenes QPrinter-Objekt; Papier nur bei Wechsel neu setzen
+        print_system = getattr(self._local, "print_system", None)
+        if print_system is None:
+            print_system = PrintingSystem()
+            self._local.print_system = print_system
+            self._local.config = None
+
+        # Ausgabeweg (Qt/ZPL/EPL) kann sich in der GUI jederzeit ändern
+        print_system.load_backend_settings()
+        if self._local.config != (printer_name, paper_name):
+            print_system.set_printer(printer_name)
+            if paper_name and not print_system.set_paper_by_name(paper_name):
+                raise RuntimeError(f"Papierformat '{paper_name}' wird vom Drucker '{printer_name}' nicht unterstützt")
+            self._local.config = (printer_name, paper_name)
+        return print_system
+
+    def _print_once(self, job: PrintJob) -> tuple[bool, str]:
+        print_system = self._printing_system(job.printer_name, job.paper_name)
+
+        # Mehrseitiger Direktdruck bzw. ZPL/EPL: Seiten werden erst beim Spoolen gerendert
+        if job.mode == "clip" and (len(job.crops) > 1 or print_system.backend in RAW_BACKENDS):
+            if not self._begin_spooling(job):
+                return False, "Abgebrochen"
+            ok = print_system.print_clips(job.source_path, job.crops)
+            return ok, "" if ok else "Druckauftrag fehlgeschlagen"
+
+        # 1. Rendern bzw. Croppen
+        if job.mode == "clip":
+            page_number, clip = job.crops[0]
+            data = print_system.render_clip_file(job.source_path, clip, page_number)
+        else:
+            with _fitz_lock:
+                data = crop_pages_to_bytes(
+                    job.source_path, [(page_number, crop_coords_from_clip(clip)) for page_number, clip in job.crops]
+                )
+        if data is None:
+            return False, "Rendern fehlgeschlagen"
+
+        # 2. Letzte Gelegenheit zum Abbrechen, danach liegt der Auftrag beim Treiber
+        if not self._begin_spooling(job):
+            return False, "Abgebrochen"
+
+        if job.mode == "clip":
+            ok = print_system.spool_pixmap(data)
+        else:
+            ok = print_system.print_pdf(data)
+        return ok, "" if ok else "Druckauftrag fehlgeschlagen"
+
+    def _begin_spooling(self, job: PrintJob) -> bool:
+        with self._lock:
+            if job.cancel_requested:
+                return False
+            job.state = SPOOLING
+        self.job_changed.emit(job)
+        return True
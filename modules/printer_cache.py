@@ -0,0 +1,180 @@
+import json
+import logging
+import threading
+import time
+
+from PySide6.QtCore import QObject, QSettings, QSizeF, Signal
+from PySide6.QtGui import QPageLayout, QPageSize
+from PySide6.QtPrintSupport import QPrinter, QPrinterInfo
+
+logger = logging.getLogger(__name__)
+
+
+class PrinterCapabilities:
+    """Was die GUI und der Druck über einen Drucker wissen müssen, ohne CUPS/Spooler erneut zu fragen."""
+
+    __slots__ = ("name", "page_sizes", "default_page_size", "resolution", "paint_rect")
+
+    def __init__(self, name: str, page_sizes: list[dict], default_page_size: str = "", resolution: int = 0,
+                 paint_rect: tuple = (0, 0, 0, 0)):
+        self.name = name
+        # Je Papierformat: name, width, height, unit (Definitionsgröße, damit Qt die Format-ID wiederfindet)
+        self.page_sizes = page_sizes
+        self.default_page_size = default_page_size
+        self.resolution = resolution
+        self.paint_rect = paint_rect  # Druckbereich des Standardformats in Punkten (x, y, Breite, Höhe)
+
+    @classmethod
+    def query(cls, info: QPrinterInfo) -> "PrinterCapabilities":
+        """Fragt den Drucker ab (langsam: CUPS/Spooler, ggf. übers Netzwerk)."""
+        page_sizes = []
+        for ps in info.supportedPageSizes():
+            size = ps.definitionSize()
+            page_sizes.append({
+                "name": ps.name(), "width": size.width(), "height": size.height(),
+                "unit": ps.definitionUnits().value
+            })
+        printer = QPrinter(info, QPrinter.PrinterMode.HighResolution)
+        paint = printer.pageLayout().paintRect(QPageLayout.Unit.Point)
+        return cls(info.printerName(), page_sizes, info.defaultPageSize().name(), printer.resolution(),
+                   (paint.x(), paint.y(), paint.width(), paint.height()))
+
+    def qpage_sizes(self) -> list[QPageSize]:
+        # ExactMatch erhält Name und ID (A4, Letter, ...) des Treibers
+        return [
+            QPageSize(QSizeF(p["width"], p["height"]), QPageSize.Unit(p["unit"]), p["name"],
+                      QPageSize.SizeMatchPolicy.ExactMatch)
+            for p in self.page_sizes
+        ]
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PrinterCapabilities":
+        return cls(data["name"], data["page_sizes"], data.get("default_page_size", ""),
+                   data.get("resolution", 0), tuple(data.get("paint_rect", (0, 0, 0, 0))))
+
+
+class PrinterCache(QObject):
+    """
+    Drucker und ihre Papierformate, zwischen Programmstarts in den Benutzereinstellungen
+    gespeichert. Beim Start werden die gespeicherten Daten sofort verwendet; sind sie älter
+    als 'ttl' Sekunden, wird im Hintergrund neu abgefragt und 'updated' gesendet.
+    """
+    updated = Signal()
+
+    def __init__(self, ttl: float = 3600.0, query=PrinterCapabilities.query, parent=None):
+        super().__init__(parent)
+        self.ttl = ttl
+        self._query = query
+        self._printers = {}
+        self._timestamp = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._load()
+
+    # --- Abfrage --------------------------------------------------
+    def printer_names(self) -> list[str]:
+        with self._lock:
+            return list(self._printers)
+
+    def capabilities(self, printer_name: str) -> PrinterCapabilities | None:
+        with self._lock:
+            caps = self._printers.get(printer_name)
+        if caps is None and printer_name:
+            # Unbekannter Drucker (z.B. neu installiert): einzeln nachfragen und merken
+            info = QPrinterInfo.printerInfo(printer_name)
+            if info.isNull():
+                return None
+            caps = self._query(info)
+            with self._lock:
+                self._printers[printer_name] = caps
+        return caps
+
+    def page_sizes(self, printer_name: str) -> list[QPageSize]:
+        caps = self.capabilities(printer_name)
+        return caps.qpage_sizes() if caps else []
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self._timestamp > self.ttl
+
+    # --- Aktualisierung -------------------------------------------
+    def refresh(self):
+        """Alle Drucker neu abfragen (blockiert, bei vielen CUPS-Warteschlangen mehrere Sekunden)."""
+        printers = {}
+        for info in QPrinterInfo.availablePrinters():
+            try:
+                printers[info.printerName()] = self._query(info)
+            except Exception as e:
+                logger.warning("Drucker '%s' konnte nicht abgefragt werden: %s", info.printerName(), e)
+
+        with self._lock:
+            changed = printers.keys() != self._printers.keys() or any(
+                caps.to_dict() != self._printers[name].to_dict() for name, caps in printers.items()
+            )
+            self._printers = printers
+            self._timestamp = time.time()
+        self._save()
+        if changed:
+            self.updated.emit()
+
+    def refresh_async(self) -> bool:
+        """Startet refresh() in einem Hintergrund-Thread (höchstens einer gleichzeitig)."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return False
+            self._refresh_thread = threading.Thread(target=self._refresh_safe, name="printer-cache", daemon=True)
+            self._refresh_thread.start()
+        return True
+
+    def refresh_if_stale(self) -> bool:
+        return self.is_stale and self.refresh_async()
+
+    def wait(self, timeout: float | None = None):
+        """Wartet auf eine laufende Hintergrund-Aktualisierung."""
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _refresh_safe(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error("Druckerliste konnte nicht aktualisiert werden: %s", e)
+
+    # --- Persistenz -----------------------------------------------
+    def _load(self):
+        settings = QSettings("LabelLobster", "UserSettings")
+        try:
+            data = json.loads(settings.value("printer_cache/data", "") or "{}")
+            self._printers = {p["name"]: PrinterCapabilities.from_dict(p) for p in data.get("printers", [])}
+            self._timestamp = float(data.get("timestamp", 0.0))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Drucker-Cache unlesbar, wird neu aufgebaut: %s", e)
+            self._printers = {}
+            self._timestamp = 0.0
+
+    def _save(self):
+        with self._lock:
+            data = {"timestamp": self._timestamp, "printers": [caps.to_dict() for caps in self._printers.values()]}
+        # QSettings pro Thread neu anlegen (Instanzen sind nicht threadsicher)
+        QSettings("LabelLobster", "UserSettings").setValue("printer_cache/data", json.dumps(data))
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_printer_cache() -> PrinterCache:
+    """
+    Gemeinsamer Drucker-Cache des Prozesses. Gültigkeit aus den Benutzereinstellungen:
+    printer_cache/ttl_s (Standard: 3600)
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            settings = QSettings("LabelLobster", "UserSettings")
+            _default_cache = PrinterCache(float(settings.value("printer_cache/ttl_s", 3600)))
+        return _default_cache
@@ -0,0 +1,219 @@
+import atexit
+import logging
+import marshal
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from modules import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Stichproben-Profiler für die laufende Anwendung: ein Hintergrund-Thread liest in festen
+# Abständen die Aufrufstapel ALLER Threads (GUI, Druckwarteschlange, Hot-Folder-Stufen).
+# cProfile misst nur den Thread, in dem es eingeschaltet wurde - deshalb Stichproben.
+# Es ist ein Wanduhr-Profil: wartende Threads erscheinen mit ihrem Warteaufruf (queue.get, exec).
+
+DEFAULT_SECONDS = 60.0
+DEFAULT_INTERVAL_S = 0.005
+
+_lock = threading.Lock()
+_session = None
+_listeners = []  # func(laeuft: bool, Dateien: list[str]) - z.B. der Menüeintrag im Hauptfenster
+
+
+class ProfileSession:
+    """Eine Aufzeichnung: endet nach 'seconds' Sekunden oder 'jobs' fertigen Jobs (was zuerst eintritt)."""
+
+    def __init__(self, seconds: float | None, jobs: int | None, directory: str, interval: float):
+        self.seconds = seconds
+        self.jobs = jobs
+        self.directory = directory
+        self.interval = interval
+
+        self.stacks = Counter()  # (Thread-Name, Stapel von außen nach innen) -> Anzahl Stichproben
+        self.rounds = 0
+        self.elapsed = 0.0
+        self.jobs_done = 0
+        self.paths = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, wait: bool = False):
+        self._stop.set()
+        if wait and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def job_done(self, status: str):
+        self.jobs_done += 1
+        if self.jobs and self.jobs_done >= self.jobs:
+            self._stop.set()
+
+    # --- Stichproben ----------------------------------------
+    def _run(self):
+        own = threading.get_ident()
+        t0 = time.perf_counter()
+        deadline = t0 + self.seconds if self.seconds else None
+        while not self._stop.wait(self.interval):
+            self._sample(own)
+            if deadline and time.perf_counter() >= deadline:
+                break
+        self.elapsed = time.perf_counter() - t0
+        _finished(self)
+
+    def _sample(self, own: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[(names.get(ident, str(ident)), tuple(stack))] += 1
+        self.rounds += 1
+
+    # --- Ausgabe --------------------------------------------
+    def collapsed_lines(self) -> list[str]:
+        """Format von flamegraph.pl / speedscope / inferno: "Thread;äußere;...;innere Anzahl"."""
+        lines = []
+        for (thread, stack), n in self.stacks.most_common():
+            frames = [f"{func} ({os.path.basename(filename)}:{line})" for filename, line, func in stack]
+            lines.append(f"{';'.join([thread] + frames)} {n}")
+        return lines
+
+    def pstats_dict(self) -> dict:
+        """
+        Stichproben im Format von cProfile (marshal-Dict für pstats.Stats): Aufrufe = Stichproben,
+        tottime = Zeit als innerste Funktion, cumtime = Zeit irgendwo im Stapel.
+        """
+        dt = self.elapsed / self.rounds if self.rounds else self.interval
+        stats = {}
+        for (_, stack), n in self.stacks.items():
+            t = n * dt
+            for func in set(stack):
+                entry = stats.setdefault(func, [0, 0, 0.0, 0.0, {}])
+                entry[0] += n
+                entry[1] += n
+                entry[3] += t
+            if stack:
+                stats[stack[-1]][2] += t
+            for caller, callee in set(zip(stack, stack[1:])):
+                edge = stats[callee][4].setdefault(caller, [0, 0, 0.0, 0.0])
+                edge[0] += n
+                edge[1] += n
+                edge[3] += t
+                if callee == stack[-1]:
+                    edge[2] += t
+        return {func: (cc, nc, tt, ct, {caller: tuple(edge) for caller, edge in callers.items()})
+                for func, (cc, nc, tt, ct, callers) in stats.items()}
+
+    def write(self) -> list[str]:
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        with open(f"{base}.pstats", "wb") as f:
+            marshal.dump(self.pstats_dict(), f)
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+            f.write("\n".join(self.collapsed_lines()) + "\n")
+        return [f"{base}.pstats", f"{base}.collapsed"]
+
+
+# ---------------------------------------------------------
+# Steuerung (Menü, Signal, Kommandozeile)
+# ---------------------------------------------------------
+def add_listener(func):
+    """func(laeuft, Dateien) wird bei Start und Ende gerufen - das Ende kommt aus dem Profiler-Thread."""
+    _listeners.append(func)
+
+
+def is_running() -> bool:
+    return _session is not None
+
+
+def start(seconds: float | None = DEFAULT_SECONDS, jobs: int | None = None, directory: str | None = None,
+          interval: float = DEFAULT_INTERVAL_S) -> bool:
+    """Startet eine Aufzeichnung (False, wenn schon eine läuft). Ohne Grenzen läuft sie bis stop()."""
+    global _session
+    with _lock:
+        if _session is not None:
+            return False
+        _session = ProfileSession(seconds, jobs, directory or instrumentation.log_directory(), interval)
+        session = _session
+        instrumentation.on_job_finished(_job_done)
+
+    limits = [f"{seconds:g} s" if seconds else "", f"{jobs} Jobs" if jobs else ""]
+    logger.info("Profiling gestartet (%s)", " / ".join(l for l in limits if l) or "bis zum Stoppen")
+    for func in list(_listeners):
+        func(True, [])
+    session.start()
+    return True
+
+
+def start_from_settings() -> bool:
+    """Grenzen aus den Benutzereinstellungen: profile/seconds, profile/jobs, profile/interval_ms."""
+    from PySide6.QtCore import QSettings
+    settings = QSettings("LabelLobster", "UserSettings")
+    return start(float(settings.value("profile/seconds", DEFAULT_SECONDS)) or None,
+                 int(settings.value("profile/jobs", 0)) or None,
+                 interval=float(settings.value("profile/interval_ms", DEFAULT_INTERVAL_S * 1000)) / 1000)
+
+
+def stop(wait: bool = False):
+    """Beendet die laufende Aufzeichnung vorzeitig; die Dateien werden trotzdem geschrieben."""
+    session = _session
+    if session is not None:
+        session.stop(wait)
+
+
+def toggle() -> bool:
+    """Startet bzw. stoppt eine Aufzeichnung; gibt zurück, ob jetzt aufgezeichnet wird."""
+    if is_running():
+        stop()
+        return False
+    return start_from_settings()
+
+
+def _job_done(status: str):
+    session = _session
+    if session is not None:
+        session.job_done(status)
+
+
+def _finished(session: ProfileSession):
+    global _session
+    try:
+        session.paths = session.write()
+        logger.info("Profil geschrieben (%d Stichproben, %.1f s): %s",
+                    session.rounds, session.elapsed, ", ".join(session.paths))
+    except OSError as e:
+        logger.error("Profil konnte nicht geschrieben werden: %s", e)
+    with _lock:
+        _session = None
+    for func in list(_listeners):
+        func(False, session.paths)
+
+
+@atexit.register
+def _stop_at_exit():
+    # Beim Beenden mitten in der Aufzeichnung: bisherige Stichproben noch schreiben
+    stop(wait=True)
+
+
+def install_signal_handler() -> bool:
+    """
+    SIGUSR1 startet bzw. stoppt eine Aufzeichnung ("kill -USR1 <pid>"), z.B. wenn eine Station
+    im Betrieb langsam wird. Unter Windows gibt es kein SIGUSR1 - dort Menü oder --profile-seconds.
+    """
+    sig = getattr(signal, "SIGUSR1", None)
+    if sig is None:
+        return False
+    signal.signal(sig, lambda signum, frame: toggle())
+    return True
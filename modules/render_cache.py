@@ -0,0 +1,262 @@
+import hashlib
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from PySide6.QtCore import QSettings
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedPage:
+    """Rohdaten einer gerenderten Seite (unabhängig von Qt, damit sie gecacht werden können)."""
+
+    __slots__ = ("width", "height", "stride", "alpha", "samples", "rect")
+
+    def __init__(self, width: int, height: int, stride: int, alpha: bool, samples: bytes, rect: tuple):
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self.alpha = alpha
+        self.samples = samples
+        self.rect = rect  # Seitengröße in PDF-Punkten (x0, y0, x1, y1)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.samples)
+
+
+class RenderCache:
+    """
+    LRU-Cache für gerenderte PDF-Seiten mit Speicherbudget.
+    Optional werden Seiten zusätzlich zlib-komprimiert auf der Platte abgelegt,
+    damit sie auch nach einem Neustart nicht neu gerastert werden müssen.
+    Schlüssel: (Datei-Hash, Seite, DPI, Farbraum)
+    """
+    _DISK_HEADER = struct.Struct("<IIIB4d")
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, disk_dir: str | None = None,
+                 disk_max_bytes: int = 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Zähler zur Dimensionierung
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Platten-Stufe: Datei -> Größe, älteste zuerst; nur beim Start einmal eingelesen
+        self._disk_files = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    # --- Speicher-Stufe -----------------------------------------
+    def get(self, key: tuple) -> RenderedPage | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is not None:
+                self.disk_hits += 1
+                self._insert(key, entry)
+            else:
+                self.misses += 1
+        return entry
+
+    def put(self, key: tuple, entry: RenderedPage):
+        with self._lock:
+            self._insert(key, entry)
+        self._write_disk(key, entry)
+
+    def _insert(self, key: tuple, entry: RenderedPage):
+        # Einträge größer als das gesamte Budget werden nicht im Speicher gehalten
+        if entry.nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock, self._disk_lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk_files),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+    # --- Platten-Stufe ------------------------------------------
+    def _disk_path(self, key: tuple) -> str:
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.tile")
+
+    def _read_disk(self, key: tuple) -> RenderedPage | None:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            width, height, stride, alpha, *rect = self._DISK_HEADER.unpack_from(data)
+            samples = zlib.decompress(data[self._DISK_HEADER.size:])
+            os.utime(path)  # Für die LRU-Reihenfolge nach einem Neustart
+        except (OSError, struct.error, zlib.error):
+            return None
+        with self._disk_lock:
+            if path in self._disk_files:
+                self._disk_files.move_to_end(path)
+        return RenderedPage(width, height, stride, bool(alpha), samples, tuple(rect))
+
+    def _write_disk(self, key: tuple, entry: RenderedPage):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        header = self._DISK_HEADER.pack(entry.width, entry.height, entry.stride, int(entry.alpha), *entry.rect)
+        data = zlib.compress(entry.samples, 1)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Render-Cache: Schreiben fehlgeschlagen: %s", e)
+            return
+
+        with self._disk_lock:
+            self._disk_bytes -= self._disk_files.pop(path, 0)
+            self._disk_files[path] = len(header) + len(data)
+            self._disk_bytes += len(header) + len(data)
+            self._trim_disk()
+
+    def _scan_disk(self):
+        # Einmal beim Start: vorhandene Kacheln nach letzter Nutzung (mtime) einsortieren
+        try:
+            stats = []
+            for e in os.scandir(self.disk_dir):
+                if e.name.endswith(".tile"):
+                    st = e.stat()
+                    stats.append((st.st_mtime, e.path, st.st_size))
+        except OSError:
+            return
+        with self._disk_lock:
+            self._disk_files = OrderedDict((path, size) for _, path, size in sorted(stats))
+            self._disk_bytes = sum(self._disk_files.values())
+            self._trim_disk()
+
+    def _trim_disk(self):
+        # Älteste (zuletzt am längsten nicht genutzte) Kacheln löschen, bis das Budget passt.
+        # Aufruf nur mit _disk_lock
+        while self._disk_bytes > self.disk_max_bytes and self._disk_files:
+            path, size = self._disk_files.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Schon von einem anderen Prozess gelöscht
+
+
+class TextCache:
+    """
+    LRU-Cache für extrahierten Seitentext. Schlüssel: (Datei-Hash, Seite, Bereich) - ein
+    Nachdruck oder eine erneute Erkennung derselben PDF liest den Text nicht noch einmal.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: tuple, text: str):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+_default_text_cache = None
+_default_cache = None
+
+
+def get_render_cache() -> RenderCache:
+    """
+    Gemeinsamer Cache des Prozesses. Größen kommen aus den Benutzereinstellungen:
+    render_cache/memory_mb, render_cache/disk_dir (leer = aus), render_cache/disk_mb
+    """
+    global _default_cache
+    if _default_cache is None:
+        settings = QSettings("LabelLobster", "UserSettings")
+        memory_mb = int(settings.value("render_cache/memory_mb", 256))
+        disk_dir = settings.value("render_cache/disk_dir", "") or None
+        disk_mb = int(settings.value("render_cache/disk_mb", 1024))
+        _default_cache = RenderCache(memory_mb * 1024 * 1024, disk_dir, disk_mb * 1024 * 1024)
+    return _default_cache
+
+
+def get_text_cache() -> TextCache:
+    """Gemeinsamer Text-Cache des Prozesses. Größe: text_cache/entries (Standard: 1024)"""
+    global _default_text_cache
+    if _default_text_cache is None:
+        entries = int(QSettings("LabelLobster", "UserSettings").value("text_cache/entries", 1024))
+        _default_text_cache = TextCache(entries)
+    return _default_text_cache
@@ -0,0 +1,75 @@
+import builtins
+import sys
+import time
+
+# Messbeginn (Modul so früh wie möglich importieren)
+_start = time.perf_counter()
+_enabled = False
+_original_import = None
+
+_marks = []    # (Bezeichnung, Zeitpunkt)
+_imports = {}  # Modul -> [gesamt, eigen] in Sekunden, nur beim ersten (echten) Laden
+_stack = []    # Laufende Importe: Zeit der Unter-Importe je Ebene
+
+
+def enable():
+    """Misst ab jetzt jeden Modul-Import und die mit mark() gesetzten Startphasen."""
+    global _enabled, _original_import
+    if _enabled:
+        return
+    _enabled = True
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+    mark("Messung gestartet")
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def mark(label: str):
+    if _enabled:
+        _marks.append((label, time.perf_counter()))
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    loaded = len(sys.modules)
+    _stack.append(0.0)
+    t0 = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - t0
+        children = _stack.pop()
+        if _stack:
+            _stack[-1] += elapsed
+        # Nur Aufrufe festhalten, die wirklich etwas geladen haben (sonst nur ein sys.modules-Treffer)
+        if len(sys.modules) > loaded:
+            key = _module_key(name, globals, fromlist, level)
+            entry = _imports.setdefault(key, [0.0, 0.0])
+            entry[0] += elapsed
+            entry[1] += elapsed - children
+
+
+def _module_key(name, globals, fromlist, level) -> str:
+    if level and globals:
+        package = globals.get("__package__") or ""
+        parts = package.rsplit(".", level - 1)
+        name = f"{parts[0]}.{name}" if name else parts[0]
+    if fromlist and fromlist != ("*",):
+        name += f" ({', '.join(fromlist)})"
+    return name
+
+
+def report(top: int = 25):
+    """Gibt Startphasen und die teuersten Importe aus (nur wenn enable() aufgerufen wurde)."""
+    if not _enabled:
+        return
+    print("Startphasen (ms seit Messbeginn):")
+    for label, t in _marks:
+        print(f"  {(t - _start) * 1000:8.1f}  {label}")
+
+    print(f"Importe, teuerste {top} (gesamt / eigen in ms, 'gesamt' enthält Unter-Importe):")
+    for name, (total, own) in sorted(_imports.items(), key=lambda item: item[1][0], reverse=True)[:top]:
+        print(f"  {total * 1000:8.1f} {own * 1000:8.1f}  {name}")
+    print(f"  {len(_imports)} Importe, zusammen {sum(own for _, own in _imports.values()) * 1000:.1f} ms")
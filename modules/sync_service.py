@@ -0,0 +1,278 @@
+import gzip
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PySide6.QtCore import QObject, QSettings, Signal
+
+from db import change_log
+from db.database import session_scope
+from db.models import SyncState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+PAGE_SIZE = 1000          # Änderungen je Antwort; der Rest folgt mit der nächsten Anfrage
+GZIP_MIN_BYTES = 1024     # Kleine Antworten (meist nur wenige Änderungen) unkomprimiert senden
+
+
+# ---------------------------------------------------------
+# Server: stellt Label-Typen und Crops dieser Station bereit
+# ---------------------------------------------------------
+class _SyncRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /v1/changes?since=N[&limit=M]  Änderungen nach Version N (bei N=0 oder unbekanntem N: Gesamtstand)
+    GET /v1/snapshot                   Gesamtstand
+
+    ETag ist die aktuelle Version der Änderungsliste. Stimmt If-None-Match damit überein,
+    gibt es nur ein 304 ohne Inhalt - der Normalfall beim regelmäßigen Abfragen.
+    """
+    server_version = "LabelLobsterSync/1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == "/v1/changes":
+                since = int(query.get("since", ["0"])[0])
+                limit = max(1, min(int(query.get("limit", [PAGE_SIZE])[0]), PAGE_SIZE))
+            elif url.path == "/v1/snapshot":
+                since, limit = 0, PAGE_SIZE
+            else:
+                self.send_error(404)
+                return
+        except ValueError:
+            self.send_error(400, "since/limit müssen Zahlen sein")
+            return
+
+        # Version und Daten in derselben Lese-Transaktion (WAL: konsistenter Stand trotz parallelem Schreiben)
+        with session_scope() as session:
+            version = change_log.current_version(session)
+            etag = f'"{version}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send_not_modified(etag)
+                return
+
+            if since <= 0 or since > version:
+                # Neue Station oder Datenbank der Gegenstelle wurde ersetzt: alles schicken
+                payload = {"version": version, "snapshot": True, "more": False,
+                           "changes": change_log.snapshot(session)}
+            else:
+                changes, more = change_log.changes_since(session, since, limit)
+                payload = {"version": changes[-1]["version"] if more else version, "snapshot": False,
+                           "more": more, "changes": changes}
+
+        self._send_json(payload, etag)
+
+    def _send_not_modified(self, etag: str):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _send_json(self, payload: dict, etag: str):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        compressed = len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", "")
+        if compressed:
+            body = gzip.compress(body, compresslevel=5)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")  # Immer nachfragen, aber per ETag (304) billig
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keine Zeile je Anfrage - Stationen fragen alle paar Sekunden
+        pass
+
+
+class SyncServer:
+    """
+    HTTP-Server (nur Standardbibliothek) in einem Hintergrund-Thread. Standardmäßig nur auf
+    localhost erreichbar; für andere Stationen mit host="0.0.0.0" starten.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        self._httpd = ThreadingHTTPServer((host, port), _SyncRequestHandler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="sync-server", daemon=True)
+        self._thread.start()
+        logger.info("Konfigurations-Server läuft auf %s", self.url)
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# ---------------------------------------------------------
+# Client: übernimmt die Änderungen einer anderen Station
+# ---------------------------------------------------------
+class SyncClient:
+    def __init__(self, base_url: str, timeout: float = 5.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def fetch(self, since: int, etag: str | None) -> dict | None:
+        """Eine Seite Änderungen holen; None bei 304 (nichts Neues)."""
+        request = urllib.request.Request(f"{self.base_url}/v1/changes?since={since}",
+                                         headers={"Accept-Encoding": "gzip"})
+        if etag:
+            request.add_header("If-None-Match", etag)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                if response.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                payload = json.loads(body)
+                payload["etag"] = response.headers.get("ETag")
+                return payload
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+
+    def sync(self) -> dict:
+        """
+        Holt alle neuen Änderungen und übernimmt sie. Übernahme und neuer Stand der Gegenstelle
+        werden in derselben Transaktion gespeichert - ein Abbruch dazwischen wiederholt nichts doppelt.
+        Gibt die Anzahl übernommener Änderungen je Art zurück.
+        """
+        applied = {change_log.LABEL_TYPE: 0, change_log.CROP: 0}
+        while True:
+            with session_scope() as session:
+                state = session.get(SyncState, self.base_url)
+                since, etag = (state.version, state.etag) if state else (0, None)
+
+            # ETag nur mitschicken, wenn der letzte Abruf vollständig war (sonst passt er nicht zu 'since')
+            payload = self.fetch(since, etag)
+            if payload is None:
+                return applied
+
+            with session_scope(write=True) as session:
+                counts = change_log.apply_changes(session, payload["changes"])
+                state = session.get(SyncState, self.base_url) or SyncState(peer=self.base_url)
+                state.version = payload["version"]
+                state.etag = None if payload["more"] else payload["etag"]
+                session.add(state)
+
+            for entity, count in counts.items():
+                applied[entity] += count
+            if not payload["more"]:
+                return applied
+
+
+class SyncPoller(QObject):
+    """
+    Fragt die Gegenstellen aus den Benutzereinstellungen im Hintergrund ab (wie der Drucker-Cache).
+    'synced' wird nur gesendet, wenn tatsächlich etwas übernommen wurde.
+    """
+    synced = Signal(dict)
+
+    def __init__(self, peers: list[str], parent=None):
+        super().__init__(parent)
+        self.clients = [SyncClient(peer) for peer in peers]
+        self._errors = {}  # Gegenstelle -> letzte Fehlermeldung (nur Änderungen ausgeben)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def poll(self):
+        applied = {change_log.LABEL_TYPE: 0, change_log.CROP: 0}
+        for client in self.clients:
+            try:
+                counts = client.sync()
+                error = None
+            except Exception as e:
+                counts, error = {}, str(e)
+            if self._errors.get(client.base_url) != error:
+                if error:
+                    logger.warning("Abgleich mit %s: %s", client.base_url, error)
+                else:
+                    logger.info("Abgleich mit %s: wieder erreichbar", client.base_url)
+                self._errors[client.base_url] = error
+            for entity, count in counts.items():
+                applied[entity] += count
+        if any(applied.values()):
+            self.synced.emit(applied)
+
+    def poll_async(self) -> bool:
+        """Startet poll() in einem Hintergrund-Thread (höchstens einer gleichzeitig)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self.poll, name="sync-poller", daemon=True)
+            self._thread.start()
+        return True
+
+    def wait(self, timeout: float | None = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+def sync_settings() -> tuple[int, str, list[str], float]:
+    """
+    Aus den Benutzereinstellungen:
+    sync/server_port (0 = kein Server), sync/server_host (Standard: 127.0.0.1),
+    sync/peers (URLs, kommagetrennt), sync/interval_s (Standard: 30)
+    """
+    settings = QSettings("LabelLobster", "UserSettings")
+    peers = settings.value("sync/peers", "") or ""
+    if isinstance(peers, str):
+        peers = peers.split(",")
+    return (int(settings.value("sync/server_port", 0)), settings.value("sync/server_host", "127.0.0.1"),
+            [p.strip() for p in peers if p.strip()], float(settings.value("sync/interval_s", 30)))
+
+
+# ---------------------------------------------------------
+# Kommandozeile
+# ---------------------------------------------------------
+def run_server(host: str, port: int) -> int:
+    server = SyncServer(host, port)
+    server.start()
+    print(f"Konfigurations-Server läuft auf {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Beende Konfigurations-Server ...")
+    server.stop()
+    return 0
+
+
+def run_sync(url: str, interval: float = 0.0) -> int:
+    """Einmal abgleichen, oder mit interval > 0 fortlaufend."""
+    client = SyncClient(url)
+    while True:
+        try:
+            applied = client.sync()
+            print(f"{url}: {applied[change_log.LABEL_TYPE]} Label-Typen, {applied[change_log.CROP]} Crops übernommen")
+        except (OSError, ValueError) as e:
+            print(f"Abgleich mit {url} fehlgeschlagen: {e}")
+            if interval <= 0:
+                return 1
+        if interval <= 0:
+            return 0
+        try:
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            return 0
@@ -0,0 +1,175 @@
+import os
+import random
+
+import fitz  # PyMuPDF
+
+# Bei Änderungen am Aussehen hochzählen - bereits erzeugte Dateien werden dann neu gebaut
+CORPUS_VERSION = 1
+
+PAGE_SIZES = {"A4": fitz.paper_rect("a4"), "A6": fitz.paper_rect("a6")}
+LABEL_SIZE = (280.0, 410.0)  # Knapp 100 x 145 mm, passt mit Rand auf A6
+SCAN_DPI = 150
+
+# Carrier mit Kopfzeile, Produkt und Bezeichnung der Sendungsnummer (= Keywords der Label-Typen)
+CARRIERS = [
+    {"carrier": "DHL", "label_type": "Paket", "keywords": "dhl paket, sendungsnummer",
+     "header": "DHL PAKET", "tracking": "Sendungsnummer", "digits": 20},
+    {"carrier": "UPS", "label_type": "Standard", "keywords": "ups standard, tracking #",
+     "header": "UPS STANDARD", "tracking": "TRACKING #", "digits": 18},
+    {"carrier": "DPD", "label_type": "Classic", "keywords": "dpd classic, parcel no",
+     "header": "DPD CLASSIC", "tracking": "PARCEL NO", "digits": 14},
+    {"carrier": "GLS", "label_type": "BusinessParcel", "keywords": "gls businessparcel, track id",
+     "header": "GLS BUSINESSPARCEL", "tracking": "TRACK ID", "digits": 12},
+    {"carrier": "Hermes", "label_type": "Paket", "keywords": "hermes, sendungs-id",
+     "header": "HERMES PAKET", "tracking": "Sendungs-ID", "digits": 16},
+]
+
+_NAMES = ["Anna Schmidt", "Jonas Becker", "Mehmet Yilmaz", "Lena Fischer", "Paul Wagner", "Sofia Weber",
+          "Lukas Hoffmann", "Marie Schulz", "Felix Koch", "Emma Richter"]
+_STREETS = ["Hauptstraße", "Bahnhofstraße", "Gartenweg", "Lindenallee", "Industriestraße", "Am Markt"]
+_CITIES = ["10115 Berlin", "20095 Hamburg", "50667 Köln", "80331 München", "04109 Leipzig", "28195 Bremen"]
+
+
+# ---------------------------------------------------------
+# Ein Label zeichnen (Vektor + Text wie aus den Carrier-Portalen)
+# ---------------------------------------------------------
+def _address(rng: random.Random) -> list[str]:
+    return [rng.choice(_NAMES), f"{rng.choice(_STREETS)} {rng.randint(1, 120)}", rng.choice(_CITIES), "Deutschland"]
+
+
+def _barcode(page: fitz.Page, rect: fitz.Rect, rng: random.Random):
+    """Strichcode aus gefüllten Rechtecken (zufällige Breiten, wie Code 128 auf den Labels)."""
+    shape = page.new_shape()
+    x = rect.x0
+    while x < rect.x1:
+        width = rng.choice((0.8, 1.6, 2.4, 3.2))
+        if x + width > rect.x1:
+            break
+        shape.draw_rect(fitz.Rect(x, rect.y0, x + width, rect.y1))
+        x += width + rng.choice((0.8, 1.6, 2.4))
+    shape.finish(color=None, fill=(0, 0, 0))
+    shape.commit()
+
+
+_FONTS = {}
+
+
+def _font(name: str) -> fitz.Font:
+    if name not in _FONTS:
+        _FONTS[name] = fitz.Font(name)
+    return _FONTS[name]
+
+
+def draw_label(page: fitz.Page, origin: fitz.Point, carrier: dict, rng: random.Random):
+    """Zeichnet ein Versandlabel mit Rahmen, Kopf, Adressen und Strichcodes ab 'origin'."""
+    x0, y0 = origin
+    w, h = LABEL_SIZE
+    frame = fitz.Rect(x0, y0, x0 + w, y0 + h)
+    page.draw_rect(frame, color=(0, 0, 0), width=1.5)
+    page.draw_line(fitz.Point(x0, y0 + 50), fitz.Point(x0 + w, y0 + 50), color=(0, 0, 0), width=1)
+    page.draw_line(fitz.Point(x0, y0 + 250), fitz.Point(x0 + w, y0 + 250), color=(0, 0, 0), width=1)
+
+    # Ein TextWriter je Label statt insert_text je Zeile (deutlich schneller bei 500 Seiten)
+    regular, bold = _font("helv"), _font("hebo")
+    writer = fitz.TextWriter(page.rect)
+    tracking = "".join(rng.choice("0123456789") for _ in range(carrier["digits"]))
+    writer.append((x0 + 10, y0 + 32), carrier["header"], font=bold, fontsize=20)
+    writer.append((x0 + 10, y0 + 66), "Absender:", font=bold, fontsize=7)
+    for i, line in enumerate(_address(rng)):
+        writer.append((x0 + 10, y0 + 76 + i * 8), line, font=regular, fontsize=7)
+    writer.append((x0 + 10, y0 + 130), "Empfänger:", font=bold, fontsize=9)
+    for i, line in enumerate(_address(rng)):
+        writer.append((x0 + 20, y0 + 146 + i * 14), line, font=regular, fontsize=12)
+    writer.append((x0 + 10, y0 + 236), f"Gewicht: {rng.uniform(0.2, 31.5):.1f} kg", font=regular, fontsize=8)
+    writer.append((x0 + 20, y0 + 344), f"{carrier['tracking']}: {tracking}", font=regular, fontsize=9)
+    if page.rect.height > 2 * h:
+        # Privatkunden-Format auf A4: darunter Hinweise zum Ausschneiden und Aufkleben
+        hints = ["Bitte das Label entlang der Linie ausschneiden.", "Gut sichtbar auf die größte Seite kleben.",
+                 "Alte Labels und Barcodes entfernen oder überkleben."]
+        for i, line in enumerate(hints):
+            writer.append((36, 500 + i * 14), line, font=regular, fontsize=10)
+        page.draw_line(fitz.Point(20, 480), fitz.Point(575, 480), color=(0.5, 0.5, 0.5), width=0.5, dashes="[4] 0")
+    writer.write_text(page)
+
+    _barcode(page, fitz.Rect(x0 + 20, y0 + 262, x0 + w - 20, y0 + 330), rng)
+    _barcode(page, fitz.Rect(x0 + 20, y0 + 356, x0 + w - 100, y0 + 398), rng)
+
+
+def _text_page(doc: fitz.Document, size: str, carrier: dict, rng: random.Random) -> fitz.Page:
+    page = doc.new_page(width=PAGE_SIZES[size].width, height=PAGE_SIZES[size].height)
+    draw_label(page, _label_origin(size), carrier, rng)
+    return page
+
+
+# ---------------------------------------------------------
+# Dokumente erzeugen
+# ---------------------------------------------------------
+def corpus_name(carrier: dict, size: str, pages: int, text: bool) -> str:
+    kind = "text" if text else "scan"
+    return f"v{CORPUS_VERSION}_{carrier['carrier'].lower()}_{size.lower()}_{kind}_{pages:03d}p.pdf"
+
+
+def build_document(carrier: dict, size: str, pages: int, text: bool, seed: int = 0) -> fitz.Document:
+    """
+    Ein Carrier-PDF mit 'pages' Labels (je Seite eine andere Sendungsnummer). Ohne Text werden die
+    Seiten wie ein Scan als JPEG eingebettet (keine Textebene); es gibt 8 Varianten, die sich wiederholen.
+    """
+    rng = random.Random(f"{carrier['carrier']}-{size}-{seed}")
+    doc = fitz.open()
+    if text:
+        for _ in range(pages):
+            _text_page(doc, size, carrier, rng)
+        return doc
+
+    scans = []
+    matrix = fitz.Matrix(SCAN_DPI / 72, SCAN_DPI / 72)
+    for _ in range(min(pages, 8)):
+        with fitz.open() as source:
+            pix = _text_page(source, size, carrier, rng).get_pixmap(matrix=matrix, colorspace=fitz.csGRAY)
+            scans.append(pix.tobytes("jpeg", jpg_quality=80))
+    rect = PAGE_SIZES[size]
+    for i in range(pages):
+        page = doc.new_page(width=rect.width, height=rect.height)
+        page.insert_image(page.rect, stream=scans[i % len(scans)])
+    return doc
+
+
+def generate_corpus(directory: str, sizes=("A4", "A6"), page_counts=(1, 50, 500), text_modes=(True, False),
+                    carriers: list[dict] | None = None) -> list[dict]:
+    """
+    Legt den Korpus in 'directory' an (vorhandene Dateien derselben Version werden weiterverwendet).
+    Gibt je Datei {path, carrier, size, pages, text} zurück. Die Carrier wechseln sich über die
+    Kombinationen ab, damit auch mehrere Label-Typen erkannt werden müssen.
+    """
+    os.makedirs(directory, exist_ok=True)
+    carriers = carriers or CARRIERS
+    entries = []
+    combination = 0
+    for size in sizes:
+        for pages in page_counts:
+            for text in text_modes:
+                carrier = carriers[combination % len(carriers)]
+                combination += 1
+                path = os.path.join(directory, corpus_name(carrier, size, pages, text))
+                if not os.path.exists(path):
+                    doc = build_document(carrier, size, pages, text)
+                    tmp_path = f"{path}.tmp"
+                    doc.save(tmp_path, garbage=3, deflate=True)
+                    doc.close()
+                    os.replace(tmp_path, path)
+                entries.append({"path": path, "carrier": carrier["carrier"], "size": size, "pages": pages,
+                                "text": text})
+    return entries
+
+
+def _label_origin(size: str) -> fitz.Point:
+    if size == "A6":
+        page = PAGE_SIZES["A6"]
+        return fitz.Point((page.width - LABEL_SIZE[0]) / 2, (page.height - LABEL_SIZE[1]) / 2)
+    return fitz.Point(36, 36)
+
+
+def label_rect(size: str) -> fitz.Rect:
+    """Lage des Labels auf der Seite (für die Crop-Box in der Benchmark-Datenbank)."""
+    origin = _label_origin(size)
+    return fitz.Rect(origin.x, origin.y, origin.x + LABEL_SIZE[0], origin.y + LABEL_SIZE[1])
@@ -0,0 +1,100 @@
+import os
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QAbstractItemView, QHBoxLayout, QHeaderView, QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+)
+
+from modules.print_queue import PrintJob, PrintQueue
+
+STATE_LABELS = {
+    "queued": "Wartend",
+    "rendering": "Rendert",
+    "spooling": "Spoolt",
+    "done": "Fertig",
+    "failed": "Fehlgeschlagen",
+    "cancelled": "Abgebrochen"
+}
+
+
+class PrintJobList(QWidget):
+    """Live-Liste der Druckaufträge mit Abbrechen und Aufräumen."""
+    COLUMNS = ["#", "Datei", "Drucker", "Status", "Versuche", "Meldung"]
+
+    def __init__(self, print_queue: PrintQueue, parent=None):
+        super().__init__(parent)
+        self.print_queue = print_queue
+        self._rows = {}  # Job-ID -> Tabellenzeile
+
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+
+        self.btnCancel = QPushButton("Abbrechen", self)
+        self.btnClear = QPushButton("Erledigte entfernen", self)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.btnCancel)
+        buttons.addWidget(self.btnClear)
+        buttons.addStretch()
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        # Signale verbinden (job_changed kommt aus den Druck-Threads, Qt stellt es in den GUI-Thread zu)
+        self.print_queue.job_changed.connect(self.update_job)
+        self.btnCancel.clicked.connect(self.cancel_selected)
+        self.btnClear.clicked.connect(self.clear_finished)
+
+    # ---------------------------------------------------------
+    # Zeile eines Auftrags anlegen bzw. aktualisieren
+    # ---------------------------------------------------------
+    def update_job(self, job: PrintJob):
+        row = self._rows.get(job.id)
+        if row is None:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self._rows[job.id] = row
+
+            item_id = QTableWidgetItem(str(job.id))
+            item_id.setData(Qt.ItemDataRole.UserRole, job.id)
+            self.table.setItem(row, 0, item_id)
+            name = os.path.basename(job.source_path)
+            if len(job.crops) > 1:
+                name += f" ({len(job.crops)} Seiten)"
+            self.table.setItem(row, 1, QTableWidgetItem(name))
+            self.table.setItem(row, 2, QTableWidgetItem(job.printer_name))
+            for col in range(3, len(self.COLUMNS)):
+                self.table.setItem(row, col, QTableWidgetItem())
+
+        self.table.item(row, 3).setText(STATE_LABELS.get(job.state, job.state))
+        self.table.item(row, 4).setText(str(job.attempts))
+        self.table.item(row, 5).setText(job.message)
+
+    # ---------------------------------------------------------
+    # Aktionen
+    # ---------------------------------------------------------
+    def selected_job_ids(self) -> list[int]:
+        rows = {index.row() for index in self.table.selectionModel().selectedRows()}
+        return [self.table.item(row, 0).data(Qt.ItemDataRole.UserRole) for row in sorted(rows)]
+
+    def cancel_selected(self):
+        for job_id in self.selected_job_ids():
+            self.print_queue.cancel(job_id)
+
+    def clear_finished(self):
+        removed = set(self.print_queue.clear_finished())
+        # Von unten nach oben löschen, damit die Zeilennummern stimmen
+        for job_id, row in sorted(self._rows.items(), key=lambda item: item[1], reverse=True):
+            if job_id in removed:
+                self.table.removeRow(row)
+        self._rows = {
+            self.table.item(row, 0).data(Qt.ItemDataRole.UserRole): row
+            for row in range(self.table.rowCount())
+        }
@@ -0,0 +1,256 @@
+import math
+import threading
+from collections import OrderedDict
+
+from PySide6.QtCore import QRectF, QSettings
+from PySide6.QtGui import QPainter, QPixmap
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from modules.pdf_renderer import PDFRenderer, RenderNotifier, rendered_page_to_pixmap
+
+TILE_PX = 256          # Kantenlänge einer Kachel in Geräte-Pixeln
+MIN_TILE_DPI = 32      # Darunter reicht die Vorschau
+MAX_TILE_DPI = 1200
+MAX_IN_FLIGHT = 6      # Gleichzeitig angeforderte Kacheln (der Render-Pool hat 2 Prozesse)
+
+
+class TileCache:
+    """LRU-Cache für fertige Kachel-QPixmaps mit Speicherbudget. Schlüssel: (Datei-Hash, Seite, DPI, Spalte, Zeile)"""
+
+    def __init__(self, max_bytes: int = 96 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+    def get(self, key: tuple) -> QPixmap | None:
+        with self._lock:
+            pixmap = self._entries.get(key)
+            if pixmap is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pixmap
+
+    def peek(self, key: tuple) -> QPixmap | None:
+        """Wie get, aber ohne Zähler und LRU-Reihenfolge (für Ersatzkacheln aus anderen Stufen)."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: tuple, pixmap: QPixmap):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(old)
+            self._entries[key] = pixmap
+            self._bytes += self._size(pixmap)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_tile_cache = None
+
+
+def get_tile_cache() -> TileCache:
+    """Gemeinsamer Kachel-Cache der Ansicht. Größe: render_cache/tile_mb (Standard: 96)"""
+    global _tile_cache
+    if _tile_cache is None:
+        tile_mb = int(QSettings("LabelLobster", "UserSettings").value("render_cache/tile_mb", 96))
+        _tile_cache = TileCache(tile_mb * 1024 * 1024)
+    return _tile_cache
+
+
+def tile_dpi(needed_dpi: float) -> int:
+    """Auflösungsstufe für die benötigte DPI: nächste Zweierpotenz darüber, damit Zoomen Kacheln wiederverwendet."""
+    needed_dpi = min(max(needed_dpi, MIN_TILE_DPI), MAX_TILE_DPI)
+    return min(2 ** math.ceil(math.log2(needed_dpi)), MAX_TILE_DPI)
+
+
+class TiledPageItem(QGraphicsItem):
+    """
+    Eine PDF-Seite in der Ansicht, gezeichnet aus Kacheln in der Auflösung, die Zoom und
+    devicePixelRatio gerade verlangen. Gerendert werden nur sichtbare Kacheln, im Render-Pool;
+    bis sie da sind, wird die gröbere Stufe bzw. die Vorschau hochskaliert gezeichnet.
+    Die Scene-Koordinaten sind Pixel bei 'scene_dpi' - unabhängig davon, was gerade angezeigt wird.
+    """
+
+    def __init__(self, renderer: PDFRenderer, page_number: int, page_rect, scene_dpi: float, preview: QPixmap):
+        super().__init__()
+        self.renderer = renderer
+        self.page_number = page_number
+        self.page_rect = QRectF(page_rect.x0, page_rect.y0, page_rect.width, page_rect.height)  # PDF-Punkte
+        self.scene_dpi = scene_dpi
+        self.preview = preview
+        self.cache = get_tile_cache()
+        self.closed = False
+
+        scale = scene_dpi / 72
+        self._bounds = QRectF(0, 0, self.page_rect.width() * scale, self.page_rect.height() * scale)
+        self._pending = {}           # Kachel-Schlüssel -> Future
+        self._wanted = OrderedDict()  # Fehlende sichtbare Kacheln (aktuelle Stufe), nächste zuerst
+        self._level = None
+
+        self._notifier = RenderNotifier()
+        self._notifier.finished.connect(self._tile_ready)
+
+        # Liefert option.exposedRect: nur Kacheln im ungültigen Bereich zeichnen
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+    def boundingRect(self) -> QRectF:
+        return self._bounds
+
+    def close(self):
+        """Vor dem Entfernen aus der Szene: ausstehende Kacheln verwerfen, späte Ergebnisse ignorieren."""
+        self.closed = True
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._wanted.clear()
+
+    # --- Kachel-Geometrie -------------------------------------
+    def _tile_key(self, dpi: int, col: int, row: int) -> tuple:
+        return self.renderer.doc_hash, self.page_number, dpi, col, row
+
+    def _tile_scene_size(self, dpi: int) -> float:
+        return TILE_PX * self.scene_dpi / dpi
+
+    def _tile_scene_rect(self, dpi: int, col: int, row: int) -> QRectF:
+        size = self._tile_scene_size(dpi)
+        return QRectF(col * size, row * size, size, size).intersected(self._bounds)
+
+    def _tile_clip(self, dpi: int, col: int, row: int) -> tuple:
+        # Scene-Pixel -> PDF-Punkte der angezeigten Seite
+        r = self._tile_scene_rect(dpi, col, row)
+        scale = 72 / self.scene_dpi
+        x0, y0 = self.page_rect.x(), self.page_rect.y()
+        return (x0 + r.left() * scale, y0 + r.top() * scale, x0 + r.right() * scale, y0 + r.bottom() * scale)
+
+    def _tiles_in(self, dpi: int, area: QRectF):
+        size = self._tile_scene_size(dpi)
+        cols = range(max(0, int(area.left() // size)), int(math.ceil(area.right() / size)))
+        rows = range(max(0, int(area.top() // size)), int(math.ceil(area.bottom() / size)))
+        center = area.center()
+        # Von der Mitte nach außen anfordern
+        tiles = [(col, row) for row in rows for col in cols]
+        tiles.sort(key=lambda t: abs((t[0] + 0.5) * size - center.x()) + abs((t[1] + 0.5) * size - center.y()))
+        return tiles
+
+    # --- Zeichnen ---------------------------------------------
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        area = option.exposedRect.intersected(self._bounds)
+        if area.isEmpty():
+            return
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+
+        # Benötigte Auflösung: Scene-Pixel je Geräte-Pixel aus der View-Transformation, mal devicePixelRatio
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        dpr = widget.devicePixelRatioF() if widget is not None else painter.device().devicePixelRatioF()
+        needed_dpi = self.scene_dpi * lod * dpr
+        preview_dpi = self.scene_dpi * self.preview.width() / self._bounds.width()
+
+        if needed_dpi <= preview_dpi:
+            self._draw_preview(painter, area)
+            return
+
+        dpi = tile_dpi(needed_dpi)
+        self._set_level(dpi)
+        if widget is not None:
+            inverse, ok = painter.worldTransform().inverted()
+            if ok:
+                self._drop_outside(inverse.mapRect(QRectF(widget.rect())).intersected(self._bounds))
+        for col, row in self._tiles_in(dpi, area):
+            target = self._tile_scene_rect(dpi, col, row)
+            pixmap = self.cache.get(self._tile_key(dpi, col, row))
+            if pixmap is not None:
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+                continue
+            self._want(dpi, col, row)
+            if not self._draw_coarser(painter, target, dpi):
+                self._draw_preview(painter, target)
+        self._request_tiles()
+
+    def _draw_preview(self, painter: QPainter, target: QRectF):
+        sx = self.preview.width() / self._bounds.width()
+        sy = self.preview.height() / self._bounds.height()
+        source = QRectF(target.left() * sx, target.top() * sy, target.width() * sx, target.height() * sy)
+        painter.drawPixmap(target, self.preview, source)
+
+    def _draw_coarser(self, painter: QPainter, target: QRectF, dpi: int) -> bool:
+        """Ersatz aus der nächstgröberen Stufe, die schon im Cache liegt (beim Hineinzoomen)."""
+        coarse = dpi // 2
+        while coarse >= MIN_TILE_DPI:
+            size = self._tile_scene_size(coarse)
+            col, row = int(target.center().x() // size), int(target.center().y() // size)
+            pixmap = self.cache.peek(self._tile_key(coarse, col, row))
+            tile_rect = self._tile_scene_rect(coarse, col, row)
+            if pixmap is not None and tile_rect.contains(target):
+                sx = pixmap.width() / tile_rect.width()
+                sy = pixmap.height() / tile_rect.height()
+                source = QRectF((target.left() - tile_rect.left()) * sx, (target.top() - tile_rect.top()) * sy,
+                                target.width() * sx, target.height() * sy)
+                painter.drawPixmap(target, pixmap, source)
+                return True
+            coarse //= 2
+        return False
+
+    # --- Hintergrund-Rendering --------------------------------
+    def _set_level(self, dpi: int):
+        if dpi == self._level:
+            return
+        # Stufe gewechselt: noch nicht begonnene Kacheln der alten Stufe werden nicht mehr gebraucht
+        self._level = dpi
+        self._wanted.clear()
+        for key, future in list(self._pending.items()):
+            if key[2] != dpi and future.cancel():
+                self._pending.pop(key, None)  # _tile_ready kann schon beim cancel() gelaufen sein
+
+    def _drop_outside(self, visible: QRectF):
+        # Weggescrollt: gewünschte Kacheln verwerfen und noch nicht begonnene abbrechen - sonst
+        # rendert der Pool erst die alten, bevor die jetzt sichtbaren an der Reihe sind
+        for key in [key for key, (dpi, col, row) in self._wanted.items()
+                    if not self._tile_scene_rect(dpi, col, row).intersects(visible)]:
+            del self._wanted[key]
+        for key, future in list(self._pending.items()):
+            if not self._tile_scene_rect(key[2], key[3], key[4]).intersects(visible) and future.cancel():
+                self._pending.pop(key, None)
+
+    def _want(self, dpi: int, col: int, row: int):
+        key = self._tile_key(dpi, col, row)
+        if key not in self._pending:
+            self._wanted[key] = (dpi, col, row)
+
+    def _request_tiles(self):
+        while self._wanted and len(self._pending) < MAX_IN_FLIGHT and not self.closed:
+            key, (dpi, col, row) = self._wanted.popitem(last=False)
+            future = self.renderer.render_clip_async(self.page_number, dpi, self._tile_clip(dpi, col, row))
+            self._pending[key] = future
+            self._notifier.watch(future, (key, dpi, col, row))
+
+    def _tile_ready(self, token, entry):
+        key, dpi, col, row = token
+        self._pending.pop(key, None)
+        if self.closed:
+            return
+        if entry is not None:
+            self.cache.put(key, rendered_page_to_pixmap(entry))
+            if dpi == self._level:
+                self.update(self._tile_scene_rect(dpi, col, row))
+        self._request_tiles()
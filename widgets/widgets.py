@@ -1,10 +1,54 @@
+import logging
+import time
 from typing import cast, Any
 
 from PySide6.QtWidgets import QGraphicsRectItem, QGraphicsItem
-from PySide6.QtCore import Qt, QPointF, QRectF
-from PySide6.QtGui import QColor, QPen
-from PySide6.QtGui import QPainterPath, QBrush, QColor
+from PySide6.QtCore import Qt, QPointF, QRectF, QTimer
+from PySide6.QtGui import QColor, QPen, QRegion
+from PySide6.QtGui import QBrush, QColor
 from PySide6.QtWidgets import QGraphicsItem
+import shiboken6
+
+from modules import instrumentation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_HZ = 60.0
+FRAME_PAUSE_MS = 250.0  # Längere Abstände sind Pausen beim Ziehen, keine langsamen Frames
+
+
+class FrameCounter:
+    """
+    Frame-Zeiten beim Ziehen: Abstand zwischen zwei angewendeten Frames. Jeder Frame landet
+    als Span "drag_frame" im Histogramm (--metrics), die Zusammenfassung im Debug-Log.
+    """
+    __slots__ = ("frames_ms", "_last_ns")
+
+    def __init__(self):
+        self.frames_ms = []
+        self._last_ns = None
+
+    def tick(self):
+        now = time.perf_counter_ns()
+        if self._last_ns is not None and (now - self._last_ns) / 1e6 < FRAME_PAUSE_MS:
+            instrumentation.record("drag_frame", self._last_ns, now)
+            self.frames_ms.append((now - self._last_ns) / 1e6)
+        self._last_ns = now
+
+    def summary(self) -> str | None:
+        if not self.frames_ms:
+            return None
+        frames = sorted(self.frames_ms)
+        mean = sum(frames) / len(frames)
+        return (f"{len(frames)} Frames, Ø {mean:.1f} ms ({1000 / mean:.0f} fps), "
+                f"p95 {frames[int(len(frames) * 0.95)]:.1f} ms, max {frames[-1]:.1f} ms")
+
+    def finish(self) -> str | None:
+        """Ende eines Ziehvorgangs: Zusammenfassung zurückgeben und für den nächsten zurücksetzen."""
+        text = self.summary()
+        self.frames_ms = []
+        self._last_ns = None
+        return text
 
 
 class ResizeHandle(QGraphicsRectItem):
@@ -41,26 +85,19 @@ class ResizeHandle(QGraphicsRectItem):
         return super().itemChange(change, value)
 
     def mouseMoveEvent(self, event):
-        # Wir holen das Parent-Item
-        box = self.parentItem()
-
-        # DEBUG-PRINT: Wer ist mein Parent wirklich?
-        print(f"DEBUG: Ich bin ein Handle. Mein Parent ist: {box}")
-
+        # Nur vormerken - die Box übernimmt die Größe einmal pro Bildschirm-Frame
+        box: Any = self.parentItem()
         if box:
-            # Wir berechnen die Position relativ zur Box
-            pos_in_box = self.mapToParent(event.pos())
-
-            # WICHTIG: Wir rufen die Methode auf.
-            # Wenn die IDE hier meckert, ignorieren wir das jetzt für den Test!
-            try:
-                box.update_from_handle(pos_in_box)
-                print("DEBUG: Box-Methode erfolgreich aufgerufen!")
-            except Exception as e:
-                print(f"DEBUG: Fehler beim Aufruf der Box: {e}")
+            box.request_handle_pos(self.mapToParent(event.pos()))
 
         super().mouseMoveEvent(event)
 
+    def mouseReleaseEvent(self, event):
+        box: Any = self.parentItem()
+        if box:
+            box.finish_drag()
+        super().mouseReleaseEvent(event)
+
     def update_position(self):
         # Setzt den Handle immer an die untere rechte Ecke des Rects
         r = self.parentItem().rect()
@@ -76,6 +113,17 @@ class AspectBox(QGraphicsRectItem):
         self.base_ratio = safe_ratio
         self._is_updating = False
         self.ratio = ratio
+        self.overlay = None  # Setzt DimOverlay; bekommt jede Änderung der Box mitgeteilt
+
+        # Mausbewegungen nur vormerken und einmal pro Bildschirm-Frame anwenden
+        self._pending_pos = None
+        self._pending_handle_pos = None
+        self._drag_offset = None
+        self._last_frame = 0.0
+        self._frame_timer = QTimer()
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._frame_due)
+        self.frame_counter = FrameCounter()
 
         self.setPen(QPen(QColor("red"), 7, Qt.PenStyle.DotLine))
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
@@ -86,6 +134,80 @@ class AspectBox(QGraphicsRectItem):
         self.setPos(x, y)
         self.update_handle_visuals()
 
+    # ---------------------------------------------------------
+    # Ziehen: Bewegungen sammeln, einmal pro Frame anwenden
+    # ---------------------------------------------------------
+    def frame_interval_ms(self) -> float:
+        views = self.scene().views() if self.scene() else []
+        screen = views[0].screen() if views else None
+        refresh_hz = screen.refreshRate() if screen else 0
+        return 1000.0 / (refresh_hz if refresh_hz > 0 else DEFAULT_REFRESH_HZ)
+
+    def _request_frame(self):
+        if self._frame_timer.isActive():
+            return
+        # Sofort, wenn der letzte Frame lange genug her ist, sonst zum nächsten Frame-Zeitpunkt
+        wait_ms = self.frame_interval_ms() - (time.perf_counter() - self._last_frame) * 1000
+        self._frame_timer.start(max(0, int(wait_ms)))
+
+    def request_handle_pos(self, handle_pos: QPointF):
+        self._pending_handle_pos = handle_pos
+        self._request_frame()
+
+    def _frame_due(self):
+        # scene.clear() löscht das Item ohne itemChange - dann läuft der Timer noch (siehe close)
+        if shiboken6.isValid(self) and self.scene() is not None:
+            self.apply_frame()
+
+    def apply_frame(self):
+        """Übernimmt die zuletzt vorgemerkte Position bzw. Größe (ältere Mausbewegungen verfallen)."""
+        self._frame_timer.stop()
+        pos, handle_pos = self._pending_pos, self._pending_handle_pos
+        self._pending_pos = self._pending_handle_pos = None
+        if pos is None and handle_pos is None:
+            return
+        if pos is not None:
+            self.setPos(pos)
+        if handle_pos is not None:
+            self.update_from_handle(handle_pos)
+        self._last_frame = time.perf_counter()
+        self.frame_counter.tick()
+
+    def close(self):
+        """Vor dem Entfernen aus der Szene: vorgemerkte Bewegungen verwerfen, Frame-Timer anhalten."""
+        self._frame_timer.stop()
+        self._pending_pos = self._pending_handle_pos = None
+        self._drag_offset = None
+
+    def finish_drag(self):
+        self.apply_frame()
+        self._drag_offset = None
+        summary = self.frame_counter.finish()
+        if summary:
+            logger.debug("Ziehen: %s", summary)
+
+    def mousePressEvent(self, event):
+        super().mousePressEvent(event)
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_offset = event.scenePos() - self.pos()
+
+    def mouseMoveEvent(self, event):
+        # Statt der Qt-Standardbewegung (ein setPos je Mausereignis) nur die Zielposition merken
+        if self._drag_offset is None:
+            super().mouseMoveEvent(event)
+            return
+        self._pending_pos = event.scenePos() - self._drag_offset
+        self._request_frame()
+
+    def mouseReleaseEvent(self, event):
+        self.finish_drag()
+        super().mouseReleaseEvent(event)
+
+    def setRect(self, *args):
+        super().setRect(*args)
+        if self.overlay is not None:
+            self.overlay.sync()
+
     def contextMenuEvent(self, event):
         self.reset_aspect_box()
         event.accept()
@@ -135,7 +257,7 @@ class AspectBox(QGraphicsRectItem):
                 self.prepareGeometryChange()
                 # Der magische 90-Grad-Flip
                 self.ratio = 1.0 / self.ratio
-                print(f">>> FLIP! Neues Ratio: {self.ratio:.2f}")
+                logger.debug("Box umgeklappt, neues Ratio: %.2f", self.ratio)
 
             # 3. GEOMETRIE BERECHNEN
             # Wir nehmen die längere Seite der Mausbewegung als Basis für die Breite
@@ -155,7 +277,6 @@ class AspectBox(QGraphicsRectItem):
                 self.handle.setPos(current_rect.width(), current_rect.height())
 
             self.update()
-            print(f"BOX-UPDATE: w={new_w:.1f}, h={new_h:.1f}, r={self.ratio:.2f}")
 
         finally:
             self._is_updating = False
@@ -211,16 +332,25 @@ class AspectBox(QGraphicsRectItem):
             #nx = max(s_rect.left(), min(value.x(), s_rect.right() - i_rect.width()))
             #ny = max(s_rect.top(), min(value.y(), s_rect.bottom() - i_rect.height()))
 
-            if self.scene():
-                self.scene().update()  # Erzwingt Neuzeichnen des Overlays
-
             #return QPointF(nx, ny)
             return value
 
+        if change == QGraphicsItem.GraphicsItemChange.ItemSceneHasChanged and value is None:
+            self.close()
+
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged and self.overlay is not None:
+            # Nur die Streifen zwischen altem und neuem Loch neu zeichnen statt der ganzen Szene
+            self.overlay.sync()
+
         return super().itemChange(change, value)
 
 
 class DimOverlay(QGraphicsItem):
+    """
+    Dunkelt alles außerhalb der Box ab. Das Loch (Box in Szenen-Koordinaten) wird nur bei
+    Änderungen neu berechnet; neu gezeichnet wird nur, was sich zwischen altem und neuem Loch ändert.
+    """
+
     def __init__(self, target_box: 'AspectBox'):
         super().__init__()
         self.target_box = target_box
@@ -228,6 +358,12 @@ class DimOverlay(QGraphicsItem):
         # Sorgt dafür, dass das Overlay nicht klickbar ist
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemHasNoContents, False)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, False)
+        # Liefert option.exposedRect: beim Zeichnen nur den tatsächlich ungültigen Bereich füllen
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+        self._brush = QBrush(QColor(0, 0, 0, 150))  # Halbtransparentes Schwarz
+        self._hole = QRectF(target_box.sceneBoundingRect())
+        target_box.overlay = self
 
     def boundingRect(self):
         # Das Overlay deckt die gesamte PDF-Seite ab
@@ -235,22 +371,31 @@ class DimOverlay(QGraphicsItem):
             return self.scene().sceneRect()
         return QRectF()
 
+    def sync(self):
+        """Von der Box nach jeder Bewegung/Größenänderung aufgerufen."""
+        hole = self.target_box.sceneBoundingRect()
+        if hole == self._hole:
+            return
+        # Geändert hat sich nur die symmetrische Differenz aus altem und neuem Loch
+        dirty = QRegion(self._hole.toAlignedRect()).xored(QRegion(hole.toAlignedRect()))
+        self._hole = QRectF(hole)
+        for rect in dirty:
+            self.update(QRectF(rect).adjusted(-1, -1, 1, 1))
+
     def paint(self, painter, option, widget):
         if not self.scene():
             return
 
-        # 1. Gesamte Fläche der Szene
-        path = QPainterPath()
-        path.addRect(self.scene().sceneRect())
-
-        # 2. Den Bereich der Boundingbox abziehen
-        # Wir transformieren die Box-Koordinaten in Scene-Koordinaten
-        box_rect = self.target_box.sceneBoundingRect()
-        path.addRect(box_rect)
-
-        # 3. Zeichnen mit dem 'OddEvenFill'-Loch-Effekt
-        painter.setBrush(QBrush(QColor(0, 0, 0, 150))) # Halbtransparentes Schwarz
-        painter.setPen(Qt.PenStyle.NoPen)
-        # Nutzt OddEvenFill, damit das innere Rechteck transparent bleibt
-        path.setFillRule(Qt.FillRule.OddEvenFill)
-        painter.drawPath(path)
+        # Vier Streifen um das Loch, beschnitten auf den ungültigen Bereich (statt eines szenengroßen Pfads)
+        area = option.exposedRect.intersected(self.scene().sceneRect())
+        hole = self._hole
+        bands = (
+            QRectF(area.left(), area.top(), area.width(), hole.top() - area.top()),
+            QRectF(area.left(), hole.bottom(), area.width(), area.bottom() - hole.bottom()),
+            QRectF(area.left(), hole.top(), hole.left() - area.left(), hole.height()),
+            QRectF(hole.right(), hole.top(), area.right() - hole.right(), hole.height()),
+        )
+        with instrumentation.span("overlay_paint"):
+            for band in bands:
+                if band.width() > 0 and band.height() > 0:
+                    painter.fillRect(band.intersected(area), self._brush)
@@ -1,22 +1,30 @@
+import logging
 import os
 
-import fitz
-from PySide6.QtCore import QSettings, QEvent, QUrl
+from PySide6.QtCore import QSettings, QEvent, QTimer, QUrl, Signal
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QDesktopServices
+from PySide6.QtGui import QAction, QActionGroup, QDesktopServices
 from PySide6.QtWidgets import (
-    QMainWindow, QFileDialog, QGraphicsScene
+    QMainWindow, QFileDialog, QGraphicsScene, QGraphicsView, QDockWidget
 )
 from PySide6.QtWidgets import QMessageBox, QFrame
 
-from db.crop_data_repository import CropDataRepository
-from db.shipping_label_repository import ShippingLabelRepository
-from db.database import get_session
 from forms.ui_mainwindow import Ui_MainWindow
-from modules.print import PrintingSystem
-from modules.pdf_renderer import PDFRenderer
+from modules import instrumentation
+from modules.batch import get_page_pool, submit_document
+from modules.printer_cache import get_printer_cache
+from modules.render_cache import get_render_cache
 from widgets.widgets import AspectBox, DimOverlay
-from windows.SupplierLabelManager import SupplierLabelManager
+
+logger = logging.getLogger(__name__)
+
+# PDF-, Druck- und Datenbankteil (PyMuPDF, NumPy, SQLAlchemy) werden erst bei Bedarf importiert,
+# damit das Fenster schneller erscheint - siehe init_subsystems und "main.py --startup-timing"
+
+# Sofort angezeigte Vorschau und Auflösung der Scene-Koordinaten (gezeichnet wird in Kacheln je nach Zoom)
+PREVIEW_DPI = 50
+FULL_DPI = 200
+MAX_ZOOM = 16.0  # Höchstens so weit über die Seitenansicht hinaus zoomen
 
 
 def open_license():
@@ -45,6 +53,8 @@ def open_license():
 
 class MainWindow(QMainWindow):
     """Hauptfenster der Anwendung."""
+    subsystems_ready = Signal()
+    profile_changed = Signal(bool, object)  # (läuft, geschriebene Dateien) - auch aus dem Profiler-Thread
 
     def __init__(self):
         super().__init__()
@@ -57,15 +67,17 @@ class MainWindow(QMainWindow):
         self.dim_overlay = None
         #self.pdf_viewer = PdfViewer(self)
         self.current_pdf_path = None
-        self.PrintSystem = PrintingSystem()
+        self.job_id = None  # Korrelations-ID der aktuell geöffneten PDF (Logs, Trace)
         self.user_settings = QSettings("LabelLobster", "UserSettings")
+        self.printer_cache = get_printer_cache()
 
-        # ---------------------------------------------------------
-        # Datenbank
-        # ---------------------------------------------------------
-        self.session = get_session()
-        self.crop_repo = CropDataRepository(self.session)
-        self.label_repo = ShippingLabelRepository(self.session)
+        # Werden in init_subsystems angelegt, sobald das Fenster sichtbar ist
+        self.PrintSystem = None
+        self.print_queue = None
+        self.crop_repo = None
+        self.label_repo = None
+        self.sync_server = None
+        self.sync_poller = None
 
         # ---------------------------------------------------------
         # Initialisierung der GUI
@@ -77,16 +89,16 @@ class MainWindow(QMainWindow):
         self.scene = QGraphicsScene(self)
         self.ui.graphicsViewImportedLabel.setScene(self.scene)
 
-        # Daten für das UI Laden
+        # Daten für das UI Laden (Drucker aus dem Cache, Label-Typen folgen mit der Datenbank)
         self.read_printer_information_from_system()
-        self.load_data_for_shipping_label_selector()
         self.set_last_user_settings_for_printer()
 
         self.scene = QGraphicsScene(self)
         self.ui.graphicsViewImportedLabel.setScene(self.scene)
 
         self.renderer = None
-        self.pixmap_item = None
+        self.page_item = None  # TiledPageItem der geöffneten PDF
+        self._fit_scale = 1.0
         self.crop_box = None
         self.pdf_original_rect = None
 
@@ -101,13 +113,170 @@ class MainWindow(QMainWindow):
         self.ui.actionImportShippingSlip.triggered.connect(self.import_pdf_from_file)
         self.ui.actionShowSupplierLabelManager.triggered.connect(self.show_supplier_label_manager)
         self.ui.graphicsViewImportedLabel.viewport().installEventFilter(self)
+        # Gezoomte Seite mit der Maus verschieben (Box und Handle fangen ihre Klicks vorher ab)
+        self.ui.graphicsViewImportedLabel.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
         self.ui.cmbPrinterSlection.currentTextChanged.connect(self.update_crop_box_ratio)
         self.ui.cmbPrinterPaperSelection.currentTextChanged.connect(self.update_crop_box_ratio)
         self.ui.actionLizenz.triggered.connect(open_license)
 
+        # Druckmodus umschaltbar: Direktdruck aus der Quell-PDF oder klassisch über ein Zwischen-PDF
+        self.actionDirectPrint = QAction("Direktdruck (Ausschnitt direkt rendern)", self)
+        self.actionDirectPrint.setCheckable(True)
+        self.actionDirectPrint.setChecked(self.user_settings.value("print/render_mode", "clip") == "clip")
+        self.actionDirectPrint.toggled.connect(self.on_direct_print_toggled)
+        self.ui.menuEinstellungen.addAction(self.actionDirectPrint)
+
+        # Ausgabeweg: Qt-Druckertreiber oder ZPL/EPL direkt an den Thermodrucker
+        self.menuPrintBackend = self.ui.menuEinstellungen.addMenu("Druckausgabe")
+        self.printBackendGroup = QActionGroup(self)
+        current_backend = self.user_settings.value("print/backend", "qt")
+        for backend, text in (("qt", "Druckertreiber (Qt)"), ("zpl", "ZPL (Zebra)"), ("epl", "EPL (Eltron)")):
+            action = QAction(text, self, checkable=True)
+            action.setData(backend)
+            action.setChecked(backend == current_backend)
+            self.printBackendGroup.addAction(action)
+            self.menuPrintBackend.addAction(action)
+        self.printBackendGroup.triggered.connect(self.on_print_backend_changed)
+
+        # Schwarzweiß-Umwandlung vor dem Drucken (Thermodrucker kennen nur Punkt oder kein Punkt)
+        self.menuBitmapMode = self.ui.menuEinstellungen.addMenu("Schwarzweiß-Umwandlung")
+        self.bitmapModeGroup = QActionGroup(self)
+        current_mode = self.user_settings.value("print/bitmap_mode", "threshold")
+        for mode, text in (("off", "Aus (Treiber entscheidet)"), ("threshold", "Schwellwert"),
+                           ("floyd-steinberg", "Fehlerverteilung (Floyd-Steinberg)"), ("ordered", "Raster (Bayer)")):
+            action = QAction(text, self, checkable=True)
+            action.setData(mode)
+            action.setChecked(mode == current_mode)
+            self.bitmapModeGroup.addAction(action)
+            self.menuBitmapMode.addAction(action)
+        self.bitmapModeGroup.triggered.connect(self.on_bitmap_mode_changed)
+
+        # Druckaufträge (Dock wird in init_subsystems gefüllt, über das Datei-Menü ein-/ausblendbar)
+        self.print_job_dock = QDockWidget("Druckaufträge", self)
+        self.print_job_dock.setObjectName("dockPrintJobs")
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.print_job_dock)
+        self.ui.menuDatei.insertAction(self.ui.actionClose, self.print_job_dock.toggleViewAction())
+
+        # Mehrseitige Sammel-PDFs (ein Label pro Seite) erkennen und als ein Auftrag drucken
+        self.actionPrintMultiPage = QAction("Mehrseitige PDF drucken ...", self)
+        self.actionPrintMultiPage.triggered.connect(self.print_multi_page_pdf)
+        self.ui.menuDatei.insertAction(self.ui.actionClose, self.actionPrintMultiPage)
+        self.multi_page_notifier = None
+
+        # Profil der laufenden Station aufzeichnen (Grenzen: profile/seconds, profile/jobs)
+        from modules import profiling
+        self.actionProfile = QAction("Leistungsprofil aufzeichnen", self, checkable=True)
+        self.actionProfile.setChecked(profiling.is_running())
+        self.actionProfile.triggered.connect(self.on_profile_triggered)
+        self.ui.menuInfo.addAction(self.actionProfile)
+        self.profile_changed.connect(self.on_profile_changed)
+        profiling.add_listener(self.profile_changed.emit)
+
+        # Drucker-Cache im Hintergrund auffrischen (veraltet beim Start und danach alle TTL Sekunden)
+        self.printer_cache.updated.connect(self.on_printer_cache_updated)
+        self.printer_refresh_timer = QTimer(self)
+        self.printer_refresh_timer.setInterval(int(self.printer_cache.ttl * 1000))
+        self.printer_refresh_timer.timeout.connect(self.printer_cache.refresh_async)
+        self.printer_refresh_timer.start()
+        self.printer_cache.refresh_if_stale()
+
+        # Bis das Fenster gezeichnet ist, bleibt es bei Qt und dem Drucker-Cache
+        QTimer.singleShot(0, self.init_subsystems)
+
+    # ---------------------------------------------------------
+    # PDF-, Druck- und Datenbankteil nachladen
+    # ---------------------------------------------------------
+    def init_subsystems(self):
+        from db.crop_data_repository import CropDataRepository
+        from db.shipping_label_repository import ShippingLabelRepository
+        from modules.pdf_renderer import RenderNotifier
+        from modules.print import PrintingSystem
+        from modules.print_queue import PrintQueue
+        from widgets.print_job_list import PrintJobList
+
+        # Drucksystem auf die Auswahl der ComboBoxen einstellen
+        self.PrintSystem = PrintingSystem()
+        self.PrintSystem.set_printer(self.ui.cmbPrinterSlection.currentText())
+        ps = self.ui.cmbPrinterPaperSelection.currentData()
+        if ps is not None:
+            self.PrintSystem.printer.setPageSize(ps)
+            self.get_paper_detailed_information()
+
+        # Druckwarteschlange mit Live-Liste der Aufträge
+        self.print_queue = PrintQueue.from_settings(self)
+        self.print_queue.job_changed.connect(self.on_print_job_changed)
+        self.print_job_list = PrintJobList(self.print_queue, self)
+        self.print_job_dock.setWidget(self.print_job_list)
+
+        self.multi_page_notifier = RenderNotifier(self)
+        self.multi_page_notifier.finished.connect(self.on_multi_page_finished)
+
+        # Datenbank (Engine und Schema werden beim ersten Zugriff angelegt, Sessions je Thread)
+        self.crop_repo = CropDataRepository()
+        self.label_repo = ShippingLabelRepository()
+        self.load_data_for_shipping_label_selector()
+        self.init_sync()
+
         self.update_crop_box_ratio()
+        self.subsystems_ready.emit()
+
+    def init_sync(self):
+        """Abgleich von Label-Typen und Crops mit anderen Stationen (nur wenn eingerichtet)."""
+        from modules.sync_service import SyncPoller, SyncServer, sync_settings
+        port, host, peers, interval = sync_settings()
+        if port:
+            try:
+                self.sync_server = SyncServer(host, port)
+                self.sync_server.start()
+            except OSError as e:
+                logger.error("Konfigurations-Server konnte nicht gestartet werden: %s", e)
+        if peers:
+            self.sync_poller = SyncPoller(peers, self)
+            self.sync_poller.synced.connect(self.on_sync_applied)
+            self.sync_timer = QTimer(self)
+            self.sync_timer.setInterval(int(interval * 1000))
+            self.sync_timer.timeout.connect(self.sync_poller.poll_async)
+            self.sync_timer.start()
+            self.sync_poller.poll_async()
+
+    def on_sync_applied(self, applied: dict):
+        # Kommt aus dem Poller-Thread (queued connection): Caches verwerfen, Auswahl beibehalten
+        self.crop_repo.clear_cache()
+        if applied.get("label_type"):
+            from db.fingerprint_repository import LabelFingerprintRepository
+            self.label_repo.invalidate()
+            LabelFingerprintRepository.invalidate()
+            selected = self.ui.cmbShippingLabelType.currentData()
+            self.load_data_for_shipping_label_selector()
+            index = self.ui.cmbShippingLabelType.findData(selected)
+            if index >= 0:
+                self.ui.cmbShippingLabelType.setCurrentIndex(index)
+        self.ui.statusbar.showMessage(
+            f"Abgleich: {applied.get('label_type', 0)} Label-Typen, {applied.get('crop', 0)} Crops übernommen", 5000
+        )
+
+    def on_direct_print_toggled(self, checked: bool):
+        self.user_settings.setValue("print/render_mode", "clip" if checked else "pdf")
+
+    def on_profile_triggered(self):
+        from modules import profiling
+        profiling.toggle()
+
+    def on_profile_changed(self, running: bool, paths):
+        self.actionProfile.setChecked(running)
+        if running:
+            self.ui.statusbar.showMessage("Leistungsprofil wird aufgezeichnet ...")
+        elif paths:
+            self.ui.statusbar.showMessage(f"Leistungsprofil gespeichert: {', '.join(paths)}")
+
+    def on_print_backend_changed(self, action: QAction):
+        self.user_settings.setValue("print/backend", action.data())
+
+    def on_bitmap_mode_changed(self, action: QAction):
+        self.user_settings.setValue("print/bitmap_mode", action.data())
 
     def show_supplier_label_manager(self):
+        from windows.SupplierLabelManager import SupplierLabelManager
         dlg = SupplierLabelManager(self.label_repo)
         dlg.exec()
         self.load_data_for_shipping_label_selector()
@@ -124,9 +293,32 @@ class MainWindow(QMainWindow):
     # Druckerdaten laden zum Programmstart
     # ---------------------------------------------------------
     def read_printer_information_from_system(self):
-        printers = self.PrintSystem.get_available_printers()
-        for printer in printers:
-            self.ui.cmbPrinterSlection.addItem(printer.printerName())
+        self.ui.cmbPrinterSlection.addItems(self.printer_cache.printer_names())
+
+    def load_paper_formats(self):
+        # Aus dem Drucker-Cache, damit die Auswahl auch ohne geladenes Drucksystem funktioniert
+        return self.printer_cache.page_sizes(self.ui.cmbPrinterSlection.currentText())
+
+    # ---------------------------------------------------------
+    # Druckerliste hat sich im Hintergrund geändert
+    # ---------------------------------------------------------
+    def on_printer_cache_updated(self):
+        # Signale sperren, sonst würde das Neufüllen die gespeicherte Auswahl überschreiben
+        combos = (self.ui.cmbPrinterSlection, self.ui.cmbPrinterPaperSelection)
+        for combo in combos:
+            combo.blockSignals(True)
+        self.ui.cmbPrinterSlection.clear()
+        self.ui.cmbPrinterPaperSelection.clear()
+        self.read_printer_information_from_system()
+        self.set_last_user_settings_for_printer()
+        for combo in combos:
+            combo.blockSignals(False)
+
+        ps = self.ui.cmbPrinterPaperSelection.currentData()
+        if ps is not None and self.PrintSystem is not None:
+            self.PrintSystem.set_printer(self.ui.cmbPrinterSlection.currentText())
+            self.PrintSystem.printer.setPageSize(ps)
+        self.update_crop_box_ratio()
 
     # ---------------------------------------------------------
     # Userdaten laden Drucker und Druckerauswahl
@@ -145,7 +337,7 @@ class MainWindow(QMainWindow):
     def set_last_user_settings_for_paper(self):
 
         # Verfügbare Papiere ermitteln
-        available_papers = self.PrintSystem.load_paper_formats()
+        available_papers = self.load_paper_formats()
 
         # ComboBox leeren
         self.ui.cmbPrinterPaperSelection.clear()
@@ -167,10 +359,11 @@ class MainWindow(QMainWindow):
     # ---------------------------------------------------------
     def on_printer_settings_changed(self):
         # Drucker setzen
-        self.PrintSystem.printer.setPrinterName(self.ui.cmbPrinterSlection.currentText())
+        if self.PrintSystem is not None:
+            self.PrintSystem.set_printer(self.ui.cmbPrinterSlection.currentText())
 
         # Verfügbare Papiere ermitteln
-        available_papers = self.PrintSystem.load_paper_formats()
+        available_papers = self.load_paper_formats()
 
         # ComboBox leeren
         self.ui.cmbPrinterPaperSelection.clear()
@@ -187,7 +380,8 @@ class MainWindow(QMainWindow):
     def on_printer_paper_settings_changed(self):
         ps = self.ui.cmbPrinterPaperSelection.currentData()
 
-        self.PrintSystem.printer.setPageSize(ps)
+        if self.PrintSystem is not None and ps is not None:
+            self.PrintSystem.printer.setPageSize(ps)
 
         self.save_selected_paper()
         self.get_paper_detailed_information()
@@ -197,7 +391,10 @@ class MainWindow(QMainWindow):
     # Get Paper Size Information for GUI and Ratio
     # ---------------------------------------------------------
     def get_paper_detailed_information(self):
-        paper_info = self.PrintSystem.get_selected_paper_information()
+        # Gleiches QPageSize, das auch der Drucker bekommt - geht schon vor dem Laden des Drucksystems
+        paper_info = self.ui.cmbPrinterPaperSelection.currentData()
+        if paper_info is None:
+            return
 
         size_pt = paper_info.sizePoints()
         w = size_pt.width()
@@ -225,38 +422,13 @@ class MainWindow(QMainWindow):
     # ---------------------------------------------------------
     def identify_label_type(self) -> int | None:
         """
-        Durchsucht den PDF-Text nach Keywords und gibt die ID des Labeltyps zurück.
+        Durchsucht den PDF-Text nach Keywords (ersatzweise das gelernte Layout) und gibt die ID des Labeltyps zurück.
         """
-        # 1. Text extrahieren
-        raw_text = self.renderer.get_page_text(0)
-        if not raw_text:
-            print("DEBUG: PDF enthält keinen extrahierbaren Text (eventuell ein Scan/Bild).")
-            return None
-
-        pdf_text = raw_text.lower()
-
-        # 2. Alle Label-Typen aus der DB holen
-        label_types = self.label_repo.get_all()
-
-        # 3. Keyword-Abgleich
-        for l_type in label_types:
-            if not l_type.keywords:
-                continue
-
-            # Keywords säubern und in Liste wandeln
-            keywords = [k.strip().lower() for k in l_type.keywords.split(",") if k.strip()]
-
-            # Wenn ein Keyword im PDF-Text vorkommt -> Treffer!
-            for kw in keywords:
-                if kw in pdf_text:
-                    print(f"DEBUG: Label identifiziert als: {l_type.carrier} {l_type.label_type} (ID: {l_type.id})")
-                    return l_type.id
-
-        print("DEBUG: Kein passendes Label für diesen PDF-Text in der Datenbank gefunden.")
-        return None
+        from modules.label_identifier import identify_label_type
+        return identify_label_type(self.renderer, self.label_repo)
 
     def update_crop_box_ratio(self):
-        if not hasattr(self, 'PrintSystem'): return
+        if self.PrintSystem is None: return
 
         printer_name = self.ui.cmbPrinterSlection.currentText()
         self.PrintSystem.set_printer(printer_name)
@@ -270,7 +442,7 @@ class MainWindow(QMainWindow):
         # 3. GUI Update
         if hasattr(self, 'crop_box') and self.crop_box is not None:
             self.crop_box.set_ratio(self.current_target_ratio)
-            print(f"DEBUG: Box auf {self.current_target_ratio:.2f} gesetzt.")
+            logger.debug("Box auf %.2f gesetzt.", self.current_target_ratio)
 
     # ---------------------------------------------------------
     # Datei öffnen
@@ -282,17 +454,37 @@ class MainWindow(QMainWindow):
         if not file_path:
             return
 
+        # Eine Job-ID je importierter PDF: Import, Erkennung und spätere Druckaufträge gehören zusammen
+        self.job_id = instrumentation.new_job_id()
+        with instrumentation.job(self.job_id):
+            self.load_pdf(file_path)
+
+    def load_pdf(self, file_path: str) -> None:
+        from modules.pdf_renderer import PDFRenderer
+        from widgets.tiled_page_item import TiledPageItem
+
         self.current_pdf_path = file_path
 
         # 1. Daten laden & Scene bereinigen
+        if self.page_item is not None:
+            self.page_item.close()
+        if self.crop_box is not None:
+            self.crop_box.close()
         self.scene.clear()
         self.renderer = PDFRenderer(file_path)
-        pixmap, self.pdf_original_rect = self.renderer.get_page_pixmap(0, dpi=200)
 
-        # 2. Pixmap Item erstellen & Scene-Größe fixieren
-        self.pixmap_item = self.scene.addPixmap(pixmap)
-        self.pixmap_item.setZValue(-2)
-        img_rect = self.pixmap_item.boundingRect()
+        # Sofort eine grobe Vorschau der ganzen Seite; scharf wird nur, was sichtbar ist - in Kacheln
+        # passend zu Zoom und devicePixelRatio, gerendert im Hintergrund (auch bei A3-Sammellisten)
+        preview, self.pdf_original_rect = self.renderer.get_page_pixmap(0, dpi=PREVIEW_DPI)
+        self.show_render_cache_stats()
+
+        # 2. Seiten-Item erstellen & Scene-Größe fixieren
+        # Die Scene rechnet immer in Pixeln bei FULL_DPI - egal in welcher Auflösung gerade gezeichnet wird.
+        # So bleiben crop_box und get_pdf_coordinates beim Zoomen unverändert gültig.
+        self.page_item = TiledPageItem(self.renderer, 0, self.pdf_original_rect, FULL_DPI, preview)
+        self.page_item.setZValue(-2)
+        self.scene.addItem(self.page_item)
+        img_rect = self.page_item.sceneBoundingRect()
         self.scene.setSceneRect(img_rect)
 
         # 3. Box & Overlay initialisieren (Standard-Position)
@@ -350,8 +542,18 @@ class MainWindow(QMainWindow):
                     self.load_crop(detected_id, selected_row.paper_format_name, selected_row.printer_name)
             else:
                 # Fall C: Label erkannt, aber noch nie ein Crop dafür gespeichert
-                print("DEBUG: Neues Label ohne gespeicherte Boxen.")
-                # Standard-Zentrierung der Box bleibt aktiv
+                logger.debug("Neues Label ohne gespeicherte Boxen.")
+                self.apply_auto_crop()
+        else:
+            # Unbekanntes Label: Box trotzdem schon auf das vermutete Label setzen
+            self.apply_auto_crop()
+
+    def show_render_cache_stats(self):
+        stats = get_render_cache().stats()
+        self.ui.statusbar.showMessage(
+            f"Render-Cache: {stats['hits'] + stats['disk_hits']} Treffer, {stats['misses']} Fehlzugriffe, "
+            f"{stats['bytes'] / (1024 * 1024):.1f} MB belegt"
+        )
 
     def mousePressEvent(self, event):
         # 1. Prüfen, ob es ein Rechtsklick war
@@ -419,9 +621,9 @@ class MainWindow(QMainWindow):
         view = self.ui.graphicsViewImportedLabel
 
         # 1. Validierung: Existiert das Item und ist es in der Scene?
-        if not hasattr(self, 'pixmap_item') or self.pixmap_item is None:
+        if not hasattr(self, 'page_item') or self.page_item is None:
             return
-        if self.pixmap_item.scene() is None:
+        if self.page_item.scene() is None:
             return
 
         # 2. Geometrie-Abgleich
@@ -432,7 +634,7 @@ class MainWindow(QMainWindow):
 
         # 3. Scene-Begrenzung fixieren (WICHTIG!)
         # Wenn die SceneRect nicht exakt dem PDF entspricht, scheitert fitInView
-        img_rect = self.pixmap_item.boundingRect()
+        img_rect = self.page_item.sceneBoundingRect()
         view.scene().setSceneRect(img_rect)
 
         # 4. Scrollbars & Rahmen deaktivieren (verhindert Rand-Artefakte)
@@ -443,10 +645,21 @@ class MainWindow(QMainWindow):
         # 5. Die Skalierung erzwingen
         # fitInView berechnet die Matrix basierend auf v_size und img_rect
         view.fitInView(img_rect, Qt.AspectRatioMode.KeepAspectRatio)
+        self._fit_scale = view.transform().m11()
 
         # Optional: Debug-Check (Sollte jetzt deutlich über 0.0103 liegen)
         # print(f"DEBUG: Neue Skalierung: {view.transform().m11():.4f}")
 
+    def zoom_view(self, factor: float):
+        """Zoomt zwischen Seitenansicht (fitInView) und MAX_ZOOM; verschieben per Ziehen neben der Box."""
+        view = self.ui.graphicsViewImportedLabel
+        current = view.transform().m11()
+        target = min(max(current * factor, self._fit_scale), self._fit_scale * MAX_ZOOM)
+        if current <= 0 or abs(target - current) < 1e-9:
+            return
+        view.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        view.scale(target / current, target / current)
+
     def eventFilter(self, source, event) -> bool:
         # Wir lauschen auf den Viewport der GraphicsView
         if source is self.ui.graphicsViewImportedLabel.viewport():
@@ -454,17 +667,21 @@ class MainWindow(QMainWindow):
                 # Das Layout hat der View eine neue Größe gegeben
                 # Wir rufen die Skalierung auf
                 self.update_view_scale()
+            elif event.type() == QEvent.Type.Wheel and self.page_item is not None:
+                # Mausrad zoomt um die Mausposition (die Seite wird dafür passend in Kacheln nachgerendert)
+                self.zoom_view(1.25 ** (event.angleDelta().y() / 120))
+                return True
         return super().eventFilter(source, event)
 
     # ---------------------------------------------------------
     # PDF Koordinaten ermitteln
     # ---------------------------------------------------------
     def get_pdf_coordinates(self) -> dict:
-        if not self.renderer or not self.crop_box or not self.pixmap_item:
+        if not self.renderer or not self.crop_box or not self.page_item:
             return {}
 
         # 1. Skalierung (GUI-Pixel zu PDF-Punkten)
-        pixmap_rect = self.pixmap_item.boundingRect()
+        pixmap_rect = self.page_item.sceneBoundingRect()
         pdf_rect = self.pdf_original_rect  # 72 DPI
 
         scale_x = pdf_rect.width / pixmap_rect.width()
@@ -480,7 +697,7 @@ class MainWindow(QMainWindow):
         w = box.width() * scale_x
 
         if x0 < -1 or w > (pdf_rect.width + 1):
-            print(f"DEBUG_SAVE: [KRITISCH] Ungültige Werte! x0:{x0:.2f}, w:{w:.2f} (Limit: {pdf_rect.width})")
+            logger.warning("Ungültige Crop-Werte! x0:%.2f, w:%.2f (Limit: %s)", x0, w, pdf_rect.width)
             # Hier merken wir: Die GUI-Daten sind zum Speichern noch nicht bereit!
         return {
             "x0": round(x0, 2),
@@ -507,7 +724,7 @@ class MainWindow(QMainWindow):
             return
 
         # 3. Validierung: Ist überhaupt ein PDF geladen?
-        if not hasattr(self, 'pixmap_item') or self.pixmap_item is None:
+        if not hasattr(self, 'page_item') or self.page_item is None:
             QMessageBox.warning(self, "Kein PDF", "Es wurde kein PDF-Dokument zum Croppen geladen.")
             return
 
@@ -528,7 +745,7 @@ class MainWindow(QMainWindow):
             # Kleiner Toleranzbereich für Float-Vergleiche
             if abs(self.crop_box.ratio - self.crop_box.base_ratio) > 0.01:
                 rotation_value = 90
-                print(f"DEBUG_SAVE: Box ist geflippt. Speichere Rotation: {rotation_value}")
+                logger.debug("Box ist geflippt. Speichere Rotation: %s", rotation_value)
 
         # 4.5 Prüfung auf Duplikate
         existing_crop = self.crop_repo.get(supplier_label_id, paper_format_id, printer_name)
@@ -559,6 +776,10 @@ class MainWindow(QMainWindow):
                 rotation=rotation_value  # <--- Jetzt dynamisch
             )
 
+            # Layout merken: erkennt diesen Typ künftig auch ohne Text/Keywords
+            from modules.label_identifier import learn_layout
+            learn_layout(self.renderer, int(supplier_label_id))
+
             QMessageBox.information(self, "Erfolg",
                                     f"Bounding-Box wurde erfolgreich gespeichert (Rotation: {rotation_value}°).")
 
@@ -577,16 +798,22 @@ class MainWindow(QMainWindow):
         if not row:
             return
 
-        # 2. Skalierung berechnen (GUI / PDF-Punkte)
-        pixmap_rect = self.pixmap_item.boundingRect()
+        self.place_crop_box(row.crop_x0, row.crop_y0, row.crop_x1, row.rotation)
+
+        #print(f"DEBUG: Crop geladen (Rotation: {row.rotation}°, Ratio: {self.crop_box.ratio:.2f})")
+
+    def place_crop_box(self, x0: float, y0: float, x1: float, rotation: int):
+        """Setzt die Box auf einen Ausschnitt in PDF-Punkten (Höhe ergibt sich aus dem Papier-Ratio)."""
+        # 1. Skalierung berechnen (GUI / PDF-Punkte)
+        pixmap_rect = self.page_item.sceneBoundingRect()
         pdf_rect = self.pdf_original_rect
         scale_x = pixmap_rect.width() / pdf_rect.width
         scale_y = pixmap_rect.height() / pdf_rect.height
 
         # --- SCHRITT A: ROTATION / RATIO WIEDERHERSTELLEN ---
         if hasattr(self, 'crop_box'):
-            # Wenn in der DB rotation=90 steht, muss die Box das invertierte Papier-Ratio nutzen
-            if row.rotation == 90:
+            # Bei rotation=90 muss die Box das invertierte Papier-Ratio nutzen
+            if rotation == 90:
                 # Wechsel zu Landscape (1 / Portrait-Ratio)
                 self.crop_box.set_ratio(1.0 / self.crop_box.base_ratio)
             else:
@@ -595,9 +822,9 @@ class MainWindow(QMainWindow):
 
         # --- SCHRITT B: POSITION UND GRÖSSE SETZEN ---
         # Erst nachdem das Ratio stimmt, berechnen wir die GUI-Pixel
-        gui_x = row.crop_x0 * scale_x
-        gui_y = row.crop_y0 * scale_y
-        gui_w = (row.crop_x1 - row.crop_x0) * scale_x
+        gui_x = x0 * scale_x
+        gui_y = y0 * scale_y
+        gui_w = (x1 - x0) * scale_x
 
         self.crop_box.setPos(gui_x, gui_y)
         self.crop_box.set_size_by_width(gui_w)
@@ -606,80 +833,130 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'dim_overlay'):
             self.dim_overlay.update()
 
-        #print(f"DEBUG: Crop geladen (Rotation: {row.rotation}°, Ratio: {self.crop_box.ratio:.2f})")
+    def apply_auto_crop(self) -> bool:
+        """
+        Schlägt für Labels ohne gespeicherte Box einen Ausschnitt vor - aus Rahmen, eingebetteten
+        Bildern und Textblöcken der PDF, ohne die Seite zu rastern. Gespeichert wird erst per Klick.
+        """
+        from modules.auto_crop import propose_crop
+        proposal = propose_crop(self.renderer.doc.load_page(0), self.crop_box.base_ratio)
+        if proposal is None:
+            return False
+
+        rect = proposal.rect
+        self.place_crop_box(rect.x0, rect.y0, rect.x1, proposal.rotation)
+        source = {"drawing": "Rahmen", "image": "Bild", "content": "Inhalt",
+                  "frame": "Rahmen des Scans", "projection": "Inhalt des Scans"}[proposal.source]
+        self.ui.statusbar.showMessage(f"Crop-Vorschlag aus {source} der PDF - bitte prüfen und speichern")
+        return True
 
     # ---------------------------------------------------------
     # Erstellen des gecroppten PDFs
     # ---------------------------------------------------------
 
-    def create_cropped_pdf(self, source_pdf_path: str, output_pdf_path: str):
+    def create_cropped_pdf(self, source_pdf_path: str, output_pdf_path: str | None = None):
+        """
+        Mit Ausgabepfad: speichert den Crop und gibt True/False zurück.
+        Ohne Ausgabepfad: gibt den Crop als fitz.Document im Speicher zurück (oder None).
+        """
         if not self.renderer or not self.crop_box:
-            return False
+            return None if output_pdf_path is None else False
+
+        from modules.pdf_cropper import create_cropped_pdf, crop_to_document
 
         coords = self.get_pdf_coordinates()
+        if output_pdf_path is None:
+            return crop_to_document(source_pdf_path, coords)
+        return create_cropped_pdf(source_pdf_path, output_pdf_path, coords)
 
-        try:
-            # 1. Dokumente öffnen
-            src_doc = fitz.open(source_pdf_path)
-
-            # Sicherheits-Check: Hat das PDF überhaupt Seiten?
-            if src_doc.page_count == 0:
-                print("DEBUG: Quelldokument ist leer.")
-                src_doc.close()
-                return False
-
-            # 2. Ziel-Dokument erstellen
-            dest_doc = fitz.open()
-
-            # 3. Das Rechteck für den Ausschnitt (72 DPI)
-            # Wir nutzen fitz.Rect direkt mit den berechneten Punkten
-            crop_rect = fitz.Rect(
-                coords["x0"], coords["y0"],
-                coords["x1"], coords["y1"]
-            )
+    # ---------------------------------------------------------
+    # Drucken
+    # ---------------------------------------------------------
+    def on_print_button_clicked(self):
+        """
+        Reiht den aktuellen Ausschnitt in die Druckwarteschlange ein. Croppen, Rendern
+        und Spoolen laufen im Hintergrund, das Fenster bleibt bedienbar.
+        """
+        if not self.current_pdf_path or not self.crop_box or self.print_queue is None:
+            return
 
-            # 4. Neue Seite im Ziel-Dokument mit der Größe der Box anlegen
-            dest_page = dest_doc.new_page(
-                width=coords["width"],
-                height=coords["height"]
-            )
+        coords = self.get_pdf_coordinates()
+        if not coords:
+            return
 
-            # 5. Inhalt der Quellseite (Index 0) auf die Zielseite projizieren
-            # WICHTIG: show_pdf_page braucht das Dokument-Objekt, nicht das Page-Objekt
-            dest_page.show_pdf_page(
-                dest_page.rect,  # Ziel-Rechteck (die ganze neue Seite)
-                src_doc,  # Quelldokument
-                pno=0,  # Seitennummer (0 = erste Seite)
-                clip=crop_rect  # Der exakte Ausschnitt
+        # Einstellungen zum Zeitpunkt des Klicks festhalten
+        with instrumentation.job(self.job_id):
+            job = self.print_queue.submit(
+                self.current_pdf_path,
+                (coords["x0"], coords["y0"], coords["x1"], coords["y1"]),
+                self.ui.cmbPrinterSlection.currentText(),
+                self.ui.cmbPrinterPaperSelection.currentText(),
+                self.user_settings.value("print/render_mode", "clip")
             )
+        logger.info("Druckauftrag %s eingereiht", job.id)
+        self.ui.statusbar.showMessage(
+            f"Druckauftrag {job.id} eingereiht | {self.print_queue.pending_count()} offen"
+        )
 
-            # 6. Speichern (mit Kompression für den Drucker)
-            dest_doc.save(output_pdf_path, garbage=3, deflate=True)
-
-            dest_doc.close()
-            src_doc.close()
-            print(f"DEBUG: Crop erfolgreich erstellt: {output_pdf_path}")
-            return True
-
-        except Exception as e:
-            print(f"DEBUG: Fehler beim PDF-Cropping: {str(e)}")
-            return False
+    def print_multi_page_pdf(self):
+        """
+        Erkennt jede Seite einer Sammel-PDF einzeln (verteilt auf einen Prozess-Pool)
+        und reiht alle gefundenen Labels als einen mehrseitigen Druckauftrag ein.
+        """
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Mehrseitige PDF drucken", "", "PDF Dateien (*.pdf)"
+        )
+        if not file_path or self.multi_page_notifier is None:
+            return
 
-    # ---------------------------------------------------------
-    # Drucken
-    # ---------------------------------------------------------
-    def on_print_button_clicked(self):
-        temp_file = "to_print.pdf"
+        # Einstellungen zum Zeitpunkt der Auswahl festhalten
+        printer_name = self.ui.cmbPrinterSlection.currentText()
+        paper_name = self.ui.cmbPrinterPaperSelection.currentText()
+        mode = self.user_settings.value("print/render_mode", "clip")
 
-        # 1. Schritt: PDF anhand der Boundingbox croppen
-        if self.create_cropped_pdf(self.current_pdf_path, temp_file):
+        future = submit_document(get_page_pool(), file_path, printer_name, paper_name)
+        self.multi_page_notifier.watch(future, (file_path, printer_name, paper_name, mode))
+        self.ui.statusbar.showMessage(f"Erkenne Seiten von {os.path.basename(file_path)} ...")
 
-            # 2. Schritt: Drucker konfigurieren
-            printer_name = self.ui.cmbPrinterSlection.currentText()
-            self.PrintSystem.set_printer(printer_name)
+    def on_multi_page_finished(self, token, page_results):
+        file_path, printer_name, paper_name, mode = token
+        if page_results is None:
+            self.ui.statusbar.showMessage(f"Fehler beim Verarbeiten von {os.path.basename(file_path)}")
+            return
 
-            # 3. Schritt: Drucken
-            success = self.PrintSystem.print_pdf(temp_file)
+        crops = [(r["page"], r["clip"]) for r in page_results if r["status"] == "cropped"]
+        missing = [r["page"] + 1 for r in page_results if r["status"] != "cropped"]
+        if crops:
+            with instrumentation.job(page_results[0].get("job_id")):
+                job = self.print_queue.submit_pages(file_path, crops, printer_name, paper_name, mode)
+            logger.info("Druckauftrag %s eingereiht (%d Seiten)", job.id, len(crops))
+
+        message = f"{os.path.basename(file_path)}: {len(crops)}/{len(page_results)} Seiten erkannt"
+        if missing:
+            message += f", ohne Label/Box: Seite {', '.join(map(str, missing))}"
+        self.ui.statusbar.showMessage(message)
+
+    def on_print_job_changed(self, job):
+        from widgets.print_job_list import STATE_LABELS
+        if job.state == "done":
+            logger.info("Druckauftrag %s erfolgreich gesendet", job.id)
+            message = STATE_LABELS[job.state]
+        elif job.state == "failed":
+            logger.error("Druckauftrag %s fehlgeschlagen: %s", job.id, job.message)
+            message = f"{STATE_LABELS[job.state]} - {job.message}"
+        else:
+            return
+        self.ui.statusbar.showMessage(
+            f"Druckauftrag {job.id}: {message} | {self.print_queue.pending_count()} offen"
+        )
 
-            if success:
-                print("Druckauftrag erfolgreich gesendet.")
+    def closeEvent(self, event):
+        # Wartende Aufträge verwerfen, laufende noch fertig drucken
+        if self.print_queue is not None:
+            self.print_queue.shutdown()
+        if self.sync_server is not None:
+            self.sync_server.stop()
+        # Laufende Profil-Aufzeichnung noch schreiben, solange das Fenster die Meldung empfangen kann
+        from modules import profiling
+        profiling.stop(wait=True)
+        super().closeEvent(event)